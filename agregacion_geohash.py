@@ -0,0 +1,128 @@
+# -*- coding: utf-8 -*-
+"""
+Agregación de lugares por celdas geohash según el nivel de zoom.
+
+A zoom regional (el inicial es 8) no tiene sentido enviar cada punto: los
+lugares se agregan por prefijo geohash, con una precisión por banda de zoom
+(BANDAS_ZOOM). A partir de ZOOM_DETALLE se dibujan los lugares uno a uno.
+
+Por cada precisión se precalcula, una vez por versión del grafo, la celda
+de cada fila de la TablaLugares (-1 si no tiene coordenadas). Con eso, para
+cualquier máscara de filtros (índice de facetas) los conteos por celda, el
+desglose por tipo y el centroide salen de un np.bincount.
+"""
+
+import os
+
+import numpy as np
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+
+# Agregación por geohash (desactivada por defecto)
+AGREGACION_GEOHASH = os.environ.get("QOYLLUR_AGREGACION", "0") == "1"
+
+# Desde este zoom se muestran los lugares sin agregar
+ZOOM_DETALLE = int(os.environ.get("QOYLLUR_ZOOM_DETALLE", "12"))
+
+# (zoom máximo de la banda, caracteres de geohash)
+BANDAS_ZOOM = ((7, 3), (9, 4), (11, 5))
+
+
+def geohash(lat, lon, precision):
+    """Geohash estándar (base32) de una coordenada"""
+    lat_min, lat_max, lon_min, lon_max = -90.0, 90.0, -180.0, 180.0
+    caracteres = []
+    bit = valor = 0
+    par = True
+    while len(caracteres) < precision:
+        if par:
+            medio = (lon_min + lon_max) / 2
+            if lon >= medio:
+                valor = valor * 2 + 1
+                lon_min = medio
+            else:
+                valor *= 2
+                lon_max = medio
+        else:
+            medio = (lat_min + lat_max) / 2
+            if lat >= medio:
+                valor = valor * 2 + 1
+                lat_min = medio
+            else:
+                valor *= 2
+                lat_max = medio
+        par = not par
+        bit += 1
+        if bit == 5:
+            caracteres.append(_BASE32[valor])
+            bit = valor = 0
+    return "".join(caracteres)
+
+
+def precision_para_zoom(zoom):
+    """Caracteres de geohash de la banda del zoom, o None si es zoom de detalle"""
+    if zoom >= ZOOM_DETALLE:
+        return None
+    for zoom_max, precision in BANDAS_ZOOM:
+        if zoom <= zoom_max:
+            return precision
+    return BANDAS_ZOOM[-1][1]
+
+
+class AgregacionGeohash:
+    """Celda geohash de cada fila de una TablaLugares, por precisión"""
+
+    def __init__(self, tabla, precisiones=None):
+        df = tabla.df
+        self.total = len(df)
+        self.lat = df['lat'].to_numpy(dtype=float)
+        self.lon = df['lon'].to_numpy(dtype=float)
+        self.con_coords = tabla.mascara_coords()
+        tipos = df['tipo_general'].astype('category')
+        self.tipos = list(tipos.cat.categories)
+        self.codigo_tipo = tipos.cat.codes.to_numpy()
+
+        precisiones = precisiones or sorted({p for _, p in BANDAS_ZOOM})
+        maxima = max(precisiones)
+        completos = [
+            geohash(self.lat[i], self.lon[i], maxima) if self.con_coords[i] else None
+            for i in range(self.total)
+        ]
+
+        # precisión -> (celda de cada fila, geohash de cada celda)
+        self.celdas = {}
+        for precision in precisiones:
+            ids = {}
+            por_fila = np.full(self.total, -1, dtype=np.int64)
+            for i, completo in enumerate(completos):
+                if completo is not None:
+                    por_fila[i] = ids.setdefault(completo[:precision], len(ids))
+            self.celdas[precision] = (por_fila, list(ids))
+
+    def agregar(self, precision, mascara=None):
+        """Celdas con algún lugar de la máscara: geohash, centroide, conteo y por tipo"""
+        por_fila, nombres = self.celdas[precision]
+        validas = self.con_coords if mascara is None else (self.con_coords & mascara)
+        ids = por_fila[validas]
+        n_celdas = len(nombres)
+        conteo = np.bincount(ids, minlength=n_celdas)
+        suma_lat = np.bincount(ids, weights=self.lat[validas], minlength=n_celdas)
+        suma_lon = np.bincount(ids, weights=self.lon[validas], minlength=n_celdas)
+        n_tipos = len(self.tipos)
+        desglose = np.bincount(
+            ids * n_tipos + self.codigo_tipo[validas], minlength=n_celdas * n_tipos
+        ).reshape(n_celdas, n_tipos) if n_tipos else np.zeros((n_celdas, 0), dtype=np.int64)
+
+        resultado = []
+        for celda in np.flatnonzero(conteo):
+            n = int(conteo[celda])
+            resultado.append({
+                'geohash': nombres[celda],
+                'lat': float(suma_lat[celda] / n),
+                'lon': float(suma_lon[celda] / n),
+                'conteo': n,
+                'por_tipo': {
+                    self.tipos[t]: int(k) for t, k in enumerate(desglose[celda]) if k
+                },
+            })
+        return resultado
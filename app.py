@@ -6,13 +6,38 @@ Created on Tue Feb  3 17:04:27 2026
 
 # app_qoyllur_mejorado.py
 import streamlit as st
+import streamlit.components.v1 as components
 import pandas as pd
-from rdflib import Graph, Namespace, URIRef, Literal
-import folium
 from streamlit_folium import st_folium
-from folium import plugins
-import html
-import math
+import os
+
+from agregacion_geohash import AGREGACION_GEOHASH, precision_para_zoom
+from cache_grafo import CACHE_GRAFO
+from cache_mapas import CACHE_MAPAS, LOCK_FOLIUM
+from consultas_sparql import REGISTRO
+from datos_grafo import (
+    FUENTE_GRAFO,
+    cargar_datos_grafo,
+    crear_popup_grupo_html,
+    crear_popup_html,
+    relaciones_de_lugar,
+)
+from indice_facetas import contar
+from mapa_folium import (
+    MODO_MARCADORES,
+    capa_enganchada,
+    contar_marcadores,
+    crear_capa,
+    crear_capa_agregada,
+    crear_mapa_base,
+    crear_mapa_interactivo,
+    cumple_filtros,
+    uris_destacados,
+)
+from metricas import DEPURACION, METRICAS, RUTA_METRICAS, fase, iniciar
+from plantillas_popup import estimar_bytes_html
+from tabla_lugares import TablaLugares
+from vista_mapa import RECORTE_VISTA, caja_desde_bounds, caja_inicial, caja_render, contiene
 
 # Configuración de la página
 st.set_page_config(
@@ -25,6 +50,49 @@ st.set_page_config(
 # URL de la imagen
 IMAGEN_MONTAÑA_URL = "https://github.com/javier-vz/geo_qoyllurity/raw/main/imagenes/1750608881981.jpg"
 
+# Popups diferidos: el mapa solo lleva tooltips y el contenido del popup
+# se genera en el servidor al hacer click en un marcador
+POPUPS_DIFERIDOS = os.environ.get("QOYLLUR_POPUPS_DIFERIDOS", "0") == "1"
+
+# Mapa incremental: el mapa base se crea una vez y los filtros solo
+# reemplazan la capa de marcadores (feature_group_to_add de st_folium)
+MAPA_INCREMENTAL = os.environ.get("QOYLLUR_MAPA_INCREMENTAL", "1") == "1"
+
+# Vista inicial del mapa
+CENTRO_LAT_INICIAL = -13.53
+CENTRO_LON_INICIAL = -71.97
+ZOOM_INICIAL = 8
+
+
+def registrar_metricas(cronometro):
+    """Registra el rerun en el acumulado del proceso y reescribe el fichero de métricas
+
+    Devuelve (estadísticas de las cachés, de las consultas SPARQL, error al
+    escribir el fichero o None).
+    """
+    estadisticas_caches = {
+        'mapas': CACHE_MAPAS.estadisticas(),
+        'grafo': CACHE_GRAFO.estadisticas(),
+    }
+    estadisticas_consultas = REGISTRO.estadisticas()
+    METRICAS.registrar(cronometro)
+    error_metricas = None
+    if RUTA_METRICAS:
+        try:
+            METRICAS.exportar(RUTA_METRICAS, estadisticas_caches, estadisticas_consultas)
+        except OSError as e:
+            error_metricas = str(e)
+    return estadisticas_caches, estadisticas_consultas, error_metricas
+
+
+def reejecutar(cronometro):
+    """st.rerun() registrando antes el rerun
+
+    st.rerun() corta el script, que ya no llega a la sección de métricas.
+    """
+    registrar_metricas(cronometro)
+    st.rerun()
+
 # ============================================
 # INICIALIZAR SESSION STATE
 # ============================================
@@ -32,7 +100,7 @@ IMAGEN_MONTAÑA_URL = "https://github.com/javier-vz/geo_qoyllurity/raw/main/imag
 # Inicializar TODAS las variables de session state aquí
 if 'grafo_cargado' not in st.session_state:
     st.session_state.grafo_cargado = False
-    st.session_state.lugares_data = []
+    st.session_state.lugares_data = TablaLugares()
     st.session_state.grafo = None
     st.session_state.last_clicked = None
     st.session_state.mapa_cargado = False
@@ -47,617 +115,11 @@ if 'tipos_seleccionados' not in st.session_state:
     st.session_state.tipos_seleccionados = []
 if 'todos_tipos' not in st.session_state:
     st.session_state.todos_tipos = []
-
-# Namespaces
-EX = Namespace("http://example.org/festividades#")
-GEO = Namespace("http://www.w3.org/2003/01/geo/wgs84_pos#")
-RDFS = Namespace("http://www.w3.org/2000/01/rdf-schema#")
-RDF = Namespace("http://www.w3.org/1999/02/22-rdf-syntax-ns#")
-
-# -------------------------------------------------------------------
-# FUNCIONES DE CONSULTA RELACIONAL
-# -------------------------------------------------------------------
-
-def obtener_relaciones_lugar(grafo, uri_lugar):
-    """Obtiene relaciones para un lugar"""
-    
-    nombre_lugar = uri_lugar.split('#')[-1] if '#' in uri_lugar else uri_lugar.split('/')[-1]
-    
-    relaciones = {
-        'eventos': [],
-        'festividades': [],
-        'recursos': [],
-        'ubicado_en': [],
-        'rutas': [],
-        'naciones': []
-    }
-    
-    # 1. Eventos que ocurren en ESTE lugar específico
-    query_eventos = f"""
-    PREFIX : <http://example.org/festividades#>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    
-    SELECT DISTINCT ?nombre ?descripcion
-    WHERE {{
-      ?evento a :EventoRitual ;
-              rdfs:label ?nombre ;
-              :estaEnLugar <{uri_lugar}> .
-      OPTIONAL {{ ?evento :descripcionBreve ?descripcion . }}
-    }}
-    ORDER BY ?nombre
-    """
-    
-    try:
-        for row in grafo.query(query_eventos):
-            relaciones['eventos'].append({
-                'nombre': str(row.nombre),
-                'descripcion': str(row.descripcion) if row.descripcion else None
-            })
-    except Exception as e:
-        pass
-    
-    # 2. Festividades que se celebran en ESTE lugar específico
-    query_festividades = f"""
-    PREFIX : <http://example.org/festividades#>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    
-    SELECT DISTINCT ?nombre ?descripcion
-    WHERE {{
-      ?festividad a :Festividad ;
-                  rdfs:label ?nombre ;
-                  :SeCelebraEn <{uri_lugar}> .
-      OPTIONAL {{ ?festividad :descripcionBreve ?descripcion . }}
-    }}
-    ORDER BY ?nombre
-    """
-    
-    try:
-        for row in grafo.query(query_festividades):
-            relaciones['festividades'].append({
-                'nombre': str(row.nombre),
-                'descripcion': str(row.descripcion) if row.descripcion else None
-            })
-    except Exception as e:
-        pass
-    
-    # 3. Recursos multimedia que documentan ESTE lugar
-    query_recursos = f"""
-    PREFIX : <http://example.org/festividades#>
-    
-    SELECT DISTINCT ?codigo
-    WHERE {{
-      ?recurso a :RecursoMedial ;
-               :documentaA <{uri_lugar}> ;
-               :codigoRecurso ?codigo .
-    }}
-    LIMIT 5
-    """
-    
-    try:
-        for row in grafo.query(query_recursos):
-            codigo = str(row.codigo)
-            if "-FOTO-" in codigo: tipo_recurso = "Foto"
-            elif "-VID-" in codigo: tipo_recurso = "Video"
-            elif "-AUD-" in codigo: tipo_recurso = "Audio"
-            elif "-DOC-" in codigo: tipo_recurso = "Documento"
-            else: tipo_recurso = "Recurso"
-            
-            relaciones['recursos'].append({
-                'codigo': codigo,
-                'tipo': tipo_recurso,
-                'ruta': ""
-            })
-    except Exception as e:
-        pass
-    
-    return relaciones
-
-def crear_popup_html(lugar, relaciones):
-    """Crea HTML enriquecido para el popup con relaciones"""
-    
-    nombre = html.escape(lugar['nombre'])
-    descripcion = html.escape(lugar['descripcion'])
-    
-    # Color según tipo
-    colores_tipo = {
-        'Localidad': '#3498db',
-        'Santuario': '#e74c3c',
-        'Glaciar': '#1abc9c',
-        'Iglesia': '#9b59b6',
-        'Ruta': '#e67e22',
-        'Lugar': '#2ecc71'
-    }
-    color = colores_tipo.get(lugar['tipo_general'], '#95a5a6')
-    
-    html_content = f"""
-    <!DOCTYPE html>
-    <html>
-    <head>
-        <meta charset="UTF-8">
-        <style>
-            body {{
-                margin: 0;
-                padding: 0;
-                font-family: 'Segoe UI', Tahoma, Geneva, sans-serif;
-                font-size: 14px;
-                color: #333;
-                line-height: 1.4;
-            }}
-            .popup-container {{
-                width: 350px;
-                max-height: 450px;
-                overflow-y: auto;
-                padding: 0;
-                border-radius: 8px;
-                box-shadow: 0 4px 12px rgba(0,0,0,0.15);
-            }}
-            .popup-header {{
-                background-color: {color};
-                color: white;
-                padding: 12px 15px;
-                border-radius: 8px 8px 0 0;
-            }}
-            .popup-body {{
-                padding: 15px;
-                background-color: #ffffff;
-            }}
-            .info-section {{
-                margin-bottom: 12px;
-                padding-bottom: 12px;
-                border-bottom: 1px solid #eee;
-            }}
-            .info-section:last-child {{
-                border-bottom: none;
-            }}
-            .section-title {{
-                color: {color};
-                font-size: 13px;
-                font-weight: 600;
-                margin: 0 0 8px 0;
-                text-transform: uppercase;
-                letter-spacing: 0.5px;
-            }}
-            .item {{
-                background: #f8f9fa;
-                padding: 6px 8px;
-                margin: 3px 0;
-                border-radius: 4px;
-                font-size: 12px;
-                border-left: 2px solid {color};
-            }}
-            .coordenadas {{
-                background: #f0f7ff;
-                padding: 8px 10px;
-                border-radius: 6px;
-                font-size: 11px;
-                color: #2c3e50;
-                margin: 10px 0;
-            }}
-        </style>
-    </head>
-    <body>
-        <div class="popup-container">
-            <div class="popup-header">
-                <h3 style="margin: 0; font-size: 16px; font-weight: 600;">{nombre}</h3>
-                <p style="margin: 4px 0 0 0; font-size: 12px; opacity: 0.9;">
-                    {lugar['tipo_especifico'] or lugar['tipo_general']} • Nivel {lugar['nivel']}
-                </p>
-            </div>
-            
-            <div class="popup-body">
-                <!-- Descripción -->
-                <div class="info-section">
-                    <p style="margin: 0; font-size: 13px; color: #444;">{descripcion}</p>
-                </div>
-                
-                <!-- Coordenadas -->
-                <div class="coordenadas">
-                    <div style="font-weight: 600;">Coordenadas:</div>
-                    <div>{lugar['lat']:.6f}, {lugar['lon']:.6f}</div>
-                    {f'<div style="margin-top: 4px;"><span style="font-weight: 600;">Ubicado en:</span> {html.escape(lugar["ubicado_en"])}</div>' if lugar['ubicado_en'] else ''}
-                </div>
-    """
-    
-    # Eventos
-    if relaciones['eventos']:
-        html_content += '<div class="info-section">'
-        html_content += '<div class="section-title">Eventos Rituales</div>'
-        for evento in relaciones['eventos'][:3]:
-            nombre_evento = html.escape(evento['nombre'])
-            html_content += f'<div class="item">• {nombre_evento}</div>'
-        if len(relaciones['eventos']) > 3:
-            html_content += f'<div style="font-size: 11px; color: #666; margin-top: 5px;">+ {len(relaciones["eventos"]) - 3} eventos más</div>'
-        html_content += '</div>'
-    
-    # Festividades
-    if relaciones['festividades']:
-        html_content += '<div class="info-section">'
-        html_content += '<div class="section-title">Festividades</div>'
-        for fest in relaciones['festividades']:
-            nombre_fest = html.escape(fest['nombre'])
-            html_content += f'<div class="item">• {nombre_fest}</div>'
-        html_content += '</div>'
-    
-    # Recursos
-    if relaciones['recursos']:
-        html_content += '<div class="info-section">'
-        html_content += '<div class="section-title">Recursos Multimedia</div>'
-        for recurso in relaciones['recursos'][:2]:
-            html_content += f'<div class="item">{recurso["tipo"]}: {html.escape(recurso["codigo"])}</div>'
-        html_content += '</div>'
-    
-    # Cerrar HTML
-    html_content += """
-            </div>
-        </div>
-    </body>
-    </html>
-    """
-    
-    return html_content
-
-# -------------------------------------------------------------------
-# FUNCIONES PRINCIPALES
-# -------------------------------------------------------------------
-
-def cargar_grafo_desde_url(url):
-    """Carga el grafo TTL desde una URL"""
-    try:
-        grafo = Graph()
-        grafo.parse(url, format="turtle")
-        return grafo, True, f"Grafo cargado: {len(grafo)} triples"
-    except Exception as e:
-        return None, False, f"Error: {str(e)}"
-
-def extraer_lugares(grafo):
-    """Extrae lugares del grafo"""
-    
-    query = """
-    PREFIX : <http://example.org/festividades#>
-    PREFIX geo: <http://www.w3.org/2003/01/geo/wgs84_pos#>
-    PREFIX rdfs: <http://www.w3.org/2000/01/rdf-schema#>
-    PREFIX rdf: <http://www.w3.org/1999/02/22-rdf-syntax-ns#>
-    
-    SELECT DISTINCT ?uri 
-           (MIN(?nombre) as ?primerNombre)
-           ?lat ?lon 
-           (MIN(?tipoEspecifico) as ?primerTipoEspe)
-           ?tipoGeneral
-           (MIN(?descBreve) as ?primerDesc)
-           (MIN(?nivelEmbeddings) as ?primerNivel)
-           (MIN(?nombreUbicadoEn) as ?primerUbicadoEn)
-    WHERE {
-      ?uri rdf:type/rdfs:subClassOf* :Lugar ;
-           rdfs:label ?nombre .
-      
-      OPTIONAL { ?uri geo:lat ?lat ; geo:long ?lon . }
-      
-      OPTIONAL {
-        ?uri rdf:type ?tipoEspe .
-        FILTER(?tipoEspe != :Lugar)
-        ?tipoEspe rdfs:label ?tipoEspecifico .
-      }
-      
-      BIND(
-        IF(EXISTS{?uri rdf:type :Localidad}, "Localidad",
-          IF(EXISTS{?uri rdf:type :Glaciar}, "Glaciar",
-            IF(EXISTS{?uri rdf:type :Santuario}, "Santuario",
-              IF(EXISTS{?uri rdf:type :Iglesia}, "Iglesia",
-                IF(EXISTS{?uri rdf:type :Ruta}, "Ruta", "Lugar")
-              )
-            )
-          )
-        ) AS ?tipoGeneral
-      )
-      
-      OPTIONAL { ?uri :descripcionBreve ?descBreve . }
-      OPTIONAL { ?uri :nivelEmbeddings ?nivelEmbeddings . }
-      OPTIONAL { 
-        ?uri :ubicadoEn ?ubicadoEn .
-        ?ubicadoEn rdfs:label ?nombreUbicadoEn .
-      }
-    }
-    GROUP BY ?uri ?lat ?lon ?tipoGeneral
-    ORDER BY ?tipoGeneral ?primerNombre
-    """
-    
-    resultados = []
-    
-    for row in grafo.query(query):
-        resultados.append({
-            'uri': str(row.uri),
-            'nombre': str(row.primerNombre) if row.primerNombre else "Sin nombre",
-            'lat': float(row.lat) if row.lat else None,
-            'lon': float(row.lon) if row.lon else None,
-            'tipo_especifico': str(row.primerTipoEspe) if row.primerTipoEspe else None,
-            'tipo_general': str(row.tipoGeneral),
-            'descripcion': str(row.primerDesc) if row.primerDesc else "Sin descripción",
-            'nivel': str(row.primerNivel) if row.primerNivel else "No especificado",
-            'ubicado_en': str(row.primerUbicadoEn) if row.primerUbicadoEn else None
-        })
-    
-    return resultados
-
-def crear_mapa_interactivo(grafo, lugares_data, center_lat=-13.53, center_lon=-71.97, zoom=8, estilo_mapa="Relieve", lugares_destacados=None):
-    """Crea un mapa Folium con múltiples estilos de mapa"""
-    
-    # Filtrar lugares con coordenadas
-    lugares_con_coords = [l for l in lugares_data if l['lat'] and l['lon']]
-    
-    if not lugares_con_coords:
-        return folium.Map(location=[center_lat, center_lon], zoom_start=zoom)
-    
-    # Configuración de estilos de mapa
-    tile_layers = {
-        "Relieve": {
-            "tiles": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
-            "attr": "Esri, Maxar, Earthstar Geographics",
-            "name": "Imagen satelital"
-        },
-        "Topográfico": {
-            "tiles": "https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png",
-            "attr": "OpenTopoMap",
-            "name": "Mapa topográfico"
-        },
-        "Mapa básico": {
-            "tiles": "OpenStreetMap",
-            "attr": "OpenStreetMap",
-            "name": "Mapa básico"
-        },
-        "Claro": {
-            "tiles": "https://cartodb-basemaps-{s}.global.ssl.fastly.net/light_all/{z}/{x}/{y}.png",
-            "attr": "CartoDB",
-            "name": "Claro"
-        }
-    }
-    
-    # Obtener configuración del estilo seleccionado
-    estilo = tile_layers.get(estilo_mapa, tile_layers["Relieve"])
-    
-    # Crear mapa base
-    mapa = folium.Map(
-        location=[center_lat, center_lon],
-        zoom_start=zoom,
-        tiles=estilo["tiles"],
-        attr=estilo["attr"],
-        control_scale=True,
-        prefer_canvas=True
-    )
-    
-    # Añadir capas adicionales
-    for estilo_nombre, config in tile_layers.items():
-        if estilo_nombre != estilo_mapa:
-            folium.TileLayer(
-                tiles=config["tiles"],
-                attr=config["attr"],
-                name=config["name"],
-                overlay=False,
-                control=True
-            ).add_to(mapa)
-    
-    # Configurar iconos
-    icon_configs = {
-        'Localidad': {'color': 'blue', 'icon': 'home'},
-        'Santuario': {'color': 'red', 'icon': 'star'},
-        'Glaciar': {'color': 'lightblue', 'icon': 'mountain'},
-        'Iglesia': {'color': 'purple', 'icon': 'place-of-worship'},
-        'Ruta': {'color': 'orange', 'icon': 'road'},
-        'Lugar': {'color': 'green', 'icon': 'map-marker'}
-    }
-    
-    from collections import defaultdict
-    
-    # Agrupar lugares por coordenadas
-    lugares_por_punto = defaultdict(list)
-    for lugar in lugares_con_coords:
-        if lugar['lat'] and lugar['lon']:
-            key = (round(lugar['lat'], 5), round(lugar['lon'], 5))
-            lugares_por_punto[key].append(lugar)
-    
-    # Verificar si hay lugares destacados
-    lugares_destacados_uris = [l['uri'] for l in lugares_destacados] if lugares_destacados else []
-    
-    # Para cada punto
-    for (lat, lon), lugares in lugares_por_punto.items():
-        if len(lugares) == 1:
-            # Un solo lugar
-            lugar = lugares[0]
-            relaciones = obtener_relaciones_lugar(grafo, lugar['uri'])
-            popup_html = crear_popup_html(lugar, relaciones)
-            
-            tipo = lugar['tipo_general']
-            icon_config = icon_configs.get(tipo, {'color': 'gray', 'icon': 'info-circle'})
-            
-            # Determinar si está destacado
-            is_destacado = lugar['uri'] in lugares_destacados_uris
-            
-            # Crear iframe para el popup
-            iframe = folium.IFrame(
-                html=popup_html,
-                width=370,
-                height=450
-            )
-            
-            # Crear marcador
-            marker = folium.Marker(
-                location=[lat, lon],
-                popup=folium.Popup(iframe, max_width=370),
-                tooltip=f"{lugar['nombre']}",
-                icon=folium.Icon(
-                    color=icon_config['color'],
-                    icon=icon_config['icon'],
-                    prefix='fa'
-                )
-            )
-            
-            # Si está destacado, añadir efecto
-            if is_destacado:
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=15,
-                    color=icon_config['color'],
-                    fill=True,
-                    fill_color=icon_config['color'],
-                    fill_opacity=0.3,
-                    weight=2
-                ).add_to(mapa)
-            
-            marker.add_to(mapa)
-            
-        else:
-            # Múltiples lugares - crear popup especial
-            popup_html = f"""
-            <!DOCTYPE html>
-            <html>
-            <head>
-                <meta charset="UTF-8">
-                <style>
-                    body {{
-                        margin: 0;
-                        padding: 0;
-                        font-family: 'Segoe UI', sans-serif;
-                        font-size: 14px;
-                    }}
-                    .container {{
-                        width: 380px;
-                        max-height: 400px;
-                        overflow-y: auto;
-                        padding: 0;
-                    }}
-                    .header {{
-                        background: #2c3e50;
-                        color: white;
-                        padding: 12px 15px;
-                        border-radius: 6px 6px 0 0;
-                    }}
-                    .lugar-card {{
-                        background: white;
-                        margin: 8px 0;
-                        padding: 10px;
-                        border-radius: 5px;
-                        border: 1px solid #e0e0e0;
-                    }}
-                </style>
-            </head>
-            <body>
-                <div class="container">
-                    <div class="header">
-                        <h3 style="margin: 0; font-size: 15px;">{len(lugares)} lugares en esta ubicación</h3>
-                        <p style="margin: 4px 0 0 0; font-size: 11px; opacity: 0.9;">
-                            Coordenadas: {lat:.6f}, {lon:.6f}
-                        </p>
-                    </div>
-                    <div style="padding: 12px;">
-            """
-            
-            # Verificar si alguno está destacado
-            hay_destacados = any(l['uri'] in lugares_destacados_uris for l in lugares)
-            
-            # Añadir cada lugar
-            for i, lugar in enumerate(lugares):
-                color_lugar = '#3498db' if lugar['tipo_general'] == 'Localidad' else '#9b59b6'
-                is_destacado = lugar['uri'] in lugares_destacados_uris
-                
-                # Resaltar si está destacado
-                border_style = "4px solid #ffcc00" if is_destacado else f"3px solid {color_lugar}"
-                
-                popup_html += f"""
-                <div class="lugar-card" style="border-left: {border_style};">
-                    <div style="display: flex; align-items: center; margin-bottom: 6px;">
-                        <div style="background: {color_lugar}; color: white; width: 22px; height: 22px; 
-                                 border-radius: 50%; display: flex; align-items: center; 
-                                 justify-content: center; margin-right: 8px; font-weight: bold; font-size: 11px;">
-                            {i+1}
-                        </div>
-                        <div>
-                            <div style="font-weight: 600; font-size: 13px; color: #2c3e50;">
-                                {html.escape(lugar['nombre'])}
-                                {" 🔸" if is_destacado else ""}
-                            </div>
-                            <div style="font-size: 11px; color: #666;">
-                                {lugar['tipo_general']}
-                            </div>
-                        </div>
-                    </div>
-                </div>
-                """
-            
-            popup_html += """
-                    </div>
-                </div>
-            </body>
-            </html>
-            """
-            
-            iframe_grupo = folium.IFrame(
-                html=popup_html,
-                width=400,
-                height=450
-            )
-            
-            # Si hay destacados, cambiar el icono del grupo
-            icon_color = 'orange'
-            if hay_destacados:
-                icon_color = 'red'
-            
-            folium.Marker(
-                location=[lat, lon],
-                popup=folium.Popup(iframe_grupo, max_width=400),
-                tooltip=f"{len(lugares)} lugares" + (" (con destacados)" if hay_destacados else ""),
-                icon=folium.Icon(
-                    color=icon_color,
-                    icon='layer-group',
-                    prefix='fa'
-                )
-            ).add_to(mapa)
-    
-    # Añadir control de capas
-    folium.LayerControl(position='topleft').add_to(mapa)
-    
-    # Añadir widget de coordenadas
-    from branca.element import Element
-    
-    coord_element = Element(f"""
-    <div style="position: absolute; bottom: 20px; right: 20px; 
-                background: white; padding: 10px; border: 2px solid #2c3e50;
-                border-radius: 5px; font-family: monospace; font-size: 12px;
-                z-index: 9999; box-shadow: 0 2px 5px rgba(0,0,0,0.2);">
-        <div style="color: #e74c3c; font-weight: bold; margin-bottom: 5px;">
-            <i class="fa fa-crosshairs"></i> Coordenadas
-        </div>
-        <div id="current-coords">
-            Lat: {center_lat:.6f}<br>
-            Lon: {center_lon:.6f}
-        </div>
-    </div>
-    
-    <script>
-    // Actualizar coordenadas cuando el mapa esté listo
-    setTimeout(function() {{
-        if (typeof window.currentMap !== 'undefined') {{
-            var map = window.currentMap;
-            
-            map.on('mousemove', function(e) {{
-                var lat = e.latlng.lat.toFixed(6);
-                var lon = e.latlng.lng.toFixed(6);
-                document.getElementById('current-coords').innerHTML = 
-                    'Lat: ' + lat + '<br>Lon: ' + lon;
-            }});
-            
-            map.on('click', function(e) {{
-                var lat = e.latlng.lat.toFixed(6);
-                var lon = e.latlng.lng.toFixed(6);
-                document.getElementById('current-coords').innerHTML = 
-                    'Lat: ' + lat + '<br>Lon: ' + lon;
-            }});
-        }}
-    }}, 1000);
-    </script>
-    """)
-    
-    mapa.get_root().html.add_child(coord_element)
-    
-    return mapa
+# Filtros por nivel y por contenedor (lista vacía = sin filtro)
+if 'niveles_seleccionados' not in st.session_state:
+    st.session_state.niveles_seleccionados = []
+if 'contenedores_seleccionados' not in st.session_state:
+    st.session_state.contenedores_seleccionados = []
 
 # -------------------------------------------------------------------
 # INTERFAZ STREAMLIT
@@ -666,29 +128,62 @@ def crear_mapa_interactivo(grafo, lugares_data, center_lat=-13.53, center_lon=-7
 # ============================================
 # 1. CARGA AUTOMÁTICA DE DATOS
 # ============================================
-if not st.session_state.grafo_cargado:
-    with st.spinner("Cargando datos del grafo..."):
-        ttl_url = "https://raw.githubusercontent.com/javier-vz/kg-llm/main/data/grafo.ttl"
-        grafo, exito, mensaje = cargar_grafo_desde_url(ttl_url)
-        
-        if exito:
-            lugares = extraer_lugares(grafo)
-            st.session_state.grafo_cargado = True
-            st.session_state.lugares_data = lugares
-            st.session_state.grafo = grafo
-            
-            # AQUÍ ES DONDE SE INICIALIZAN LOS TIPOS
-            todos_tipos = sorted(list(set([l['tipo_general'] for l in lugares])))
-            st.session_state.todos_tipos = todos_tipos
+# El grafo y sus lugares viven en la caché del proceso (cache_grafo), así
+# que solo la primera sesión paga la descarga y el parseo.
+
+# Tiempos por fase de este rerun (panel de depuración y fichero de métricas)
+cronometro = iniciar()
+depurar = DEPURACION or st.query_params.get("depurar") == "1"
+
+try:
+    with fase("carga_grafo"):
+        if st.session_state.grafo_cargado:
+            entrada_grafo = CACHE_GRAFO.obtener(FUENTE_GRAFO, cargar_datos_grafo)
+        else:
+            with st.spinner("Cargando datos del grafo..."):
+                entrada_grafo = CACHE_GRAFO.obtener(FUENTE_GRAFO, cargar_datos_grafo)
+except Exception as e:
+    entrada_grafo = None
+    st.error(f"Error al cargar datos: {str(e)}")
+
+if entrada_grafo is not None:
+    datos_grafo = entrada_grafo.valor
+    grafo = datos_grafo['grafo']
+    lugares = datos_grafo['lugares']
+    relaciones_lugares = datos_grafo['relaciones']
+    version_nueva = st.session_state.get('version_grafo') != entrada_grafo.version
+    st.session_state.grafo_cargado = True
+    st.session_state.grafo = grafo
+    st.session_state.lugares_data = lugares
+    st.session_state.relaciones_lugares = relaciones_lugares
+    st.session_state.indice_espacial = datos_grafo['indice_espacial']
+    st.session_state.facetas = datos_grafo['facetas']
+    st.session_state.agregacion = datos_grafo['agregacion']
+    st.session_state.version_grafo = entrada_grafo.version
+    
+    if version_nueva:
+        # AQUÍ ES DONDE SE INICIALIZAN LOS TIPOS
+        todos_tipos = lugares.tipos()
+        anteriores = st.session_state.todos_tipos
+        st.session_state.todos_tipos = todos_tipos
+        if not anteriores:
             st.session_state.tipos_seleccionados = todos_tipos  # Todos seleccionados por defecto
-            
         else:
-            st.error(f"Error al cargar datos: {mensaje}")
+            # Conservar la selección del usuario tras una recarga del grafo
+            st.session_state.tipos_seleccionados = [
+                t for t in st.session_state.tipos_seleccionados if t in todos_tipos
+            ]
+        facetas = datos_grafo['facetas']
+        st.session_state.niveles_seleccionados = [
+            n for n in st.session_state.niveles_seleccionados if n in facetas.bits['nivel']
+        ]
+        st.session_state.contenedores_seleccionados = [
+            c for c in st.session_state.contenedores_seleccionados if c in facetas.bits['ubicado_en']
+        ]
 
 # Asegurarnos de que los tipos estén inicializados incluso si ya se cargó el grafo
 if st.session_state.grafo_cargado and not st.session_state.todos_tipos:
-    lugares = st.session_state.lugares_data
-    todos_tipos = sorted(list(set([l['tipo_general'] for l in lugares])))
+    todos_tipos = st.session_state.lugares_data.tipos()
     st.session_state.todos_tipos = todos_tipos
     if not st.session_state.tipos_seleccionados:
         st.session_state.tipos_seleccionados = todos_tipos
@@ -713,18 +208,18 @@ with col_estilo:
     )
 
 with col_zoom:
-    zoom_level = st.slider("**Nivel de zoom**", 6, 15, 8)
+    zoom_level = st.slider("**Nivel de zoom**", 6, 15, ZOOM_INICIAL)
 
 with col_lat:
-    centro_lat = st.number_input("**Latitud**", value=-13.53, format="%.4f", key="lat_input")
+    centro_lat = st.number_input("**Latitud**", value=CENTRO_LAT_INICIAL, format="%.4f", key="lat_input")
 
 with col_lon:
-    centro_lon = st.number_input("**Longitud**", value=-71.97, format="%.4f", key="lon_input")
+    centro_lon = st.number_input("**Longitud**", value=CENTRO_LON_INICIAL, format="%.4f", key="lon_input")
 
 with col_centrar:
     st.markdown("<br>", unsafe_allow_html=True)
     if st.button("🔄 **Centrar**", use_container_width=True, type="secondary"):
-        st.rerun()
+        reejecutar(cronometro)
 
 st.markdown("<br>", unsafe_allow_html=True)
 
@@ -737,30 +232,28 @@ if st.session_state.grafo_cargado:
         # DETERMINAR QUÉ LUGARES MOSTRAR
         # ============================================
         
-        # Obtener tipos seleccionados
+        # Obtener filtros seleccionados
         tipos_seleccionados = st.session_state.tipos_seleccionados
+        niveles_seleccionados = st.session_state.niveles_seleccionados
+        contenedores_seleccionados = st.session_state.contenedores_seleccionados
         
-        # Filtrar lugares según tipos seleccionados
-        if tipos_seleccionados:
-            lugares_a_mostrar = [
-                l for l in st.session_state.lugares_data 
-                if l['tipo_general'] in tipos_seleccionados
-            ]
-            
-            # Determinar si mostrar mensaje de filtro
-            todos_tipos = st.session_state.todos_tipos
-            if len(tipos_seleccionados) < len(todos_tipos):
-                # Solo destacar si no son todos los tipos
+        # Filtrar con el índice de facetas (sin tipos seleccionados se muestran todos)
+        facetas = st.session_state.facetas
+        with fase("filtros"):
+            bits_seleccion = facetas.seleccion(
+                tipo_general=tipos_seleccionados,
+                nivel=niveles_seleccionados,
+                ubicado_en=contenedores_seleccionados
+            )
+            if bits_seleccion != facetas.todos:
+                # Solo destacar si el filtro deja fuera algún lugar
+                lugares_a_mostrar = st.session_state.lugares_data.filtrar(facetas.mascara(bits_seleccion))
                 lugares_destacados = lugares_a_mostrar
                 mostrar_info_filtro = True
             else:
+                lugares_a_mostrar = st.session_state.lugares_data
                 lugares_destacados = None
                 mostrar_info_filtro = False
-        else:
-            # Si no hay tipos seleccionados, mostrar todos
-            lugares_a_mostrar = st.session_state.lugares_data
-            lugares_destacados = None
-            mostrar_info_filtro = False
         
         # Mostrar información del filtro si está activo
         if mostrar_info_filtro and lugares_a_mostrar:
@@ -769,23 +262,154 @@ if st.session_state.grafo_cargado:
         # ============================================
         # CREAR Y MOSTRAR EL MAPA
         # ============================================
-        mapa = crear_mapa_interactivo(
-            st.session_state.grafo,
-            lugares_a_mostrar,
-            centro_lat,
-            centro_lon,
-            zoom_level,
-            estilo_mapa,
-            lugares_destacados
+        # Los mapas construidos se comparten entre sesiones (caché LRU por vista)
+        clave_capa = (
+            st.session_state.version_grafo,
+            tuple(sorted(tipos_seleccionados)),
+            tuple(sorted(niveles_seleccionados)),
+            tuple(sorted(contenedores_seleccionados, key=str)),
+            tuple(sorted(uris_destacados(lugares_destacados))),
+            POPUPS_DIFERIDOS,
+            MODO_MARCADORES
         )
         
-        # Mostrar mapa
-        mapa_data = st_folium(
-            mapa,
-            width=None,
-            height=600,
-            returned_objects=["last_clicked", "last_object_clicked"]
-        )
+        if MAPA_INCREMENTAL:
+            # Agregación por geohash: por debajo de ZOOM_DETALLE la capa lleva
+            # una burbuja por celda en lugar de un marcador por lugar
+            precision_agregada = None
+            if AGREGACION_GEOHASH:
+                precision_agregada = precision_para_zoom(st.session_state.get('zoom_mapa') or zoom_level)
+            
+            # Recorte por vista: la capa solo lleva los lugares de la caja de
+            # render, que se recalcula cuando la vista se sale de ella (o al
+            # acercarse más de un nivel de zoom)
+            lugares_capa = lugares_a_mostrar
+            clave_vista = ()
+            caja = None
+            if RECORTE_VISTA and precision_agregada is None:
+                vista, zoom_vista = st.session_state.get('vista_mapa') or (
+                    caja_inicial(centro_lat, centro_lon, zoom_level), zoom_level
+                )
+                caja, zoom_caja = st.session_state.get('caja_render') or (None, None)
+                if caja is None or not contiene(caja, vista) or zoom_vista > zoom_caja + 1:
+                    caja, zoom_caja = caja_render(vista, zoom_vista), zoom_vista
+                    st.session_state.caja_render = (caja, zoom_caja)
+                with fase("recorte_vista"):
+                    lugares_capa = [
+                        l for l in st.session_state.indice_espacial.en_caja(*caja)
+                        if cumple_filtros(l, tipos_seleccionados, niveles_seleccionados, contenedores_seleccionados)
+                    ]
+                clave_vista = (caja,)
+            
+            # Mapa base estático (solo depende del estilo); el centro y el zoom
+            # se aplican en el navegador sin reinicializar el mapa
+            clave_base = ('base', estilo_mapa, POPUPS_DIFERIDOS)
+            with fase("mapa_base"):
+                mapa = CACHE_MAPAS.obtener_o_crear(
+                    clave_base,
+                    lambda: crear_mapa_base(
+                        CENTRO_LAT_INICIAL,
+                        CENTRO_LON_INICIAL,
+                        ZOOM_INICIAL,
+                        estilo_mapa,
+                        POPUPS_DIFERIDOS
+                    ),
+                    estimar_bytes_html
+                )
+            # Capa de marcadores: es lo único que cambia con los filtros
+            with fase("capa"):
+                if precision_agregada is not None:
+                    clave_cacheada = ('agregada',) + clave_capa + (precision_agregada,)
+                    capa = CACHE_MAPAS.obtener_o_crear(
+                        clave_cacheada,
+                        lambda: crear_capa_agregada(
+                            st.session_state.agregacion.agregar(precision_agregada, facetas.mascara(bits_seleccion)),
+                            destacar=mostrar_info_filtro
+                        ),
+                        estimar_bytes_html
+                    )
+                else:
+                    clave_cacheada = ('capa',) + clave_capa + clave_vista
+                    capa = CACHE_MAPAS.obtener_o_crear(
+                        clave_cacheada,
+                        lambda: crear_capa(
+                            st.session_state.grafo,
+                            lugares_capa,
+                            lugares_destacados,
+                            st.session_state.relaciones_lugares,
+                            POPUPS_DIFERIDOS
+                        ),
+                        estimar_bytes_html
+                    )
+            cronometro.valor('html_mapa_bytes_estimado', CACHE_MAPAS.tamaño(clave_base))
+            cronometro.valor('html_capa_bytes_estimado', CACHE_MAPAS.tamaño(clave_cacheada))
+            cronometro.valor('marcadores', contar_marcadores(capa))
+            
+            objetos_devueltos = ["last_clicked", "last_object_clicked"]
+            if RECORTE_VISTA:
+                objetos_devueltos += ["bounds", "zoom"]
+            elif AGREGACION_GEOHASH:
+                objetos_devueltos += ["zoom"]
+            
+            # st_folium engancha la capa al mapa para serializarla: se hace bajo
+            # el lock compartido y el mapa se deja como estaba (aunque st_folium
+            # falle), porque ambos objetos están en la caché de todas las sesiones
+            with LOCK_FOLIUM, fase("st_folium"), capa_enganchada(mapa, capa):
+                mapa_data = st_folium(
+                    mapa,
+                    key="mapa_principal",
+                    width=None,
+                    height=600,
+                    center=(centro_lat, centro_lon),
+                    zoom=zoom_level,
+                    feature_group_to_add=capa,
+                    returned_objects=objetos_devueltos
+                )
+            
+            if mapa_data and (RECORTE_VISTA or AGREGACION_GEOHASH):
+                # El navegador ya agrupa los movimientos (moveend con retardo);
+                # solo se vuelve a ejecutar si cambia la banda de zoom de la
+                # agregación o si la nueva vista sale de la caja de render
+                zoom_mapa = mapa_data.get("zoom") or zoom_level
+                st.session_state.zoom_mapa = zoom_mapa
+                recargar = AGREGACION_GEOHASH and precision_para_zoom(zoom_mapa) != precision_agregada
+                vista = caja_desde_bounds(mapa_data.get("bounds")) if RECORTE_VISTA else None
+                if vista is not None:
+                    st.session_state.vista_mapa = (vista, zoom_mapa)
+                    if caja is not None and (not contiene(caja, vista) or zoom_mapa > zoom_caja + 1):
+                        recargar = True
+                if recargar:
+                    reejecutar(cronometro)
+        else:
+            clave_cacheada = clave_capa + (estilo_mapa, zoom_level, round(centro_lat, 6), round(centro_lon, 6))
+            with fase("mapa"):
+                mapa = CACHE_MAPAS.obtener_o_crear(
+                    clave_cacheada,
+                    lambda: crear_mapa_interactivo(
+                        st.session_state.grafo,
+                        lugares_a_mostrar,
+                        centro_lat,
+                        centro_lon,
+                        zoom_level,
+                        estilo_mapa,
+                        lugares_destacados,
+                        st.session_state.relaciones_lugares,
+                        popups_diferidos=POPUPS_DIFERIDOS,
+                        modo_marcadores=MODO_MARCADORES
+                    ),
+                    estimar_bytes_html
+                )
+            cronometro.valor('html_mapa_bytes_estimado', CACHE_MAPAS.tamaño(clave_cacheada))
+            cronometro.valor('marcadores', contar_marcadores(mapa))
+            
+            # Mostrar mapa (objeto de la caché compartida: st_folium cambia sus ids)
+            with LOCK_FOLIUM, fase("st_folium"):
+                mapa_data = st_folium(
+                    mapa,
+                    width=None,
+                    height=600,
+                    returned_objects=["last_clicked", "last_object_clicked"]
+                )
         
         # ============================================
         # 5. INFORMACIÓN DE CLICK
@@ -794,22 +418,36 @@ if st.session_state.grafo_cargado:
             clicked_lat = mapa_data["last_object_clicked"]["lat"]
             clicked_lon = mapa_data["last_object_clicked"]["lng"]
             
-            # Buscar lugares en ese punto
-            lugares_en_punto = []
-            
-            for lugar in st.session_state.lugares_data:
-                if lugar['lat'] and lugar['lon']:
-                    if (abs(lugar['lat'] - clicked_lat) < 0.0001 and 
-                        abs(lugar['lon'] - clicked_lon) < 0.0001):
-                        lugares_en_punto.append(lugar)
+            # Buscar lugares en ese punto (índice espacial: mismo grupo que el marcador)
+            with fase("click"):
+                lugares_en_punto = st.session_state.indice_espacial.resolver(clicked_lat, clicked_lon)
+                lugares_en_punto = [
+                    l for l in lugares_en_punto
+                    if cumple_filtros(l, tipos_seleccionados, niveles_seleccionados, contenedores_seleccionados)
+                ]
             
             if lugares_en_punto:
                 st.divider()
                 st.subheader("📍 Información del lugar seleccionado")
                 
+                if POPUPS_DIFERIDOS:
+                    # El popup no viajó con el mapa: se genera ahora para el marcador pulsado
+                    if len(lugares_en_punto) == 1:
+                        lugar = lugares_en_punto[0]
+                        with fase("relaciones"):
+                            relaciones = relaciones_de_lugar(st.session_state.grafo, lugar['uri'], st.session_state.relaciones_lugares)
+                        with fase("popups"):
+                            popup_html = crear_popup_html(lugar, relaciones)
+                        components.html(popup_html, width=370, height=450, scrolling=True)
+                    else:
+                        destacados_uris = uris_destacados(lugares_destacados)
+                        with fase("popups"):
+                            popup_html = crear_popup_grupo_html(lugares_en_punto, clicked_lat, clicked_lon, destacados_uris)
+                        components.html(popup_html, width=400, height=450, scrolling=True)
+                
                 if len(lugares_en_punto) == 1:
                     lugar = lugares_en_punto[0]
-                    relaciones = obtener_relaciones_lugar(st.session_state.grafo, lugar['uri'])
+                    relaciones = relaciones_de_lugar(st.session_state.grafo, lugar['uri'], st.session_state.relaciones_lugares)
                     
                     col_info1, col_info2 = st.columns([2, 1])
                     
@@ -847,7 +485,7 @@ if st.session_state.grafo_cargado:
                     
                     idx = opciones.index(seleccion)
                     lugar = lugares_en_punto[idx]
-                    relaciones = obtener_relaciones_lugar(st.session_state.grafo, lugar['uri'])
+                    relaciones = relaciones_de_lugar(st.session_state.grafo, lugar['uri'], st.session_state.relaciones_lugares)
                     
                     col_ml1, col_ml2 = st.columns([2, 1])
                     with col_ml1:
@@ -911,13 +549,18 @@ with st.sidebar:
     
     if st.session_state.grafo_cargado:
         total_lugares = len(st.session_state.lugares_data)
-        lugares_con_coords = len([l for l in st.session_state.lugares_data if l['lat'] and l['lon']])
+        lugares_con_coords = int(st.session_state.lugares_data.mascara_coords().sum())
         
         col_metric1, col_metric2 = st.columns(2)
         with col_metric1:
             st.metric("Total lugares", total_lugares)
         with col_metric2:
             st.metric("Con coords", lugares_con_coords)
+        
+        inferencia = entrada_grafo.valor['inferencia'] if entrada_grafo else None
+        if inferencia:
+            st.caption(f"Inferencia RDFS: +{inferencia['triples_añadidos']} triples "
+                       f"en {inferencia['duracion_s'] * 1000:.0f} ms")
     
     st.divider()
     
@@ -927,7 +570,7 @@ with st.sidebar:
         # Verificar y obtener tipos
         if not hasattr(st.session_state, 'todos_tipos') or not st.session_state.todos_tipos:
             if st.session_state.lugares_data:
-                todos_tipos = sorted(list(set([l['tipo_general'] for l in st.session_state.lugares_data])))
+                todos_tipos = st.session_state.lugares_data.tipos()
                 st.session_state.todos_tipos = todos_tipos
             else:
                 todos_tipos = []
@@ -971,6 +614,22 @@ with st.sidebar:
                     help="Selecciona los tipos de lugares que quieres ver en el mapa"
                 )
                 
+                # Filtros por nivel y contenedor (vacío = todos)
+                facetas = st.session_state.facetas
+                niveles_elegidos = st.multiselect(
+                    "**Nivel:**",
+                    options=facetas.valores('nivel'),
+                    default=st.session_state.niveles_seleccionados,
+                    help="Vacío = todos los niveles"
+                )
+                contenedores_elegidos = st.multiselect(
+                    "**Ubicado en:**",
+                    options=facetas.valores('ubicado_en'),
+                    default=st.session_state.contenedores_seleccionados,
+                    format_func=lambda c: c if c is not None else "(sin contenedor)",
+                    help="Vacío = cualquier ubicación"
+                )
+                
                 # ============================================
                 # BOTONES CON TEXTO QUE NO SE ROMPE
                 # ============================================
@@ -1016,8 +675,10 @@ with st.sidebar:
             # Procesar la selección cuando se presiona el botón
             if aplicar or todos or ninguno:
                 if todos:
-                    # Seleccionar todos
+                    # Seleccionar todos (y quitar los filtros de nivel y contenedor)
                     tipos_seleccionados = todos_tipos.copy()
+                    niveles_elegidos = []
+                    contenedores_elegidos = []
                 elif ninguno:
                     # Limpiar selección
                     tipos_seleccionados = []
@@ -1032,17 +693,23 @@ with st.sidebar:
                 
                 # Actualizar session state
                 st.session_state.tipos_seleccionados = tipos_seleccionados
-                st.rerun()  # Forzar actualización
+                st.session_state.niveles_seleccionados = niveles_elegidos
+                st.session_state.contenedores_seleccionados = contenedores_elegidos
+                reejecutar(cronometro)  # Forzar actualización
             
             # Mostrar estadísticas del filtro actual
             st.markdown("---")
             tipos_actuales = st.session_state.tipos_seleccionados
             
             if tipos_actuales:
-                total_filtrado = len([l for l in st.session_state.lugares_data 
-                                    if l['tipo_general'] in tipos_actuales])
+                bits_actuales = facetas.seleccion(
+                    tipo_general=tipos_actuales,
+                    nivel=st.session_state.niveles_seleccionados,
+                    ubicado_en=st.session_state.contenedores_seleccionados
+                )
+                total_filtrado = contar(bits_actuales)
                 
-                if len(tipos_actuales) == len(todos_tipos):
+                if bits_actuales == facetas.todos:
                     st.success(f"✅ **Mostrando todos**")
                     st.caption(f"{total_filtrado} lugares visibles")
                 else:
@@ -1061,11 +728,8 @@ with st.sidebar:
     st.subheader("🗺️ Tipos disponibles")
     
     if st.session_state.grafo_cargado and st.session_state.lugares_data:
-        # Contar lugares por tipo
-        conteo_por_tipo = {}
-        for lugar in st.session_state.lugares_data:
-            tipo = lugar['tipo_general']
-            conteo_por_tipo[tipo] = conteo_por_tipo.get(tipo, 0) + 1
+        # Contar lugares por tipo (popcount de cada bitset)
+        conteo_por_tipo = st.session_state.facetas.conteos('tipo_general')
         
         # Mostrar estadísticas
         for tipo in sorted(conteo_por_tipo.keys()):
@@ -1076,10 +740,11 @@ with st.sidebar:
     st.divider()
     
     st.subheader("ℹ️ Niveles de importancia")
-    st.markdown("""
-    **A**: Entidades centrales  
-    **B**: Contextuales  
-    **C**: Estructurales
+    conteo_por_nivel = st.session_state.facetas.conteos('nivel') if st.session_state.grafo_cargado else {}
+    st.markdown(f"""
+    **A**: Entidades centrales ({conteo_por_nivel.get('A', 0)})  
+    **B**: Contextuales ({conteo_por_nivel.get('B', 0)})  
+    **C**: Estructurales ({conteo_por_nivel.get('C', 0)})
     """)
 
 # ============================================
@@ -1090,4 +755,71 @@ st.divider()
 st.caption("""
 **Mapa Interactivo del Señor de Qoyllur Rit'i** | Proyecto UTP 2026 | 
 Datos del grafo de conocimiento TTL | Información registrada 2025-2026 - En proceso de verificación
-""")
\ No newline at end of file
+""")
+
+# ============================================
+# 9. DEPURACIÓN Y MÉTRICAS
+# ============================================
+# Se registra el rerun en el acumulado del proceso y, si está configurado,
+# se reescribe el fichero de métricas (JSON o texto de Prometheus). Los
+# reruns que salen antes con st.rerun() se registran en reejecutar()
+estadisticas_caches, estadisticas_consultas, error_metricas = registrar_metricas(cronometro)
+
+if depurar:
+    with st.expander("⏱️ Depuración: tiempos por fase", expanded=False):
+        st.caption("relaciones y popups están incluidos en capa o mapa; st_folium incluye "
+                   "la serialización del mapa y el envío al navegador")
+        st.table(pd.DataFrame(
+            [{'fase': nombre, 'ms': round(segundos * 1000, 2), 'llamadas': llamadas}
+             for nombre, (segundos, llamadas) in cronometro.fases.items()]
+            + [{'fase': 'total', 'ms': round(cronometro.total() * 1000, 2), 'llamadas': 1}]
+        ))
+        
+        if entrada_grafo is not None and entrada_grafo.valor.get('tiempos'):
+            st.markdown(f"**Carga del grafo** (versión {entrada_grafo.version})")
+            st.table(pd.DataFrame(
+                [{'paso': paso, 'ms': round(segundos * 1000, 2)}
+                 for paso, segundos in entrada_grafo.valor['tiempos'].items()]
+            ))
+        
+        valores = cronometro.valores
+        lineas = []
+        if 'marcadores' in valores:
+            lineas.append(f"**Marcadores:** {valores['marcadores']}")
+        for clave, etiqueta in (('html_mapa_bytes_estimado', "HTML del mapa (estimado)"),
+                                ('html_capa_bytes_estimado', "HTML de la capa (estimado)")):
+            if valores.get(clave) is not None:
+                lineas.append(f"**{etiqueta}:** {valores[clave] / 1024:.1f} KB")
+        if lineas:
+            st.markdown("  \n".join(lineas))
+        
+        for nombre, estadisticas in estadisticas_caches.items():
+            tasa = estadisticas['tasa_aciertos']
+            st.caption(f"Caché {nombre}: {estadisticas['aciertos']} aciertos, {estadisticas['fallos']} fallos"
+                       + (f" ({tasa:.0%})" if tasa is not None else ""))
+        
+        ejecutadas = [{'consulta': nombre, 'ejecuciones': datos['ejecuciones'],
+                       'media ms': round(datos['evaluacion_media_s'] * 1000, 2),
+                       'máx ms': round(datos['evaluacion_max_s'] * 1000, 2),
+                       'filas': datos['filas'], 'errores': datos['errores'], 'lentas': datos['lentas']}
+                      for nombre, datos in estadisticas_consultas.items() if datos['ejecuciones']]
+        if ejecutadas:
+            st.markdown("**Consultas SPARQL** (acumulado del proceso)")
+            st.table(pd.DataFrame(ejecutadas))
+        else:
+            st.caption("Sin consultas SPARQL en este proceso (lugares y relaciones salen de los índices)")
+        
+        for titulo, registro in (("Consultas lentas", REGISTRO.consultas_lentas()),
+                                 ("Consultas con error", REGISTRO.errores())):
+            if registro:
+                st.markdown(f"**{titulo}** (últimas {min(len(registro), 20)})")
+                st.table(pd.DataFrame(
+                    [{'consulta': e['consulta'],
+                      'vínculos': ", ".join(f"?{v}={valor}" for v, valor in e['vinculos'].items()),
+                      'ms': round(e['duracion_s'] * 1000, 2), 'filas': e['filas'], 'error': e['error']}
+                     for e in reversed(registro[-20:])]
+                ))
+        st.caption(f"Umbral de consulta lenta: {REGISTRO.umbral_lenta_s * 1000:g} ms")
+        
+        if RUTA_METRICAS:
+            st.caption(f"Métricas en {RUTA_METRICAS}" + (f" (error: {error_metricas})" if error_metricas else ""))
@@ -0,0 +1,238 @@
+# -*- coding: utf-8 -*-
+"""
+Benchmarks de los caminos críticos de la app.
+
+Fases medidas, con las mismas funciones que usa app.py:
+
+- carga: cargar_grafo_desde_url sobre un TTL local (parseo Turtle)
+- extraccion: extraer_lugares
+- relaciones: obtener_relaciones_lugar para todos los lugares (SPARQL)
+- popups: crear_popup_html para todos los lugares con coordenadas
+- mapa: crear_mapa_interactivo + serialización a HTML
+
+Cada fase se ejecuta sobre data/grafo.ttl, sobre grafos escalados (copias
+del grafo real con los individuos renombrados y las coordenadas desplazadas
+al azar con semilla fija) y, con --sinteticos, sobre grafos del generador
+(generar_grafo.py) con ese número de lugares y la misma semilla. Por fase
+se guarda la mediana y el p95 de los tiempos y el pico de memoria
+(tracemalloc, en una ejecución aparte para no falsear los tiempos). El
+JSON incluye el commit para comparar ejecuciones.
+
+Uso:
+    python benchmark_mapa.py [--escalas 10,50] [--sinteticos 1000,5000] [--repeticiones 5]
+        [--salida benchmark.json] [--comparar benchmark_anterior.json]
+"""
+
+import argparse
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from datetime import datetime
+
+from rdflib import Graph, Literal, URIRef
+
+from datos_grafo import (
+    GEO,
+    GRAFO_TTL_LOCAL,
+    cargar_grafo_desde_url,
+    crear_popup_html,
+    indexar_relaciones,
+    obtener_relaciones_lugar,
+    relaciones_de_lugar,
+)
+from generar_grafo import generar_grafo, individuos
+from lugares_grafo import extraer_lugares
+from mapa_folium import crear_mapa_interactivo
+from tabla_lugares import TablaLugares
+
+FASES = ('carga', 'extraccion', 'relaciones', 'popups', 'mapa')
+
+ESCALAS = (10, 50)
+REPETICIONES = 5
+SEMILLA = 2026
+
+# Desplazamiento máximo (grados) de las coordenadas de cada copia
+DESPLAZAMIENTO = 0.05
+
+def grafo_escalado(grafo, factor, semilla=SEMILLA):
+    """Grafo con `factor` copias de los individuos (la ontología una sola vez)"""
+    copiados = individuos(grafo)
+    azar = random.Random(semilla)
+    escalado = Graph()
+    for prefijo, espacio in grafo.namespaces():
+        escalado.bind(prefijo, espacio)
+
+    for copia in range(factor):
+        def renombrar(termino):
+            if copia and termino in copiados:
+                return URIRef(f"{termino}_{copia}")
+            return termino
+
+        desplazamiento = {
+            GEO.lat: azar.uniform(-DESPLAZAMIENTO, DESPLAZAMIENTO) if copia else 0.0,
+            GEO.long: azar.uniform(-DESPLAZAMIENTO, DESPLAZAMIENTO) if copia else 0.0,
+        }
+        for s, p, o in grafo:
+            if s not in copiados:
+                if copia == 0:
+                    escalado.add((s, p, o))
+                continue
+            if desplazamiento.get(p) and isinstance(o, Literal):
+                o = Literal(round(float(o) + desplazamiento[p], 6), datatype=o.datatype)
+            escalado.add((renombrar(s), p, renombrar(o)))
+    return escalado
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano"""
+    ordenados = sorted(valores)
+    rango = max(1, -(-len(ordenados) * p // 100))
+    return ordenados[int(rango) - 1]
+
+
+def _fases(ruta_ttl):
+    """Funciones (sin argumentos) de cada fase; preparan lo que necesitan sin medirlo"""
+    grafo, exito, mensaje = cargar_grafo_desde_url(ruta_ttl)
+    if not exito:
+        raise RuntimeError(mensaje)
+    lugares = extraer_lugares(grafo)
+    tabla = TablaLugares(lugares)
+    indice = indexar_relaciones(grafo)
+
+    def carga():
+        cargar_grafo_desde_url(ruta_ttl)
+
+    def extraccion():
+        extraer_lugares(grafo)
+
+    def relaciones():
+        for lugar in lugares:
+            obtener_relaciones_lugar(grafo, lugar['uri'])
+
+    def popups():
+        for lugar in tabla.con_coords():
+            crear_popup_html(lugar, relaciones_de_lugar(grafo, lugar['uri'], indice))
+
+    def mapa():
+        crear_mapa_interactivo(grafo, tabla, relaciones_lugares=indice).get_root().render()
+
+    info = {
+        'triples': len(grafo),
+        'lugares': len(lugares),
+        'con_coords': int(tabla.mascara_coords().sum()),
+    }
+    return info, {'carga': carga, 'extraccion': extraccion, 'relaciones': relaciones,
+                  'popups': popups, 'mapa': mapa}
+
+
+def medir(funcion, repeticiones=REPETICIONES):
+    """Mediana y p95 (s) de `repeticiones` ejecuciones tras una de calentamiento, y pico de memoria"""
+    funcion()
+    tiempos = []
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        funcion()
+        tiempos.append(time.perf_counter() - inicio)
+
+    tracemalloc.start()
+    try:
+        funcion()
+        _, pico = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'mediana_s': statistics.median(tiempos),
+        'p95_s': percentil(tiempos, 95),
+        'min_s': min(tiempos),
+        'repeticiones': repeticiones,
+        'pico_memoria_bytes': pico,
+    }
+
+
+def ejecutar(ruta_ttl, repeticiones=REPETICIONES, fases=FASES):
+    """Resultados por fase para un TTL"""
+    info, funciones = _fases(ruta_ttl)
+    info['fases'] = {fase: medir(funciones[fase], repeticiones) for fase in fases}
+    return info
+
+
+def _commit():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+            cwd=os.path.dirname(os.path.abspath(__file__)), check=True
+        ).stdout.strip()
+    except Exception:
+        return None
+
+
+def _imprimir(nombre, resultado, anterior=None):
+    print(f"\n{nombre}: {resultado['triples']} triples, {resultado['lugares']} lugares "
+          f"({resultado['con_coords']} con coordenadas)")
+    for fase, datos in resultado['fases'].items():
+        linea = (f"  {fase:>11}: mediana {datos['mediana_s'] * 1000:9.1f} ms  "
+                 f"p95 {datos['p95_s'] * 1000:9.1f} ms  pico {datos['pico_memoria_bytes'] / 1e6:7.1f} MB")
+        previo = (anterior or {}).get('fases', {}).get(fase)
+        if previo and datos['mediana_s']:
+            linea += f"  ({previo['mediana_s'] / datos['mediana_s']:.2f}x frente al anterior)"
+        print(linea)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmarks de carga, extracción, relaciones, popups y mapa")
+    parser.add_argument("--ttl", default=GRAFO_TTL_LOCAL, help="grafo real (data/grafo.ttl)")
+    parser.add_argument("--escalas", default=",".join(str(e) for e in ESCALAS),
+                        help="factores de los grafos escalados (vacío = ninguno)")
+    parser.add_argument("--sinteticos", default="", help="lugares de los grafos generados (generar_grafo.py)")
+    parser.add_argument("--repeticiones", type=int, default=REPETICIONES)
+    parser.add_argument("--fases", default=",".join(FASES))
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--salida", default="benchmark.json")
+    parser.add_argument("--comparar", help="JSON de una ejecución anterior")
+    args = parser.parse_args()
+
+    fases = tuple(f for f in args.fases.split(",") if f)
+    anteriores = {}
+    if args.comparar:
+        with open(args.comparar, encoding="utf-8") as f:
+            anteriores = json.load(f)['grafos']
+
+    resultados = {}
+    resultados['real'] = ejecutar(args.ttl, args.repeticiones, fases)
+    _imprimir('real', resultados['real'], anteriores.get('real'))
+
+    escalas = [int(e) for e in args.escalas.split(",") if e]
+    sinteticos = [int(n) for n in args.sinteticos.split(",") if n]
+    with tempfile.TemporaryDirectory() as directorio:
+        if escalas:
+            original = Graph()
+            original.parse(args.ttl, format="turtle")
+        for factor in escalas:
+            ruta = os.path.join(directorio, f"grafo_x{factor}.ttl")
+            grafo_escalado(original, factor, args.semilla).serialize(ruta, format="turtle")
+            nombre = f"x{factor}"
+            resultados[nombre] = ejecutar(ruta, args.repeticiones, fases)
+            _imprimir(nombre, resultados[nombre], anteriores.get(nombre))
+        for lugares in sinteticos:
+            ruta = os.path.join(directorio, f"sintetico_{lugares}.ttl")
+            generar_grafo(ruta, lugares, ttl_ontologia=args.ttl, semilla=args.semilla)
+            nombre = f"sintetico_{lugares}"
+            resultados[nombre] = ejecutar(ruta, args.repeticiones, fases)
+            _imprimir(nombre, resultados[nombre], anteriores.get(nombre))
+
+    with open(args.salida, "w", encoding="utf-8") as f:
+        json.dump({
+            'fecha': datetime.now().isoformat(timespec='seconds'),
+            'commit': _commit(),
+            'python': platform.python_version(),
+            'semilla': args.semilla,
+            'grafos': resultados,
+        }, f, indent=2, ensure_ascii=False)
+    print(f"\nResultados guardados en {args.salida}")
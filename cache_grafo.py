@@ -0,0 +1,159 @@
+# -*- coding: utf-8 -*-
+"""
+Caché de grafos compartida por todo el proceso de Streamlit.
+
+Streamlit vuelve a ejecutar app.py en cada interacción, pero los módulos
+importados viven mientras dure el proceso: por eso la caché vive aquí y no
+en st.session_state. Todas las sesiones comparten la misma copia del grafo.
+
+- Carga de vuelo único: si varias sesiones piden el mismo grafo en frío,
+  solo una ejecuta el cargador y las demás esperan su resultado.
+- Stale-while-revalidate: pasado el TTL se recarga en segundo plano y,
+  mientras tanto, se sigue sirviendo la copia anterior.
+"""
+
+import itertools
+import os
+import threading
+import time
+
+# Segundos antes de considerar viejo un grafo (recarga en segundo plano)
+TTL_GRAFO = float(os.environ.get("QOYLLUR_GRAFO_TTL", "3600"))
+
+
+class EntradaGrafo:
+    """Valor cargado junto con su versión y fecha de carga"""
+
+    def __init__(self, valor, version, cargado_en):
+        self.valor = valor
+        self.version = version
+        self.cargado_en = cargado_en
+
+    def edad(self):
+        return time.monotonic() - self.cargado_en
+
+
+class _Ranura:
+    """Estado de una clave: entrada vigente y carga en curso"""
+
+    def __init__(self):
+        self.entrada = None
+        self.en_curso = None      # threading.Event de la carga activa
+        self.error = None         # último error de carga
+
+
+class CacheGrafo:
+    """Caché por clave con carga de vuelo único y recarga en segundo plano"""
+
+    def __init__(self, ttl=TTL_GRAFO):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._ranuras = {}
+        # Versiones únicas en todo el proceso (sirven como clave de cachés derivadas)
+        self._versiones = itertools.count(1)
+        self.aciertos = 0
+        self.fallos = 0
+
+    def obtener(self, clave, cargador):
+        """Devuelve la EntradaGrafo de `clave`, cargándola si hace falta.
+
+        `cargador(clave)` debe devolver el valor o lanzar una excepción.
+        En frío la llamada bloquea hasta que termina la (única) carga; si
+        falla, la excepción se propaga a todas las sesiones que esperaban.
+        """
+        with self._lock:
+            ranura = self._ranuras.setdefault(clave, _Ranura())
+            entrada = ranura.entrada
+
+            if entrada is not None:
+                self.aciertos += 1
+                # Servir la copia actual; recargar en segundo plano si es vieja
+                if entrada.edad() >= self.ttl and ranura.en_curso is None:
+                    self._iniciar_carga(clave, ranura, cargador, en_segundo_plano=True)
+                return entrada
+
+            self.fallos += 1
+            evento = ranura.en_curso
+            propia = evento is None
+            if propia:
+                evento = self._iniciar_carga(clave, ranura, cargador, en_segundo_plano=False)
+
+        if propia:
+            self._cargar(clave, ranura, cargador, evento)
+        else:
+            evento.wait()
+
+        with self._lock:
+            if ranura.entrada is None:
+                raise RuntimeError(str(ranura.error) if ranura.error else "Carga fallida")
+            return ranura.entrada
+
+    def invalidar(self, clave=None):
+        """Olvida una clave (o todas); la próxima petición recarga en frío"""
+        with self._lock:
+            if clave is None:
+                self._ranuras.clear()
+            else:
+                self._ranuras.pop(clave, None)
+
+    def estado(self):
+        """Resumen por clave: versión, edad y último error"""
+        with self._lock:
+            return {
+                clave: {
+                    'version': r.entrada.version if r.entrada else None,
+                    'edad': r.entrada.edad() if r.entrada else None,
+                    'recargando': r.en_curso is not None,
+                    'error': str(r.error) if r.error else None,
+                }
+                for clave, r in self._ranuras.items()
+            }
+
+    def estadisticas(self):
+        """Aciertos (había copia) y fallos (carga en frío o espera)"""
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': sum(1 for r in self._ranuras.values() if r.entrada is not None),
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else None,
+            }
+
+    # ---------------------------------------------------------------
+    # Internos
+    # ---------------------------------------------------------------
+
+    def _iniciar_carga(self, clave, ranura, cargador, en_segundo_plano):
+        # Se llama con self._lock tomado
+        evento = threading.Event()
+        ranura.en_curso = evento
+        if en_segundo_plano:
+            hilo = threading.Thread(
+                target=self._cargar,
+                args=(clave, ranura, cargador, evento),
+                name=f"recarga-grafo-{clave}",
+                daemon=True,
+            )
+            hilo.start()
+        return evento
+
+    def _cargar(self, clave, ranura, cargador, evento):
+        try:
+            valor = cargador(clave)
+        except Exception as e:
+            # Si ya había copia se sigue sirviendo; solo se registra el error
+            with self._lock:
+                ranura.error = e
+                ranura.en_curso = None
+        else:
+            with self._lock:
+                ranura.entrada = EntradaGrafo(valor, next(self._versiones), time.monotonic())
+                ranura.error = None
+                ranura.en_curso = None
+        finally:
+            evento.set()
+
+
+# Instancia única del proceso, compartida por todas las sesiones
+CACHE_GRAFO = CacheGrafo()
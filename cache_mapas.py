@@ -0,0 +1,123 @@
+# -*- coding: utf-8 -*-
+"""
+Caché LRU de mapas folium ya construidos, compartida por todas las sesiones.
+
+Cada rerun de Streamlit (aunque cambie un widget que no afecta al mapa)
+volvía a construir el folium.Map completo: capas de teselas, marcadores,
+LayerControl y widget de coordenadas. Aquí se guardan los mapas por clave
+de vista (versión del grafo, tipos, destacados, estilo, zoom, centro...) con
+límite por número de entradas y por bytes de HTML, desalojando el menos
+usado recientemente.
+
+Solo se cachea la construcción de los objetos folium: st_folium recibe el
+mapa y lo vuelve a serializar en cada rerun. Por eso el tamaño de cada
+entrada se estima sin renderizar (plantillas_popup.estimar_bytes_html).
+Si varias sesiones piden a la vez la misma clave ausente, solo una la
+construye y las demás esperan su resultado (como CacheGrafo).
+"""
+
+import os
+import threading
+from collections import OrderedDict
+
+MAX_ENTRADAS_MAPAS = int(os.environ.get("QOYLLUR_CACHE_MAPAS_ENTRADAS", "32"))
+MAX_BYTES_MAPAS = int(os.environ.get("QOYLLUR_CACHE_MAPAS_BYTES", str(64 * 1024 * 1024)))
+
+
+class CacheLRU:
+    """Diccionario LRU acotado por número de entradas y por bytes"""
+
+    def __init__(self, max_entradas=MAX_ENTRADAS_MAPAS, max_bytes=MAX_BYTES_MAPAS):
+        self.max_entradas = max_entradas
+        self.max_bytes = max_bytes
+        self._datos = OrderedDict()      # clave -> (valor, bytes)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._en_curso = {}              # clave -> Event de la construcción en curso
+        self.aciertos = 0
+        self.fallos = 0
+        self.desalojos = 0
+
+    def obtener(self, clave):
+        """Valor de la clave (y la marca como recién usada) o None"""
+        with self._lock:
+            if clave not in self._datos:
+                self.fallos += 1
+                return None
+            self._datos.move_to_end(clave)
+            self.aciertos += 1
+            return self._datos[clave][0]
+
+    def guardar(self, clave, valor, tamaño):
+        """Guarda el valor; desaloja los menos usados si se pasa de los límites"""
+        if tamaño > self.max_bytes:
+            return      # nunca cabría: no se cachea
+        with self._lock:
+            if clave in self._datos:
+                self._bytes -= self._datos.pop(clave)[1]
+            self._datos[clave] = (valor, tamaño)
+            self._bytes += tamaño
+            while len(self._datos) > self.max_entradas or self._bytes > self.max_bytes:
+                _, (_, tamaño_viejo) = self._datos.popitem(last=False)
+                self._bytes -= tamaño_viejo
+                self.desalojos += 1
+
+    def obtener_o_crear(self, clave, constructor, medir):
+        """Devuelve el valor cacheado o lo construye con `constructor()`.
+
+        `medir(valor)` da su tamaño en bytes para el límite de memoria. La
+        construcción es de vuelo único: las demás peticiones de la misma
+        clave esperan y luego leen la caché (si falla, lo intenta la siguiente).
+        """
+        while True:
+            with self._lock:
+                if clave in self._datos:
+                    self._datos.move_to_end(clave)
+                    self.aciertos += 1
+                    return self._datos[clave][0]
+                evento = self._en_curso.get(clave)
+                if evento is None:
+                    self.fallos += 1
+                    evento = self._en_curso[clave] = threading.Event()
+                    break
+            evento.wait()
+
+        try:
+            valor = constructor()
+            self.guardar(clave, valor, medir(valor))
+            return valor
+        finally:
+            with self._lock:
+                del self._en_curso[clave]
+            evento.set()
+
+    def tamaño(self, clave):
+        """Bytes con los que se guardó la clave (None si no está)"""
+        with self._lock:
+            entrada = self._datos.get(clave)
+            return entrada[1] if entrada else None
+
+    def limpiar(self):
+        with self._lock:
+            self._datos.clear()
+            self._bytes = 0
+
+    def estadisticas(self):
+        with self._lock:
+            consultas = self.aciertos + self.fallos
+            return {
+                'entradas': len(self._datos),
+                'bytes': self._bytes,
+                'aciertos': self.aciertos,
+                'fallos': self.fallos,
+                'desalojos': self.desalojos,
+                'tasa_aciertos': self.aciertos / consultas if consultas else None,
+            }
+
+
+# Instancia única del proceso para los mapas renderizados
+CACHE_MAPAS = CacheLRU()
+
+# st_folium modifica los objetos folium que recibe (ids, capa enganchada al
+# mapa); los que vienen de la caché compartida se le pasan con este lock
+LOCK_FOLIUM = threading.Lock()
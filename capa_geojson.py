@@ -0,0 +1,97 @@
+# -*- coding: utf-8 -*-
+"""
+Capa de lugares como una sola FeatureCollection GeoJSON dibujada en canvas.
+
+Con un folium.Marker por punto el mapa lleva, por cada lugar, su icono
+AwesomeMarkers (un nodo DOM), su tooltip y su popup como variables JS
+sueltas. Aquí todos los puntos viajan en un único objeto GeoJSON y se
+pintan como L.circleMarker sobre un renderer canvas. El estilo se decide
+en el navegador a partir de las propiedades de cada feature:
+
+- tipo: tipo general del lugar (o "Grupo" si hay varios en el punto)
+- destacado: si el punto tiene algún lugar destacado por el filtro
+- cantidad: número de lugares en el punto
+- tooltip / popup: textos a mostrar (popup solo si no es diferido)
+
+La tabla de colores por tipo se emite una sola vez por capa.
+"""
+
+from branca.element import MacroElement
+from jinja2 import Template
+
+from plantillas_popup import COLOR_POR_DEFECTO, COLORES_TIPO
+
+# Estilo de los puntos con varios lugares y del realce de destacados
+COLOR_GRUPO = '#e67e22'
+COLOR_DESTACADO = '#ffcc00'
+RADIO_PUNTO = 7
+RADIO_DESTACADO = 11
+
+
+def feature_punto(lat, lon, tipo, tooltip, destacado=False, cantidad=1, popup=None):
+    """Feature GeoJSON de un punto del mapa (uno o varios lugares)"""
+    propiedades = {
+        'tipo': tipo,
+        'tooltip': tooltip,
+        'destacado': destacado,
+        'cantidad': cantidad,
+    }
+    if popup is not None:
+        propiedades['popup'] = popup
+    return {
+        'type': 'Feature',
+        'geometry': {'type': 'Point', 'coordinates': [lon, lat]},
+        'properties': propiedades,
+    }
+
+
+class GeoJsonCanvas(MacroElement):
+    """Capa L.geoJson de puntos en canvas, con estilo según propiedades"""
+
+    _template = Template(
+        """
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = (function() {
+            var colores = {{ this.colores|tojson }};
+            var renderer = L.canvas({padding: 0.5});
+            return L.geoJson({{ this.datos|tojson }}, {
+                pointToLayer: function(feature, latlng) {
+                    var p = feature.properties;
+                    var color = p.cantidad > 1 ? {{ this.color_grupo|tojson }} : (colores[p.tipo] || {{ this.color_defecto|tojson }});
+                    var punto = L.circleMarker(latlng, {
+                        renderer: renderer,
+                        radius: p.destacado ? {{ this.radio_destacado }} : {{ this.radio }},
+                        color: p.destacado ? {{ this.color_destacado|tojson }} : color,
+                        weight: p.destacado ? 3 : 1,
+                        fillColor: color,
+                        fillOpacity: 0.85
+                    });
+                    // El click devuelve el centro del punto, no la posición del ratón
+                    punto.on('click', function(e) { e.latlng = punto.getLatLng(); });
+                    return punto;
+                },
+                onEachFeature: function(feature, layer) {
+                    var p = feature.properties;
+                    layer.bindTooltip(p.tooltip);
+                    if (p.popup) {
+                        layer.bindPopup(p.popup, {maxWidth: p.cantidad > 1 ? {{ this.ancho_grupo }} : {{ this.ancho_lugar }}});
+                    }
+                }
+            });
+        })().addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+        """
+    )
+
+    def __init__(self, features, ancho_lugar, ancho_grupo):
+        super().__init__()
+        self._name = "GeoJsonCanvas"
+        self.datos = {'type': 'FeatureCollection', 'features': features}
+        self.colores = COLORES_TIPO
+        self.color_defecto = COLOR_POR_DEFECTO
+        self.color_grupo = COLOR_GRUPO
+        self.color_destacado = COLOR_DESTACADO
+        self.radio = RADIO_PUNTO
+        self.radio_destacado = RADIO_DESTACADO
+        self.ancho_lugar = ancho_lugar
+        self.ancho_grupo = ancho_grupo
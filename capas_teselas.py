@@ -0,0 +1,86 @@
+# -*- coding: utf-8 -*-
+"""
+Estilos de mapa base (capas de teselas) y su origen.
+
+Por defecto cada estilo apunta a su servidor público (ArcGIS, OpenTopoMap,
+OpenStreetMap, CartoDB). Si se define QOYLLUR_TESELAS_LOCALES con la URL
+del servidor local (servidor_teselas.py), los estilos que tienen su
+<id>.mbtiles en el directorio de teselas piden las teselas a ese servidor;
+el resto (p. ej. los que no se precargan por la política de su origen)
+siguen en el servidor público:
+
+    QOYLLUR_TESELAS_LOCALES=http://localhost:8765 streamlit run app.py
+"""
+
+import os
+
+from servidor_teselas import DIRECTORIO_TESELAS
+
+# URL base del servidor local de teselas ("" = usar los servidores públicos)
+URL_TESELAS_LOCALES = os.environ.get("QOYLLUR_TESELAS_LOCALES", "").rstrip("/")
+
+# Configuración de estilos de mapa. `id` nombra el fichero <id>.mbtiles y la
+# ruta en el servidor local; `origen` es la plantilla {z}/{x}/{y} pública y
+# `formato` el de sus teselas. `precarga` indica si la política de uso del
+# origen admite la descarga masiva (precargar_teselas.py): OpenStreetMap y
+# OpenTopoMap la prohíben, y los términos de Esri World Imagery restringen
+# la descarga masiva y el uso sin conexión fuera de sus productos.
+TILE_LAYERS_ORIGEN = {
+    "Relieve": {
+        "id": "relieve",
+        "tiles": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+        "origen": "https://server.arcgisonline.com/ArcGIS/rest/services/World_Imagery/MapServer/tile/{z}/{y}/{x}",
+        "attr": "Esri, Maxar, Earthstar Geographics",
+        "name": "Imagen satelital",
+        "formato": "jpg",
+        "precarga": False
+    },
+    "Topográfico": {
+        "id": "topografico",
+        "tiles": "https://{s}.tile.opentopomap.org/{z}/{x}/{y}.png",
+        "origen": "https://a.tile.opentopomap.org/{z}/{x}/{y}.png",
+        "attr": "OpenTopoMap",
+        "name": "Mapa topográfico",
+        "formato": "png",
+        "precarga": False
+    },
+    "Mapa básico": {
+        "id": "basico",
+        "tiles": "OpenStreetMap",
+        "origen": "https://tile.openstreetmap.org/{z}/{x}/{y}.png",
+        "attr": "OpenStreetMap",
+        "name": "Mapa básico",
+        "formato": "png",
+        "precarga": False
+    },
+    "Claro": {
+        "id": "claro",
+        "tiles": "https://cartodb-basemaps-{s}.global.ssl.fastly.net/light_all/{z}/{x}/{y}.png",
+        "origen": "https://cartodb-basemaps-a.global.ssl.fastly.net/light_all/{z}/{x}/{y}.png",
+        "attr": "CartoDB",
+        "name": "Claro",
+        "formato": "png",
+        "precarga": True
+    }
+}
+
+
+def url_local(id_estilo, base=None):
+    """Plantilla {z}/{x}/{y} de un estilo en el servidor local"""
+    return f"{base or URL_TESELAS_LOCALES}/{id_estilo}/{{z}}/{{x}}/{{y}}"
+
+
+def capas_teselas(base_local=None, directorio=None):
+    """Estilos de mapa con las URLs efectivas
+
+    Con servidor local configurado, un estilo va a ese servidor solo si su
+    <id>.mbtiles existe en `directorio` (DIRECTORIO_TESELAS por defecto).
+    """
+    base_local = URL_TESELAS_LOCALES if base_local is None else base_local.rstrip("/")
+    directorio = directorio or DIRECTORIO_TESELAS
+    capas = {}
+    for estilo, config in TILE_LAYERS_ORIGEN.items():
+        capas[estilo] = dict(config)
+        if base_local and os.path.exists(os.path.join(directorio, f"{config['id']}.mbtiles")):
+            capas[estilo]["tiles"] = url_local(config["id"], base_local)
+    return capas
@@ -0,0 +1,268 @@
+# -*- coding: utf-8 -*-
+"""
+Registro de consultas SPARQL preparadas que usa la aplicación.
+
+Cada consulta se registra una vez con un nombre y se compila con
+rdflib.plugins.sparql.prepareQuery la primera vez que se usa. Las
+ejecuciones reciben los valores variables (por ejemplo ?lugar) como
+initBindings, así que el parseo y la traducción a álgebra se pagan una
+sola vez por proceso en lugar de en cada llamada.
+
+El registro lleva por separado el tiempo de parseo de cada consulta y el
+tiempo acumulado de evaluación, además de las filas devueltas y los errores.
+Las ejecuciones que superan QOYLLUR_CONSULTA_LENTA_MS (100 ms por defecto)
+y las que fallan quedan en dos registros circulares con la consulta, los
+valores vinculados y la duración. Los errores se anotan y se relanzan.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+from rdflib.plugins.sparql import prepareQuery
+
+PREFIJOS = {
+    "": "http://example.org/festividades#",
+    "geo": "http://www.w3.org/2003/01/geo/wgs84_pos#",
+    "rdfs": "http://www.w3.org/2000/01/rdf-schema#",
+    "rdf": "http://www.w3.org/1999/02/22-rdf-syntax-ns#",
+}
+
+# Umbral de consulta lenta y tamaño de los registros circulares
+UMBRAL_LENTA_S = float(os.environ.get("QOYLLUR_CONSULTA_LENTA_MS", "100")) / 1000
+MAX_REGISTRO = 200
+
+
+class ConsultaRegistrada:
+    """Texto de una consulta, su forma preparada y sus tiempos"""
+
+    def __init__(self, nombre, texto):
+        self.nombre = nombre
+        self.texto = texto
+        self.preparada = None
+        self.tiempo_parseo = None
+        self.ejecuciones = 0
+        self.tiempo_evaluacion = 0.0
+        self.tiempo_maximo = 0.0
+        self.filas = 0
+        self.errores = 0
+        self.lentas = 0
+
+
+class RegistroConsultas:
+    """Consultas SPARQL con nombre, preparadas una vez por proceso"""
+
+    def __init__(self, prefijos=None, umbral_lenta_s=UMBRAL_LENTA_S, max_registro=MAX_REGISTRO):
+        self.prefijos = dict(prefijos or PREFIJOS)
+        self.umbral_lenta_s = umbral_lenta_s
+        self._consultas = {}
+        self._lock = threading.Lock()
+        self._lentas = deque(maxlen=max_registro)
+        self._errores = deque(maxlen=max_registro)
+
+    def registrar(self, nombre, texto):
+        if nombre in self._consultas:
+            raise ValueError(f"Consulta ya registrada: {nombre}")
+        self._consultas[nombre] = ConsultaRegistrada(nombre, texto)
+
+    def nombres(self):
+        return list(self._consultas)
+
+    def preparar(self, nombre):
+        """Devuelve la consulta preparada, compilándola si es la primera vez"""
+        consulta = self._consultas[nombre]
+        if consulta.preparada is None:
+            with self._lock:
+                if consulta.preparada is None:
+                    inicio = time.perf_counter()
+                    preparada = prepareQuery(consulta.texto, initNs=self.prefijos)
+                    consulta.tiempo_parseo = time.perf_counter() - inicio
+                    consulta.preparada = preparada
+        return consulta.preparada
+
+    def preparar_todas(self):
+        for nombre in self._consultas:
+            self.preparar(nombre)
+
+    def ejecutar(self, grafo, nombre, **vinculos):
+        """Evalúa la consulta `nombre` sobre `grafo` y devuelve la lista de filas.
+
+        Los argumentos con nombre se pasan como initBindings (?lugar=URIRef(...)).
+        Si la evaluación falla, el error se anota en el registro y se relanza.
+        """
+        preparada = self.preparar(nombre)
+        consulta = self._consultas[nombre]
+
+        inicio = time.perf_counter()
+        filas = None
+        error = None
+        try:
+            filas = list(grafo.query(preparada, initBindings=vinculos or None))
+            return filas
+        except Exception as e:
+            error = e
+            raise
+        finally:
+            duracion = time.perf_counter() - inicio
+            self._anotar(consulta, vinculos, duracion, filas, error)
+
+    def _anotar(self, consulta, vinculos, duracion, filas, error):
+        lenta = duracion >= self.umbral_lenta_s
+        entrada = None
+        if lenta or error is not None:
+            entrada = {
+                'momento': time.time(),
+                'consulta': consulta.nombre,
+                'vinculos': {variable: str(valor) for variable, valor in vinculos.items()},
+                'duracion_s': duracion,
+                'filas': len(filas) if filas is not None else None,
+                'error': f"{type(error).__name__}: {error}" if error is not None else None,
+            }
+        with self._lock:
+            consulta.ejecuciones += 1
+            consulta.tiempo_evaluacion += duracion
+            consulta.tiempo_maximo = max(consulta.tiempo_maximo, duracion)
+            if filas is not None:
+                consulta.filas += len(filas)
+            if error is not None:
+                consulta.errores += 1
+                self._errores.append(entrada)
+            if lenta:
+                consulta.lentas += 1
+                self._lentas.append(entrada)
+
+    def consultas_lentas(self):
+        """Últimas ejecuciones por encima del umbral (la más reciente al final)"""
+        with self._lock:
+            return list(self._lentas)
+
+    def errores(self):
+        """Últimas ejecuciones que lanzaron una excepción"""
+        with self._lock:
+            return list(self._errores)
+
+    def estadisticas(self):
+        """Tiempos, filas, errores y ejecuciones lentas por consulta"""
+        with self._lock:
+            return {
+                c.nombre: {
+                    'preparada': c.preparada is not None,
+                    'parseo_s': c.tiempo_parseo,
+                    'ejecuciones': c.ejecuciones,
+                    'evaluacion_total_s': c.tiempo_evaluacion,
+                    'evaluacion_media_s': (c.tiempo_evaluacion / c.ejecuciones
+                                           if c.ejecuciones else None),
+                    'evaluacion_max_s': c.tiempo_maximo,
+                    'filas': c.filas,
+                    'errores': c.errores,
+                    'lentas': c.lentas,
+                }
+                for c in self._consultas.values()
+            }
+
+
+# -------------------------------------------------------------------
+# CONSULTAS DE LA APLICACIÓN
+# -------------------------------------------------------------------
+
+REGISTRO = RegistroConsultas()
+
+# Eventos que ocurren en un lugar específico (?lugar)
+REGISTRO.registrar("eventos_lugar", """
+    SELECT DISTINCT ?nombre ?descripcion
+    WHERE {
+      ?evento a :EventoRitual ;
+              rdfs:label ?nombre ;
+              :estaEnLugar ?lugar .
+      OPTIONAL { ?evento :descripcionBreve ?descripcion . }
+    }
+    ORDER BY ?nombre
+""")
+
+# Festividades que se celebran en un lugar específico (?lugar)
+REGISTRO.registrar("festividades_lugar", """
+    SELECT DISTINCT ?nombre ?descripcion
+    WHERE {
+      ?festividad a :Festividad ;
+                  rdfs:label ?nombre ;
+                  :SeCelebraEn ?lugar .
+      OPTIONAL { ?festividad :descripcionBreve ?descripcion . }
+    }
+    ORDER BY ?nombre
+""")
+
+# Recursos multimedia que documentan un lugar (?lugar)
+REGISTRO.registrar("recursos_lugar", """
+    SELECT DISTINCT ?codigo
+    WHERE {
+      ?recurso a :RecursoMedial ;
+               :documentaA ?lugar ;
+               :codigoRecurso ?codigo .
+    }
+    LIMIT 5
+""")
+
+# Todos los lugares con sus atributos principales
+CONSULTA_LUGARES = """
+    SELECT DISTINCT ?uri
+           (MIN(?nombre) as ?primerNombre)
+           ?lat ?lon
+           (MIN(?tipoEspecifico) as ?primerTipoEspe)
+           ?tipoGeneral
+           (MIN(?descBreve) as ?primerDesc)
+           (MIN(?nivelEmbeddings) as ?primerNivel)
+           (MIN(?nombreUbicadoEn) as ?primerUbicadoEn)
+    WHERE {
+      ?uri rdf:type/rdfs:subClassOf* :Lugar ;
+           rdfs:label ?nombre .
+
+      OPTIONAL { ?uri geo:lat ?lat ; geo:long ?lon . }
+
+      OPTIONAL {
+        ?uri rdf:type ?tipoEspe .
+        FILTER(?tipoEspe != :Lugar)
+        ?tipoEspe rdfs:label ?tipoEspecifico .
+      }
+
+      BIND(
+        IF(EXISTS{?uri rdf:type :Localidad}, "Localidad",
+          IF(EXISTS{?uri rdf:type :Glaciar}, "Glaciar",
+            IF(EXISTS{?uri rdf:type :Santuario}, "Santuario",
+              IF(EXISTS{?uri rdf:type :Iglesia}, "Iglesia",
+                IF(EXISTS{?uri rdf:type :Ruta}, "Ruta", "Lugar")
+              )
+            )
+          )
+        ) AS ?tipoGeneral
+      )
+
+      OPTIONAL { ?uri :descripcionBreve ?descBreve . }
+      OPTIONAL { ?uri :nivelEmbeddings ?nivelEmbeddings . }
+      OPTIONAL {
+        ?uri :ubicadoEn ?ubicadoEn .
+        ?ubicadoEn rdfs:label ?nombreUbicadoEn .
+      }
+    }
+    GROUP BY ?uri ?lat ?lon ?tipoGeneral
+    ORDER BY ?tipoGeneral ?primerNombre
+"""
+REGISTRO.registrar("lugares", CONSULTA_LUGARES)
+
+# Misma consulta sobre un grafo con RDFS materializado (inferencia_rdfs):
+# el tipo :Lugar ya está explícito y sobra la ruta transitiva, y el tipo
+# específico descarta las superclases propagadas de otro tipo del lugar
+REGISTRO.registrar("lugares_inferido",
+                   CONSULTA_LUGARES
+                   .replace("rdf:type/rdfs:subClassOf* :Lugar", "rdf:type :Lugar")
+                   .replace("FILTER(?tipoEspe != :Lugar)", """FILTER(?tipoEspe != :Lugar)
+        FILTER NOT EXISTS {
+          ?uri rdf:type ?otroTipo .
+          ?otroTipo rdfs:subClassOf ?tipoEspe .
+          FILTER(?otroTipo != ?tipoEspe)
+        }"""))
+
+
+def ejecutar_consulta(grafo, nombre, **vinculos):
+    """Atajo sobre el registro de la aplicación"""
+    return REGISTRO.ejecutar(grafo, nombre, **vinculos)
@@ -0,0 +1,261 @@
+# -*- coding: utf-8 -*-
+"""
+Carga del grafo y consultas relacionales de los lugares.
+
+Funciones sin dependencia de Streamlit: las usa app.py y se pueden
+importar desde scripts (benchmarks, precarga, prerender).
+"""
+
+import os
+
+from rdflib import Graph, Namespace, URIRef
+
+from agregacion_geohash import AgregacionGeohash
+from consultas_sparql import ejecutar_consulta
+from indice_espacial import IndiceEspacial
+from indice_facetas import IndiceFacetas
+from inferencia_rdfs import INFERENCIA_RDFS, materializar_rdfs
+from lugares_grafo import bytes_objetos, extraer_lugares
+from metricas import Cronometro
+from plantillas_popup import documento_popup, fragmento_popup_grupo, fragmento_popup_lugar
+from snapshot_grafo import cargar_snapshot
+from tabla_lugares import TablaLugares
+
+# URL del grafo TTL
+TTL_URL = "https://raw.githubusercontent.com/javier-vz/kg-llm/main/data/grafo.ttl"
+
+# Copia local del grafo: se compila a snapshot binario (.qkg) y se abre con mmap.
+# Si no existe, se descarga y parsea el TTL desde TTL_URL.
+GRAFO_TTL_LOCAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "grafo.ttl")
+FUENTE_GRAFO = GRAFO_TTL_LOCAL if os.path.exists(GRAFO_TTL_LOCAL) else TTL_URL
+
+# Namespaces
+EX = Namespace("http://example.org/festividades#")
+GEO = Namespace("http://www.w3.org/2003/01/geo/wgs84_pos#")
+RDFS = Namespace("http://www.w3.org/2000/01/rdf-schema#")
+RDF = Namespace("http://www.w3.org/1999/02/22-rdf-syntax-ns#")
+
+# -------------------------------------------------------------------
+# FUNCIONES DE CONSULTA RELACIONAL
+# -------------------------------------------------------------------
+
+def obtener_relaciones_lugar(grafo, uri_lugar):
+    """Obtiene relaciones para un lugar.
+
+    Una consulta que falla deja vacía su sección del popup; las duraciones,
+    las filas y los errores de cada consulta se anotan en
+    consultas_sparql.REGISTRO (ver REGISTRO.errores()).
+    """
+    
+    relaciones = _relaciones_vacias()
+    
+    lugar = URIRef(uri_lugar)
+    
+    # 1. Eventos que ocurren en ESTE lugar específico
+    try:
+        for row in ejecutar_consulta(grafo, "eventos_lugar", lugar=lugar):
+            relaciones['eventos'].append({
+                'nombre': str(row.nombre),
+                'descripcion': str(row.descripcion) if row.descripcion else None
+            })
+    except Exception:
+        pass
+    
+    # 2. Festividades que se celebran en ESTE lugar específico
+    try:
+        for row in ejecutar_consulta(grafo, "festividades_lugar", lugar=lugar):
+            relaciones['festividades'].append({
+                'nombre': str(row.nombre),
+                'descripcion': str(row.descripcion) if row.descripcion else None
+            })
+    except Exception:
+        pass
+    
+    # 3. Recursos multimedia que documentan ESTE lugar
+    try:
+        for row in ejecutar_consulta(grafo, "recursos_lugar", lugar=lugar):
+            codigo = str(row.codigo)
+            relaciones['recursos'].append({
+                'codigo': codigo,
+                'tipo': _tipo_recurso(codigo),
+                'ruta': ""
+            })
+    except Exception:
+        pass
+    
+    return relaciones
+
+def _relaciones_vacias():
+    return {
+        'eventos': [],
+        'festividades': [],
+        'recursos': [],
+        'ubicado_en': [],
+        'rutas': [],
+        'naciones': []
+    }
+
+def _tipo_recurso(codigo):
+    if "-FOTO-" in codigo: return "Foto"
+    if "-VID-" in codigo: return "Video"
+    if "-AUD-" in codigo: return "Audio"
+    if "-DOC-" in codigo: return "Documento"
+    return "Recurso"
+
+def _nombres_y_descripciones(grafo, sujeto):
+    """Filas (nombre, descripcion) distintas de un sujeto, como en los SELECT DISTINCT"""
+    descripciones = [str(d) if d else None for d in grafo.objects(sujeto, EX.descripcionBreve)] or [None]
+    filas = []
+    for nombre in grafo.objects(sujeto, RDFS.label):
+        for descripcion in descripciones:
+            fila = {'nombre': str(nombre), 'descripcion': descripcion}
+            if fila not in filas:
+                filas.append(fila)
+    return filas
+
+def indexar_relaciones(grafo):
+    """Índice URI de lugar -> relaciones, construido en una sola pasada.
+    
+    Equivale a llamar obtener_relaciones_lugar para cada lugar, pero recorre
+    cada propiedad (:estaEnLugar, :SeCelebraEn, :documentaA) una sola vez.
+    """
+    indice = {}
+    
+    def relaciones_de(lugar):
+        uri = str(lugar)
+        if uri not in indice:
+            indice[uri] = _relaciones_vacias()
+        return indice[uri]
+    
+    # 1. Eventos por lugar
+    for evento, lugar in grafo.subject_objects(EX.estaEnLugar):
+        if (evento, RDF.type, EX.EventoRitual) in grafo:
+            eventos = relaciones_de(lugar)['eventos']
+            eventos.extend(f for f in _nombres_y_descripciones(grafo, evento) if f not in eventos)
+    
+    # 2. Festividades por lugar
+    for festividad, lugar in grafo.subject_objects(EX.SeCelebraEn):
+        if (festividad, RDF.type, EX.Festividad) in grafo:
+            festividades = relaciones_de(lugar)['festividades']
+            festividades.extend(f for f in _nombres_y_descripciones(grafo, festividad) if f not in festividades)
+    
+    # 3. Recursos multimedia por lugar (máximo 5, como en la consulta)
+    for recurso, lugar in grafo.subject_objects(EX.documentaA):
+        if (recurso, RDF.type, EX.RecursoMedial) in grafo:
+            recursos = relaciones_de(lugar)['recursos']
+            for codigo in grafo.objects(recurso, EX.codigoRecurso):
+                codigo = str(codigo)
+                if len(recursos) < 5 and all(r['codigo'] != codigo for r in recursos):
+                    recursos.append({'codigo': codigo, 'tipo': _tipo_recurso(codigo), 'ruta': ""})
+    
+    for relaciones in indice.values():
+        relaciones['eventos'].sort(key=lambda e: e['nombre'])
+        relaciones['festividades'].sort(key=lambda f: f['nombre'])
+    
+    return indice
+
+def relaciones_de_lugar(grafo, uri_lugar, indice=None):
+    """Relaciones de un lugar: del índice precalculado si existe, si no por SPARQL"""
+    if indice is None:
+        return obtener_relaciones_lugar(grafo, uri_lugar)
+    return indice.get(uri_lugar) or _relaciones_vacias()
+
+def crear_popup_html(lugar, relaciones):
+    """Crea HTML enriquecido para el popup con relaciones (documento autónomo)"""
+    return documento_popup(fragmento_popup_lugar(lugar, relaciones))
+
+def crear_popup_grupo_html(lugares, lat, lon, lugares_destacados_uris=()):
+    """Crea el HTML del popup para varios lugares en la misma ubicación (documento autónomo)"""
+    return documento_popup(fragmento_popup_grupo(lugares, lat, lon, lugares_destacados_uris))
+
+# -------------------------------------------------------------------
+# FUNCIONES PRINCIPALES
+# -------------------------------------------------------------------
+
+def cargar_grafo_desde_url(url):
+    """Carga el grafo TTL desde una URL"""
+    try:
+        grafo = Graph()
+        grafo.parse(url, format="turtle")
+        return grafo, True, f"Grafo cargado: {len(grafo)} triples"
+    except Exception as e:
+        return None, False, f"Error: {str(e)}"
+
+def cargar_grafo_desde_snapshot(ruta_ttl):
+    """Abre el snapshot binario del TTL local (lo recompila si el TTL es más nuevo)"""
+    try:
+        grafo = cargar_snapshot(ruta_ttl)
+        return grafo, True, f"Grafo cargado: {len(grafo)} triples"
+    except Exception as e:
+        return None, False, f"Error: {str(e)}"
+
+def cargar_datos_grafo(fuente):
+    """Cargador para la caché compartida: grafo y lugares extraídos
+    
+    'tiempos' guarda la duración de cada paso de la carga (panel de depuración).
+    """
+    cronometro = Cronometro()
+    exito = False
+    with cronometro.fase("parseo_grafo"):
+        if os.path.exists(fuente):
+            grafo, exito, mensaje = cargar_grafo_desde_snapshot(fuente)
+        if not exito:
+            # Sin snapshot (p. ej. disco de solo lectura): parseo Turtle directo
+            grafo, exito, mensaje = cargar_grafo_desde_url(fuente)
+    if not exito:
+        raise RuntimeError(mensaje)
+    
+    # Inferencias RDFS opcionales, una vez por versión del grafo
+    with cronometro.fase("inferencia_rdfs"):
+        inferencia = materializar_rdfs(grafo) if INFERENCIA_RDFS else None
+    
+    with cronometro.fase("extraer_lugares"):
+        lugares = extraer_lugares(grafo, inferido=inferencia is not None)
+        tabla = TablaLugares(lugares)
+    
+    with cronometro.fase("indices"):
+        facetas = IndiceFacetas(tabla)
+        agregacion = AgregacionGeohash(tabla)
+        indice_espacial = IndiceEspacial(lugares)
+    
+    with cronometro.fase("indexar_relaciones"):
+        relaciones = indexar_relaciones(grafo)
+    
+    return {
+        'grafo': grafo,
+        'lugares': tabla,
+        'facetas': facetas,
+        'agregacion': agregacion,
+        'relaciones': relaciones,
+        'indice_espacial': indice_espacial,
+        'inferencia': inferencia,
+        'tiempos': {nombre: segundos for nombre, (segundos, _) in cronometro.fases.items()}
+    }
+
+def memoria_lugares(datos):
+    """Bytes que retiene cargar_datos_grafo para los lugares
+
+    Cuenta las columnas de la TablaLugares y los registros Lugar del índice
+    espacial, con cada objeto (cadenas internadas incluidas) una sola vez.
+    """
+    vistos = set()
+    df = datos['lugares'].df
+    tabla = int(df.index.memory_usage())
+    for columna in df.columns:
+        serie = df[columna]
+        if serie.dtype == object:
+            tabla += int(serie.memory_usage(index=False)) + bytes_objetos(serie.tolist(), vistos)
+        else:
+            tabla += int(serie.memory_usage(index=False, deep=True))
+    
+    indice = 0
+    for lugar in datos['indice_espacial'].registros():
+        indice += bytes_objetos((lugar, *lugar.values()), vistos)
+    
+    total = tabla + indice
+    return {
+        'tabla': tabla,
+        'indice_espacial': indice,
+        'total': total,
+        'por_lugar': total / len(df) if len(df) else 0,
+    }
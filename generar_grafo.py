@@ -0,0 +1,276 @@
+# -*- coding: utf-8 -*-
+"""
+Generador de grafos sintéticos conformes a la ontología de grafo.ttl.
+
+El grafo real tiene unas decenas de lugares; para ver cómo se comporta la
+app con 10k o 1M triples se generan grafos con el mismo vocabulario:
+
+- La ontología (clases, propiedades) se copia tal cual de data/grafo.ttl.
+- Lugares de las subclases de :Lugar (:Localidad, :Santuario, :Glaciar,
+  :Iglesia...) con rdfs:label, :descripcionBreve, :nivelEmbeddings y, según
+  la proporción pedida, geo:lat/geo:long dentro de una caja andina (Cusco).
+  Las localidades son la raíz de una jerarquía :ubicadoEn; el resto cuelga
+  de una localidad o de otro lugar y queda cerca de su contenedor.
+- Una proporción de los lugares con coordenadas repite exactamente las de
+  otro lugar (como la Iglesia de Paucartambo y Paucartambo).
+- :Festividad con :SeCelebraEn e :incluyeEvento, :EventoRitual con
+  :estaEnLugar y recursos (:Foto, :Video... y :RecursoMedial) con
+  :documentaA y :codigoRecurso.
+
+Con la misma semilla y parámetros la salida es idéntica. Los triples se
+escriben en streaming (Turtle o N-Triples), sin construir el grafo en memoria.
+
+Uso:
+    python generar_grafo.py [--lugares 1000 | --triples 1000000]
+        [--coordenadas 0.8] [--duplicados 0.1] [--eventos 0.5]
+        [--recursos 1.0] [--semilla 2026] [--formato turtle|nt]
+        [--salida grafo_sintetico.ttl]
+"""
+
+import argparse
+import os
+import random
+import sys
+from datetime import date, timedelta
+
+from rdflib import Graph, Literal, Namespace, URIRef
+from rdflib.namespace import OWL, RDF, RDFS, XSD, NamespaceManager
+
+EX = Namespace("http://example.org/festividades#")
+GEO = Namespace("http://www.w3.org/2003/01/geo/wgs84_pos#")
+
+GRAFO_TTL_LOCAL = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "grafo.ttl")
+
+# Caja andina (sur, oeste, norte, este): Cusco, de Paucartambo al Ausangate
+CAJA_ANDINA = (-14.2, -72.3, -12.8, -70.8)
+
+# Dispersión (grados) de un lugar alrededor de su contenedor
+DISPERSION = 0.02
+
+SEMILLA = 2026
+LUGARES = 1000
+COORDENADAS = 0.8
+DUPLICADOS = 0.1
+EVENTOS_POR_LUGAR = 0.5
+RECURSOS_POR_LUGAR = 1.0
+LUGARES_POR_FESTIVIDAD = 200
+
+# Subclase de :Lugar -> peso; las localidades son la raíz de la jerarquía
+CLASES_LUGAR = {
+    'Localidad': 10, 'Lugar': 25, 'LugarDePaso': 15, 'LugarRitual': 10, 'Iglesia': 18,
+    'Santuario': 4, 'Glaciar': 4, 'Ruta': 4,
+}
+CLASES_RECURSO = {'Foto': 70, 'Video': 15, 'Audio': 10, 'DocumentoTexto': 5}
+CODIGO_RECURSO = {'Foto': 'FOTO', 'Video': 'VID', 'Audio': 'AUD', 'DocumentoTexto': 'DOC'}
+NIVELES = {'A': 25, 'B': 65, 'C': 10}
+
+_SILABAS = ("qoy", "llur", "pau", "car", "tam", "bo", "si", "na", "ka", "ra", "col", "que", "pun", "ku",
+            "hua", "ya", "ni", "ccat", "cca", "mo", "llo", "mar", "chal", "la", "pa", "ta", "yan", "ci")
+
+TIPOS_ONTOLOGIA = {
+    OWL.Class, OWL.ObjectProperty, OWL.DatatypeProperty, OWL.AnnotationProperty,
+    OWL.Ontology, RDFS.Class, RDF.Property,
+}
+
+
+def individuos(grafo):
+    """Sujetos con un rdf:type que no es de la ontología (clases, propiedades)"""
+    return {
+        s for s, tipo in grafo.subject_objects(RDF.type)
+        if isinstance(s, URIRef) and tipo not in TIPOS_ONTOLOGIA
+    }
+
+
+def ontologia(grafo):
+    """Grafo con los triples de la ontología (todo salvo los individuos)"""
+    excluidos = individuos(grafo)
+    resultado = Graph()
+    for prefijo, espacio in grafo.namespaces():
+        resultado.bind(prefijo, espacio)
+    for triple in grafo:
+        if triple[0] not in excluidos:
+            resultado.add(triple)
+    return resultado
+
+
+def _elegir(azar, pesos):
+    return azar.choices(list(pesos), weights=list(pesos.values()))[0]
+
+
+def _nombre(azar):
+    return "".join(azar.choice(_SILABAS) for _ in range(azar.randint(2, 4))).capitalize()
+
+
+def _texto(valor):
+    return Literal(valor, lang="es")
+
+
+def _decimal(valor):
+    return Literal(f"{valor:.6f}", datatype=XSD.decimal)
+
+
+def generar(lugares=LUGARES, coordenadas=COORDENADAS, duplicados=DUPLICADOS,
+            eventos=EVENTOS_POR_LUGAR, recursos=RECURSOS_POR_LUGAR, semilla=SEMILLA):
+    """Individuos sintéticos: genera (sujeto, [(predicado, objeto), ...])"""
+    azar = random.Random(semilla)
+    sur, oeste, norte, este = CAJA_ANDINA
+
+    # Lugares: (uri, clase, coordenadas o None)
+    creados = []
+    localidades = []
+    for i in range(lugares):
+        clase = 'Localidad' if not localidades else _elegir(azar, CLASES_LUGAR)
+        uri = EX[f"Sint{clase}_{i:07d}"]
+        nombre = _nombre(azar)
+        contenedor = None
+        if clase != 'Localidad':
+            # Cuelga de una localidad o, a veces, de otro lugar (segundo nivel)
+            contenedor = azar.choice(localidades) if azar.random() < 0.7 or len(creados) < 2 \
+                else azar.choice(creados[-50:])
+
+        coords = None
+        if azar.random() < coordenadas:
+            base = contenedor[2] if contenedor and contenedor[2] else None
+            if azar.random() < duplicados:
+                # Mismas coordenadas que el contenedor o que un lugar reciente
+                previos = [c[2] for c in creados[-50:] if c[2]]
+                coords = base or (azar.choice(previos) if previos else None)
+            if coords is None and base:
+                coords = (min(norte, max(sur, base[0] + azar.uniform(-DISPERSION, DISPERSION))),
+                          min(este, max(oeste, base[1] + azar.uniform(-DISPERSION, DISPERSION))))
+            elif coords is None:
+                coords = (azar.uniform(sur, norte), azar.uniform(oeste, este))
+
+        propiedades = [
+            (RDF.type, EX[clase]),
+            (RDFS.label, _texto(f"{clase} {nombre}")),
+            (EX.descripcionBreve, _texto(f"Lugar sintético {nombre} ({clase}) para pruebas de escala.")),
+            (EX.nivelEmbeddings, Literal(_elegir(azar, NIVELES))),
+        ]
+        if coords:
+            propiedades += [(GEO.lat, _decimal(coords[0])), (GEO.long, _decimal(coords[1]))]
+        if contenedor:
+            propiedades.append((EX.ubicadoEn, contenedor[0]))
+        yield uri, propiedades
+
+        registro = (uri, clase, coords)
+        creados.append(registro)
+        if clase == 'Localidad':
+            localidades.append(registro)
+
+    # Festividades, que se celebran en algunas localidades
+    festividades = []
+    for i in range(max(1, lugares // LUGARES_POR_FESTIVIDAD)):
+        uri = EX[f"SintFestividad_{i:05d}"]
+        festividades.append(uri)
+        nombre = _nombre(azar)
+        yield uri, [
+            (RDF.type, EX.Festividad),
+            (RDFS.label, _texto(f"Festividad de {nombre}")),
+            (EX.descripcionBreve, _texto(f"Festividad sintética de {nombre}.")),
+            (EX.nivelEmbeddings, Literal("A")),
+        ] + [(EX.SeCelebraEn, l[0]) for l in azar.sample(localidades, min(3, len(localidades)))]
+
+    # Eventos rituales en uno o dos lugares, incluidos en una festividad
+    inicio = date(2025, 6, 1)
+    for i in range(int(lugares * eventos)):
+        uri = EX[f"SintEvento_{i:07d}"]
+        nombre = _nombre(azar)
+        yield uri, [
+            (RDF.type, EX.EventoRitual),
+            (RDFS.label, _texto(f"Evento ritual {nombre}")),
+            (EX.descripcionBreve, _texto(f"Evento ritual sintético {nombre}.")),
+            (EX.nivelEmbeddings, Literal(_elegir(azar, NIVELES))),
+        ] + [(EX.estaEnLugar, l[0]) for l in azar.sample(creados, min(azar.randint(1, 2), len(creados)))]
+        yield azar.choice(festividades), [(EX.incluyeEvento, uri)]
+
+    # Recursos mediales que documentan uno o dos lugares
+    for i in range(int(lugares * recursos)):
+        clase = _elegir(azar, CLASES_RECURSO)
+        codigo = f"SINT-{CODIGO_RECURSO[clase]}-{i:07d}"
+        uri = EX[f"Sint{clase}_{i:07d}"]
+        fecha = inicio + timedelta(days=azar.randrange(60))
+        yield uri, [
+            (RDF.type, EX[clase]),
+            (RDF.type, EX.RecursoMedial),
+            (RDFS.label, _texto(f"{clase}: registro {i}")),
+            (EX.codigoRecurso, Literal(codigo)),
+            (EX.rutaArchivo, Literal(f"{codigo.lower()}.dat")),
+            (EX.fechaCaptura, Literal(fecha.isoformat(), datatype=XSD.date)),
+        ] + [(EX.documentaA, l[0]) for l in azar.sample(creados, min(azar.randint(1, 2), len(creados)))]
+
+
+def escribir(salida, entidades, tbox, formato="turtle"):
+    """Escribe la ontología y los individuos; devuelve el número de triples"""
+    prefijos = (("", EX), ("geo", GEO), ("rdf", RDF), ("rdfs", RDFS), ("owl", OWL), ("xsd", XSD))
+    gestor = NamespaceManager(Graph())
+    for prefijo, espacio in prefijos:
+        gestor.bind(prefijo, espacio, override=True, replace=True)
+
+    triples = len(tbox)
+    if formato == "nt":
+        salida.write(tbox.serialize(format="nt"))
+        for sujeto, propiedades in entidades:
+            for predicado, objeto in propiedades:
+                salida.write(f"{sujeto.n3()} {predicado.n3()} {objeto.n3()} .\n")
+            triples += len(propiedades)
+        return triples
+
+    # Todos los prefijos: la ontología serializada solo declara los que usa
+    for prefijo, espacio in prefijos:
+        salida.write(f"@prefix {prefijo}: <{espacio}> .\n")
+    salida.write("".join(
+        linea for linea in tbox.serialize(format="turtle").splitlines(keepends=True)
+        if not linea.startswith("@prefix")
+    ))
+    salida.write("\n### INDIVIDUOS SINTÉTICOS (generar_grafo.py)\n\n")
+    for sujeto, propiedades in entidades:
+        cuerpo = " ;\n    ".join(f"{p.n3(gestor)} {o.n3(gestor)}" for p, o in propiedades)
+        salida.write(f"{sujeto.n3(gestor)} {cuerpo} .\n\n")
+        triples += len(propiedades)
+    return triples
+
+
+def triples_por_lugar(**parametros):
+    """Triples de individuos por lugar, medidos sobre una muestra"""
+    muestra = 2000
+    total = sum(len(p) for _, p in generar(lugares=muestra, **parametros))
+    return total / muestra
+
+
+def generar_grafo(ruta, lugares=LUGARES, formato="turtle", ttl_ontologia=GRAFO_TTL_LOCAL, **parametros):
+    """Escribe un grafo sintético en `ruta`; devuelve el número de triples"""
+    fuente = Graph()
+    fuente.parse(ttl_ontologia, format="turtle")
+    with open(ruta, "w", encoding="utf-8") as salida:
+        return escribir(salida, generar(lugares=lugares, **parametros), ontologia(fuente), formato)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Grafo sintético conforme a la ontología de grafo.ttl")
+    tamaño = parser.add_mutually_exclusive_group()
+    tamaño.add_argument("--lugares", type=int, help=f"número de lugares (por defecto {LUGARES})")
+    tamaño.add_argument("--triples", type=int, help="número aproximado de triples")
+    parser.add_argument("--coordenadas", type=float, default=COORDENADAS, help="proporción de lugares con coordenadas")
+    parser.add_argument("--duplicados", type=float, default=DUPLICADOS,
+                        help="proporción de coordenadas repetidas de otro lugar")
+    parser.add_argument("--eventos", type=float, default=EVENTOS_POR_LUGAR, help="eventos rituales por lugar")
+    parser.add_argument("--recursos", type=float, default=RECURSOS_POR_LUGAR, help="recursos mediales por lugar")
+    parser.add_argument("--semilla", type=int, default=SEMILLA)
+    parser.add_argument("--formato", choices=("turtle", "nt"), default="turtle")
+    parser.add_argument("--ontologia", default=GRAFO_TTL_LOCAL, help="TTL del que se copia la ontología")
+    parser.add_argument("--salida", default="grafo_sintetico.ttl")
+    args = parser.parse_args()
+
+    parametros = dict(coordenadas=args.coordenadas, duplicados=args.duplicados,
+                      eventos=args.eventos, recursos=args.recursos, semilla=args.semilla)
+    if not 0 <= args.coordenadas <= 1 or not 0 <= args.duplicados <= 1:
+        print("--coordenadas y --duplicados son proporciones entre 0 y 1")
+        sys.exit(1)
+
+    lugares = args.lugares or LUGARES
+    if args.triples:
+        lugares = max(1, round(args.triples / triples_por_lugar(**parametros)))
+
+    triples = generar_grafo(args.salida, lugares, args.formato, args.ontologia, **parametros)
+    print(f"{args.salida}: {triples} triples, {lugares} lugares (semilla {args.semilla})")
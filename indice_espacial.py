@@ -0,0 +1,96 @@
+# -*- coding: utf-8 -*-
+"""
+Índice espacial de los lugares para resolver clicks en el mapa.
+
+El panel de detalle recorría todos los lugares comparando
+abs(lat - lat_click) < 0.0001, una tolerancia que además no coincide con el
+redondeo a 5 decimales con el que se agrupan los marcadores. Aquí:
+
+- `clave_punto` es el redondeo común: el mismo para agrupar marcadores y
+  para buscar el grupo pulsado (el marcador está en el punto redondeado).
+- `IndiceEspacial` guarda punto -> lugares (búsqueda exacta, O(1)) y una
+  rejilla de celdas -> puntos para buscar el punto más cercano dentro de
+  una tolerancia cuando la coordenada no cae exactamente en un marcador.
+
+Se construye una vez por versión del grafo (cargar_datos_grafo).
+"""
+
+import math
+from collections import defaultdict
+
+# Decimales del punto de agrupación de marcadores
+PRECISION_PUNTO = 5
+
+# Lado de la celda de la rejilla (grados)
+TAMAÑO_CELDA = 0.01
+
+
+def clave_punto(lat, lon, precision=PRECISION_PUNTO):
+    """Punto de agrupación de una coordenada"""
+    return (round(lat, precision), round(lon, precision))
+
+
+class IndiceEspacial:
+    """Punto redondeado -> lugares, con rejilla para búsqueda por cercanía"""
+
+    def __init__(self, lugares, tamaño_celda=TAMAÑO_CELDA):
+        self.tamaño_celda = tamaño_celda
+        self._puntos = defaultdict(list)
+        self._celdas = defaultdict(list)
+        for lugar in lugares:
+            if lugar['lat'] and lugar['lon']:
+                self._puntos[clave_punto(lugar['lat'], lugar['lon'])].append(lugar)
+        for punto in self._puntos:
+            self._celdas[self._celda(*punto)].append(punto)
+
+    def __len__(self):
+        return len(self._puntos)
+
+    def registros(self):
+        """Todos los lugares indexados (los que tienen coordenadas)"""
+        return [lugar for lugares in self._puntos.values() for lugar in lugares]
+
+    def _celda(self, lat, lon):
+        return (math.floor(lat / self.tamaño_celda), math.floor(lon / self.tamaño_celda))
+
+    def grupo(self, lat, lon):
+        """Lugares del marcador en (lat, lon), o lista vacía"""
+        return self._puntos.get(clave_punto(lat, lon), [])
+
+    def mas_cercano(self, lat, lon, tolerancia):
+        """Punto más cercano a (lat, lon) a menos de `tolerancia` grados, o None"""
+        fila, columna = self._celda(lat, lon)
+        radio = max(1, math.ceil(tolerancia / self.tamaño_celda))
+        mejor, mejor_distancia = None, tolerancia
+        for f in range(fila - radio, fila + radio + 1):
+            for c in range(columna - radio, columna + radio + 1):
+                for punto in self._celdas.get((f, c), ()):
+                    distancia = math.hypot(punto[0] - lat, punto[1] - lon)
+                    if distancia <= mejor_distancia:
+                        mejor, mejor_distancia = punto, distancia
+        return mejor
+
+    def en_caja(self, sur, oeste, norte, este):
+        """Lugares con punto dentro de la caja (grados, bordes incluidos)"""
+        f0, c0 = self._celda(sur, oeste)
+        f1, c1 = self._celda(norte, este)
+        if (f1 - f0 + 1) * (c1 - c0 + 1) <= len(self._celdas):
+            celdas = (self._celdas.get((f, c), ()) for f in range(f0, f1 + 1) for c in range(c0, c1 + 1))
+        else:
+            # Caja con más celdas que las ocupadas: recorrer solo las ocupadas
+            celdas = (puntos for (f, c), puntos in self._celdas.items() if f0 <= f <= f1 and c0 <= c <= c1)
+        return [
+            lugar
+            for puntos in celdas
+            for punto in puntos
+            if sur <= punto[0] <= norte and oeste <= punto[1] <= este
+            for lugar in self._puntos[punto]
+        ]
+
+    def resolver(self, lat, lon, tolerancia=0.0001):
+        """Lugares del marcador pulsado: búsqueda exacta y, si falla, el punto más cercano"""
+        lugares = self.grupo(lat, lon)
+        if lugares:
+            return lugares
+        punto = self.mas_cercano(lat, lon, tolerancia)
+        return self._puntos[punto] if punto is not None else []
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+Índice de facetas con bitsets para filtros y conteos de la barra lateral.
+
+Para cada faceta (tipo general, nivel y contenedor `ubicado_en`) se guarda,
+por valor, un bitset con un bit por fila de la TablaLugares (enteros de
+Python: & y | hacen la intersección y la unión, bit_count el conteo).
+
+- Una selección es la unión de los valores elegidos dentro de cada faceta
+  y la intersección entre facetas; una faceta sin valores elegidos no filtra.
+- Los conteos por valor de una faceta son popcounts de su bitset
+  intersecado con la selección.
+
+Se construye una vez por versión del grafo (cargar_datos_grafo).
+"""
+
+import numpy as np
+
+FACETAS = ('tipo_general', 'nivel', 'ubicado_en')
+
+
+def _bits_desde_posiciones(posiciones, total):
+    """Bitset (int) con los bits de `posiciones` a 1 (bit i = fila i)"""
+    marcas = np.zeros(total, dtype=bool)
+    marcas[posiciones] = True
+    return int.from_bytes(np.packbits(marcas, bitorder='little').tobytes(), 'little')
+
+
+def contar(bits):
+    """Número de filas del bitset"""
+    return bits.bit_count()
+
+
+class IndiceFacetas:
+    """Bitsets por valor de cada faceta sobre las filas de una TablaLugares"""
+
+    def __init__(self, tabla):
+        self.total = len(tabla)
+        self.todos = (1 << self.total) - 1
+        self.bits = {}
+        for faceta in FACETAS:
+            valores = tabla.df[faceta].astype(object).where(tabla.df[faceta].notna(), None).tolist()
+            posiciones = {}
+            for fila, valor in enumerate(valores):
+                posiciones.setdefault(valor, []).append(fila)
+            self.bits[faceta] = {
+                valor: _bits_desde_posiciones(filas, self.total)
+                for valor, filas in posiciones.items()
+            }
+
+    def valores(self, faceta):
+        """Valores presentes de la faceta (None, si lo hay, al final)"""
+        presentes = self.bits[faceta]
+        return sorted(v for v in presentes if v is not None) + ([None] if None in presentes else [])
+
+    def seleccion(self, **filtros):
+        """Bitset de las filas que cumplen los filtros (faceta -> valores)"""
+        bits = self.todos
+        for faceta, elegidos in filtros.items():
+            if not elegidos:
+                continue
+            union = 0
+            for valor in elegidos:
+                union |= self.bits[faceta].get(valor, 0)
+            bits &= union
+        return bits
+
+    def conteos(self, faceta, bits=None):
+        """Valor -> número de filas de la faceta dentro de `bits` (todas si None)"""
+        bits = self.todos if bits is None else bits
+        return {valor: contar(bits & b) for valor, b in self.bits[faceta].items()}
+
+    def mascara(self, bits):
+        """Bitset -> array booleano por fila (para TablaLugares.filtrar)"""
+        if not self.total:
+            return np.zeros(0, dtype=bool)
+        crudo = np.frombuffer(bits.to_bytes((self.total + 7) // 8, 'little'), dtype=np.uint8)
+        return np.unpackbits(crudo, bitorder='little')[:self.total].astype(bool)
@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+"""
+Materialización opcional de inferencias RDFS sobre el grafo cargado.
+
+La ontología de grafo.ttl declara jerarquías rdfs:subClassOf y rdfs:domain /
+rdfs:range para propiedades como :estaEnLugar, :participaEnFestividad o
+:conduceA. Esta etapa las aplica una vez por versión del grafo:
+
+- cierre transitivo de rdfs:subClassOf (sin los triples reflexivos),
+- propagación de cada rdf:type a todas sus superclases,
+- opcionalmente (dominio_rango=True), tipos deducidos por rdfs:domain
+  (sujeto) y rdfs:range (objeto no literal).
+
+Los tipos por dominio y rango no se aplican por defecto: en grafo.ttl el
+dominio de :relacionadoCon / :celebra convierte a Paucartambo en
+:Festividad y cambiaría el tipo mostrado de lugares que no lo son.
+
+Con el grafo materializado basta `?x rdf:type :Lugar` donde antes hacía
+falta la ruta `rdf:type/rdfs:subClassOf*`. Se activa con la variable de
+entorno QOYLLUR_INFERENCIA_RDFS=1.
+"""
+
+import os
+import time
+
+from rdflib import Literal
+from rdflib.namespace import RDF, RDFS
+
+INFERENCIA_RDFS = os.environ.get("QOYLLUR_INFERENCIA_RDFS", "0") == "1"
+
+
+def _superclases(grafo):
+    """Clase -> conjunto de superclases (cierre transitivo, sin la propia clase)"""
+    directas = {}
+    for sub, sup in grafo.subject_objects(RDFS.subClassOf):
+        if not isinstance(sup, Literal):
+            directas.setdefault(sub, set()).add(sup)
+
+    # Cierre por clase con su propio conjunto de visitadas: con ciclos en
+    # la jerarquía no se memoriza ningún cierre parcial
+    cierre = {}
+    for clase in directas:
+        visitadas = set()
+        pendientes = list(directas[clase])
+        while pendientes:
+            sup = pendientes.pop()
+            if sup in visitadas:
+                continue
+            visitadas.add(sup)
+            pendientes.extend(directas.get(sup, ()))
+        visitadas.discard(clase)
+        cierre[clase] = visitadas
+    return cierre
+
+
+def materializar_rdfs(grafo, dominio_rango=False):
+    """Añade al grafo los triples inferidos y devuelve un informe.
+
+    El informe incluye cuántos triples se añadieron por regla y la duración.
+    """
+    inicio = time.perf_counter()
+    nuevos = set()
+
+    # 1. Cierre transitivo de rdfs:subClassOf
+    superclases = _superclases(grafo)
+    for clase, sups in superclases.items():
+        for sup in sups:
+            nuevos.add((clase, RDFS.subClassOf, sup))
+
+    # 2. Tipos por dominio y rango de las propiedades (opcional)
+    tipos = set(grafo.subject_objects(RDF.type))
+    if dominio_rango:
+        dominios = {}
+        rangos = {}
+        for propiedad, clase in grafo.subject_objects(RDFS.domain):
+            dominios.setdefault(propiedad, []).append(clase)
+        for propiedad, clase in grafo.subject_objects(RDFS.range):
+            rangos.setdefault(propiedad, []).append(clase)
+
+        for propiedad in set(dominios) | set(rangos):
+            for sujeto, objeto in grafo.subject_objects(propiedad):
+                for clase in dominios.get(propiedad, ()):
+                    tipos.add((sujeto, clase))
+                if not isinstance(objeto, Literal):
+                    for clase in rangos.get(propiedad, ()):
+                        tipos.add((objeto, clase))
+
+    # 3. Cada tipo se propaga a sus superclases
+    for individuo, clase in list(tipos):
+        for sup in superclases.get(clase, ()):
+            tipos.add((individuo, sup))
+
+    for individuo, clase in tipos:
+        nuevos.add((individuo, RDF.type, clase))
+
+    # Solo se añade lo que el grafo todavía no tiene
+    antes = len(grafo)
+    nuevos = [t for t in nuevos if t not in grafo]
+    n_subclases = sum(1 for t in nuevos if t[1] == RDFS.subClassOf)
+    for triple in nuevos:
+        grafo.add(triple)
+
+    return {
+        'triples_antes': antes,
+        'triples_añadidos': len(nuevos),
+        'subclases_añadidas': n_subclases,
+        'tipos_añadidos': len(nuevos) - n_subclases,
+        'duracion_s': time.perf_counter() - inicio,
+    }
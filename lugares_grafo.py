@@ -0,0 +1,314 @@
+# -*- coding: utf-8 -*-
+"""
+Extracción de lugares del grafo con dos motores intercambiables.
+
+- "sparql": la consulta agregada `lugares` del registro (consultas_sparql),
+  con la ruta rdf:type/rdfs:subClassOf*, el IF(EXISTS...) anidado para el
+  tipo general y el GROUP BY con MIN.
+- "nativo": recorre directamente los índices de triples del grafo. Resuelve
+  una vez el conjunto de subclases de :Lugar y luego busca etiqueta,
+  coordenadas, tipo, descripción, nivel y ubicadoEn sujeto por sujeto.
+
+Ambos devuelven la misma lista de dicts. El motor por defecto se elige con
+la variable de entorno QOYLLUR_MOTOR_LUGARES ("nativo" si no se define).
+Si el grafo tiene las inferencias RDFS materializadas (inferencia_rdfs),
+`inferido=True` cambia la ruta transitiva por una búsqueda directa de
+`rdf:type :Lugar` y el tipo específico sale solo de los tipos más
+específicos del lugar (no de las superclases añadidas por la inferencia).
+
+Cada lugar es un registro `Lugar` con __slots__ que se lee como el dict de
+antes (lugar['nombre'], .get, .items...). Los campos categóricos (tipos,
+nivel, contenedor) se internan y los valores por defecto ("Sin nombre",
+"Sin descripción", "No especificado") son centinelas compartidos, así que
+miles de lugares comparten las mismas cadenas.
+
+La app no guarda esta lista tal cual: cargar_datos_grafo la convierte en
+una TablaLugares (columnas de pandas, que apuntan a las mismas cadenas
+internadas) y solo el índice espacial conserva los registros de los
+lugares con coordenadas. Lo que queda en memoria por versión del grafo lo
+mide datos_grafo.memoria_lugares.
+
+Para comparar ambos motores (resultado, tiempos y memoria por lugar):
+    python lugares_grafo.py data/grafo.ttl
+"""
+
+import os
+import sys
+import time
+
+from rdflib import BNode, Graph, Literal, Namespace, URIRef
+from rdflib.namespace import RDF, RDFS
+
+from consultas_sparql import ejecutar_consulta
+
+EX = Namespace("http://example.org/festividades#")
+GEO = Namespace("http://www.w3.org/2003/01/geo/wgs84_pos#")
+
+MOTORES = ("nativo", "sparql")
+MOTOR_LUGARES = os.environ.get("QOYLLUR_MOTOR_LUGARES", "nativo")
+
+# Precedencia del tipo general (igual que el IF(EXISTS...) de la consulta)
+TIPOS_GENERALES = [
+    (EX.Localidad, "Localidad"),
+    (EX.Glaciar, "Glaciar"),
+    (EX.Santuario, "Santuario"),
+    (EX.Iglesia, "Iglesia"),
+    (EX.Ruta, "Ruta"),
+]
+
+
+# Valores por defecto compartidos por todos los registros
+SIN_NOMBRE = "Sin nombre"
+SIN_DESCRIPCION = "Sin descripción"
+NIVEL_NO_ESPECIFICADO = "No especificado"
+
+
+class Lugar:
+    """Registro compacto de un lugar, con lectura compatible con dict"""
+
+    __slots__ = (
+        'uri', 'nombre', 'lat', 'lon', 'tipo_especifico',
+        'tipo_general', 'descripcion', 'nivel', 'ubicado_en'
+    )
+
+    def __init__(self, *valores):
+        for campo, valor in zip(self.__slots__, valores):
+            setattr(self, campo, valor)
+
+    def __getitem__(self, campo):
+        try:
+            return getattr(self, campo)
+        except (AttributeError, TypeError):
+            raise KeyError(campo) from None
+
+    def get(self, campo, defecto=None):
+        return getattr(self, campo, defecto) if campo in self.__slots__ else defecto
+
+    def __contains__(self, campo):
+        return campo in self.__slots__
+
+    def keys(self):
+        return self.__slots__
+
+    def values(self):
+        return tuple(getattr(self, campo) for campo in self.__slots__)
+
+    def items(self):
+        return tuple(zip(self.__slots__, self.values()))
+
+    def como_dict(self):
+        return dict(self.items())
+
+    def __eq__(self, otro):
+        if isinstance(otro, Lugar):
+            return self.values() == otro.values()
+        if isinstance(otro, dict):
+            return self.como_dict() == otro
+        return NotImplemented
+
+    __hash__ = None
+
+    def __repr__(self):
+        return f"Lugar({self.como_dict()!r})"
+
+
+def _interna(valor):
+    return sys.intern(str(valor)) if valor else None
+
+
+def _lugar(uri, nombre, lat, lon, tipo_especifico, tipo_general, descripcion, nivel, ubicado_en):
+    """Convierte una fila (términos rdflib o None) al registro de lugar de la app"""
+    return Lugar(
+        str(uri),
+        str(nombre) if nombre else SIN_NOMBRE,
+        float(lat) if lat else None,
+        float(lon) if lon else None,
+        _interna(tipo_especifico),
+        sys.intern(str(tipo_general)),
+        str(descripcion) if descripcion else SIN_DESCRIPCION,
+        _interna(nivel) or NIVEL_NO_ESPECIFICADO,
+        _interna(ubicado_en)
+    )
+
+
+def bytes_objetos(objetos, vistos):
+    """Bytes de los objetos aún no contados en `vistos` (ids); los añade"""
+    total = 0
+    for objeto in objetos:
+        if id(objeto) not in vistos:
+            vistos.add(id(objeto))
+            total += sys.getsizeof(objeto)
+    return total
+
+
+def bytes_por_lugar(lugares):
+    """Bytes por lugar contando cada objeto una sola vez (cadenas compartidas incluidas)"""
+    vistos = set()
+    total = 0
+    for lugar in lugares:
+        total += bytes_objetos((lugar, *lugar.values()), vistos)
+        if isinstance(lugar, dict):
+            total += bytes_objetos(lugar, vistos)
+    return total / len(lugares) if lugares else 0
+
+
+def extraer_lugares_sparql(grafo, inferido=False):
+    """Motor SPARQL: consulta agregada `lugares`"""
+    return [
+        _lugar(row.uri, row.primerNombre, row.lat, row.lon, row.primerTipoEspe,
+               row.tipoGeneral, row.primerDesc, row.primerNivel, row.primerUbicadoEn)
+        for row in ejecutar_consulta(grafo, "lugares_inferido" if inferido else "lugares")
+    ]
+
+
+def _orden_sparql(termino):
+    """Clave de orden de un término como la de rdflib para MIN y ORDER BY
+
+    rdflib ordena primero por clase de término (nodo en blanco < URI <
+    literal) y luego con la comparación de términos. La función que lo hace
+    (rdflib.plugins.sparql.evalutils._val) es privada, así que se replica
+    aquí; tests/test_lugares_grafo.py compara ambos motores para detectar
+    si una versión nueva de rdflib cambia el orden.
+    """
+    if isinstance(termino, BNode):
+        return (1, termino)
+    if isinstance(termino, URIRef):
+        return (2, termino)
+    return (3, termino)
+
+
+def _minimo(valores):
+    """MIN de SPARQL: mismo orden que usa rdflib para agregados y ORDER BY"""
+    valores = list(valores)
+    return min(valores, key=_orden_sparql) if valores else None
+
+
+def extraer_lugares_nativo(grafo, inferido=False):
+    """Motor nativo: recorrido directo de los triples, sin evaluador SPARQL"""
+    # Clases que cumplen rdfs:subClassOf* :Lugar (incluida :Lugar)
+    if inferido:
+        clases_lugar = {EX.Lugar}
+    else:
+        clases_lugar = set(grafo.transitive_subjects(RDFS.subClassOf, EX.Lugar))
+    sujetos = {s for clase in clases_lugar for s in grafo.subjects(RDF.type, clase)}
+
+    etiquetas_tipo = {}
+    filas = []
+    for uri in sujetos:
+        nombre = _minimo(grafo.objects(uri, RDFS.label))
+        if nombre is None:
+            continue
+
+        tipos = set(grafo.objects(uri, RDF.type))
+        tipos_especificos = tipos
+        if inferido:
+            # Sin las superclases propagadas de otro tipo del lugar
+            tipos_especificos = {
+                tipo for tipo in tipos
+                if not any(otro != tipo and (otro, RDFS.subClassOf, tipo) in grafo for otro in tipos)
+            }
+        for tipo in tipos_especificos:
+            if tipo not in etiquetas_tipo:
+                etiquetas_tipo[tipo] = list(grafo.objects(tipo, RDFS.label))
+        tipo_especifico = _minimo(
+            etiqueta for tipo in tipos_especificos if tipo != EX.Lugar for etiqueta in etiquetas_tipo[tipo]
+        )
+        tipo_general = next((nombre_tipo for clase, nombre_tipo in TIPOS_GENERALES if clase in tipos), "Lugar")
+
+        descripcion = _minimo(grafo.objects(uri, EX.descripcionBreve))
+        nivel = _minimo(grafo.objects(uri, EX.nivelEmbeddings))
+        ubicado_en = _minimo(
+            etiqueta for contenedor in grafo.objects(uri, EX.ubicadoEn)
+            for etiqueta in grafo.objects(contenedor, RDFS.label)
+        )
+
+        # GROUP BY ?lat ?lon: una fila por par de coordenadas distinto
+        lats = list(grafo.objects(uri, GEO.lat))
+        lons = list(grafo.objects(uri, GEO.long))
+        coordenadas = dict.fromkeys((lat, lon) for lat in lats for lon in lons) or {(None, None): None}
+
+        for lat, lon in coordenadas:
+            filas.append((tipo_general, nombre, uri, lat, lon, tipo_especifico, descripcion, nivel, ubicado_en))
+
+    # ORDER BY ?tipoGeneral ?primerNombre (la URI solo desempata)
+    filas.sort(key=lambda f: (_orden_sparql(Literal(f[0])), _orden_sparql(f[1]), str(f[2])))
+
+    return [
+        _lugar(uri, nombre, lat, lon, tipo_especifico, tipo_general, descripcion, nivel, ubicado_en)
+        for tipo_general, nombre, uri, lat, lon, tipo_especifico, descripcion, nivel, ubicado_en in filas
+    ]
+
+
+def extraer_lugares(grafo, motor=None, inferido=False):
+    """Extrae lugares del grafo con el motor indicado (o MOTOR_LUGARES)"""
+    motor = motor or MOTOR_LUGARES
+    if motor == "sparql":
+        return extraer_lugares_sparql(grafo, inferido)
+    if motor == "nativo":
+        return extraer_lugares_nativo(grafo, inferido)
+    raise ValueError(f"Motor de lugares desconocido: {motor} (usar {', '.join(MOTORES)})")
+
+
+def comparar_motores(grafo, repeticiones=3, inferido=False):
+    """Ejecuta ambos motores y compara resultados y tiempos (mejor de N)"""
+    resultados = {}
+    tiempos = {}
+    for motor in MOTORES:
+        mejor = None
+        for _ in range(repeticiones):
+            inicio = time.perf_counter()
+            resultados[motor] = extraer_lugares(grafo, motor, inferido)
+            duracion = time.perf_counter() - inicio
+            mejor = duracion if mejor is None else min(mejor, duracion)
+        tiempos[motor] = mejor
+
+    # El orden entre empates de (tipo, nombre) no está definido en SPARQL
+    def _clave(lugar):
+        return tuple(str(v) for v in lugar.values())
+
+    nativo = sorted(resultados["nativo"], key=_clave)
+    sparql = sorted(resultados["sparql"], key=_clave)
+    return {
+        'iguales': nativo == sparql,
+        'lugares': {motor: len(r) for motor, r in resultados.items()},
+        'solo_nativo': [l for l in nativo if l not in sparql],
+        'solo_sparql': [l for l in sparql if l not in nativo],
+        'tiempos_s': tiempos,
+        'aceleracion': tiempos["sparql"] / tiempos["nativo"] if tiempos["nativo"] else None,
+    }
+
+
+if __name__ == "__main__":
+    if len(sys.argv) != 2:
+        print(__doc__.split("Para comparar")[1].strip())
+        sys.exit(1)
+
+    grafo = Graph()
+    grafo.parse(sys.argv[1], format="turtle")
+    informe = comparar_motores(grafo)
+
+    print(f"{'✅' if informe['iguales'] else '❌'} Resultados iguales: {informe['iguales']}")
+    for motor in MOTORES:
+        print(f"  {motor:>7}: {informe['lugares'][motor]} lugares en {informe['tiempos_s'][motor] * 1000:.1f} ms")
+    print(f"  Aceleración del motor nativo: {informe['aceleracion']:.1f}x")
+
+    # Memoria: registros compactos frente a los dicts de antes, donde cada
+    # str(término) era una cadena nueva (salvo los literales por defecto)
+    registros = extraer_lugares(grafo)
+    centinelas = (SIN_NOMBRE, SIN_DESCRIPCION, NIVEL_NO_ESPECIFICADO)
+    dicts = [
+        {campo: valor if not isinstance(valor, str) or valor in centinelas else "".join(list(valor))
+         for campo, valor in l.items()}
+        for l in registros
+    ]
+    print(f"  Memoria por lugar: {bytes_por_lugar(dicts):.0f} B (dicts) -> "
+          f"{bytes_por_lugar(registros):.0f} B (registros Lugar)")
+
+    # Lo que retiene la app: TablaLugares + registros del índice espacial
+    from datos_grafo import cargar_datos_grafo, memoria_lugares
+    memoria = memoria_lugares(cargar_datos_grafo(sys.argv[1]))
+    print(f"  Retenido por cargar_datos_grafo: {memoria['por_lugar']:.0f} B por lugar "
+          f"(tabla {memoria['tabla']} B, índice espacial {memoria['indice_espacial']} B)")
+    for motor in MOTORES:
+        for lugar in informe[f'solo_{motor}'][:5]:
+            print(f"  Solo en {motor}: {lugar}")
@@ -0,0 +1,437 @@
+# -*- coding: utf-8 -*-
+"""
+Construcción del mapa Folium: mapa base, capas de lugares y mapa completo.
+
+Funciones sin dependencia de Streamlit: las usa app.py y se pueden
+importar desde scripts (benchmarks, precarga, prerender).
+"""
+
+import json
+import math
+import os
+from contextlib import contextmanager
+
+import folium
+from folium import plugins
+
+from capa_geojson import GeoJsonCanvas, feature_punto
+from capas_teselas import capas_teselas
+from datos_grafo import relaciones_de_lugar
+from indice_espacial import clave_punto
+from metricas import fase
+from plantillas_popup import (
+    ANCHO_POPUP_GRUPO,
+    ANCHO_POPUP_LUGAR,
+    agregar_estilos_popup,
+    color_tipo,
+    fragmento_popup_grupo,
+    fragmento_popup_lugar,
+)
+from tabla_lugares import TablaLugares
+
+# Dibujo de los lugares: "marcadores" (un folium.Marker por punto) o
+# "geojson" (una sola FeatureCollection pintada en canvas)
+MODOS_MARCADORES = ("marcadores", "geojson")
+MODO_MARCADORES = os.environ.get("QOYLLUR_MODO_MARCADORES", "marcadores")
+
+# Agrupación de marcadores (MarkerCluster): opcional y solo a partir de
+# UMBRAL_CLUSTER lugares con coordenadas
+CLUSTER_MARCADORES = os.environ.get("QOYLLUR_CLUSTER", "0") == "1"
+UMBRAL_CLUSTER = int(os.environ.get("QOYLLUR_CLUSTER_UMBRAL", "300"))
+
+# Configuración de estilos de mapa (servidores públicos o servidor local de
+# teselas si QOYLLUR_TESELAS_LOCALES está definido)
+TILE_LAYERS = capas_teselas()
+
+# Configurar iconos
+ICON_CONFIGS = {
+    'Localidad': {'color': 'blue', 'icon': 'home'},
+    'Santuario': {'color': 'red', 'icon': 'star'},
+    'Glaciar': {'color': 'lightblue', 'icon': 'mountain'},
+    'Iglesia': {'color': 'purple', 'icon': 'place-of-worship'},
+    'Ruta': {'color': 'orange', 'icon': 'road'},
+    'Lugar': {'color': 'green', 'icon': 'map-marker'}
+}
+
+# Icono de los clusters: color del tipo mayoritario, número de lugares y
+# una insignia con los lugares destacados que contiene
+ICONO_CLUSTER_JS = """
+function(cluster) {
+    var colores = %s;
+    var total = 0, destacados = 0, por_tipo = {};
+    cluster.getAllChildMarkers().forEach(function(m) {
+        var o = m.options;
+        total += o.cantidad || 1;
+        destacados += o.destacados || 0;
+        por_tipo[o.tipo] = (por_tipo[o.tipo] || 0) + (o.cantidad || 1);
+    });
+    var tipo = Object.keys(por_tipo).sort(function(a, b) { return por_tipo[b] - por_tipo[a]; })[0];
+    var color = colores[tipo] || 'gray';
+    var insignia = destacados ? '<span style="position:absolute;top:-6px;right:-6px;background:#ffcc00;color:#2c3e50;' +
+        'border-radius:9px;padding:0 5px;font-size:10px;font-weight:bold;border:1px solid #fff;">' + destacados + '</span>' : '';
+    return L.divIcon({
+        html: '<div style="position:relative;background:' + color + ';color:white;border:3px solid rgba(255,255,255,0.8);' +
+              'border-radius:50%%;width:36px;height:36px;line-height:30px;text-align:center;font-weight:bold;' +
+              (destacados ? 'box-shadow:0 0 0 3px #ffcc00;' : '') + '">' + total + insignia + '</div>',
+        className: 'marker-cluster-qoyllur',
+        iconSize: L.point(40, 40)
+    });
+}
+""" % json.dumps(dict({tipo: config['color'] for tipo, config in ICON_CONFIGS.items()}, Grupo='orange'))
+
+def crear_mapa_base(center_lat=-13.53, center_lon=-71.97, zoom=8, estilo_mapa="Relieve", popups_diferidos=False):
+    """Crea el mapa sin marcadores: teselas, control de capas y widget de coordenadas"""
+    
+    # Obtener configuración del estilo seleccionado
+    estilo = TILE_LAYERS.get(estilo_mapa, TILE_LAYERS["Relieve"])
+    
+    # Crear mapa base
+    mapa = folium.Map(
+        location=[center_lat, center_lon],
+        zoom_start=zoom,
+        tiles=estilo["tiles"],
+        attr=estilo["attr"],
+        control_scale=True,
+        prefer_canvas=True
+    )
+    
+    # Añadir capas adicionales
+    for estilo_nombre, config in TILE_LAYERS.items():
+        if estilo_nombre != estilo_mapa:
+            folium.TileLayer(
+                tiles=config["tiles"],
+                attr=config["attr"],
+                name=config["name"],
+                overlay=False,
+                control=True
+            ).add_to(mapa)
+    
+    # Hoja de estilos común a todos los popups (una vez por mapa)
+    if not popups_diferidos:
+        agregar_estilos_popup(mapa)
+    
+    # Añadir control de capas
+    folium.LayerControl(position='topleft').add_to(mapa)
+    
+    # Añadir widget de coordenadas
+    from branca.element import Element
+    
+    coord_element = Element(f"""
+    <div style="position: absolute; bottom: 20px; right: 20px; 
+                background: white; padding: 10px; border: 2px solid #2c3e50;
+                border-radius: 5px; font-family: monospace; font-size: 12px;
+                z-index: 9999; box-shadow: 0 2px 5px rgba(0,0,0,0.2);">
+        <div style="color: #e74c3c; font-weight: bold; margin-bottom: 5px;">
+            <i class="fa fa-crosshairs"></i> Coordenadas
+        </div>
+        <div id="current-coords">
+            Lat: {center_lat:.6f}<br>
+            Lon: {center_lon:.6f}
+        </div>
+    </div>
+    
+    <script>
+    // Actualizar coordenadas cuando el mapa esté listo
+    setTimeout(function() {{
+        if (typeof window.currentMap !== 'undefined') {{
+            var map = window.currentMap;
+            
+            map.on('mousemove', function(e) {{
+                var lat = e.latlng.lat.toFixed(6);
+                var lon = e.latlng.lng.toFixed(6);
+                document.getElementById('current-coords').innerHTML = 
+                    'Lat: ' + lat + '<br>Lon: ' + lon;
+            }});
+            
+            map.on('click', function(e) {{
+                var lat = e.latlng.lat.toFixed(6);
+                var lon = e.latlng.lng.toFixed(6);
+                document.getElementById('current-coords').innerHTML = 
+                    'Lat: ' + lat + '<br>Lon: ' + lon;
+            }});
+        }}
+    }}, 1000);
+    </script>
+    """)
+    
+    mapa.get_root().html.add_child(coord_element)
+    
+    return mapa
+
+def uris_destacados(lugares_destacados):
+    """Conjunto de URIs de los lugares destacados (tabla o lista de dicts)"""
+    if not lugares_destacados:
+        return set()
+    if isinstance(lugares_destacados, TablaLugares):
+        return set(lugares_destacados.uris())
+    return {l['uri'] for l in lugares_destacados}
+
+def cumple_filtros(lugar, tipos=(), niveles=(), contenedores=()):
+    """Si el lugar pasa los filtros de tipo, nivel y contenedor (vacío = sin filtro)"""
+    return ((not tipos or lugar['tipo_general'] in tipos)
+            and (not niveles or lugar['nivel'] in niveles)
+            and (not contenedores or lugar['ubicado_en'] in contenedores))
+
+def agrupar_por_punto(lugares_data):
+    """Agrupa los lugares con coordenadas por punto (redondeado a 5 decimales)"""
+    from collections import defaultdict
+    
+    lugares_por_punto = defaultdict(list)
+    for lugar in lugares_data:
+        if lugar['lat'] and lugar['lon']:
+            lugares_por_punto[clave_punto(lugar['lat'], lugar['lon'])].append(lugar)
+    return lugares_por_punto
+
+def crear_capa_lugares(grafo, lugares_data, lugares_destacados=None, relaciones_lugares=None, popups_diferidos=False, cluster=False):
+    """Crea la capa (FeatureGroup) con los marcadores de los lugares
+    
+    Con cluster=True los marcadores van dentro de un MarkerCluster; cada uno
+    lleva en sus opciones tipo, cantidad y destacados para el icono del cluster.
+    """
+    
+    capa = folium.FeatureGroup(name="Lugares", control=False)
+    
+    # Agrupar lugares por coordenadas
+    lugares_por_punto = agrupar_por_punto(lugares_data)
+    
+    destino = capa
+    if cluster:
+        destino = plugins.MarkerCluster(
+            control=False,
+            icon_create_function=ICONO_CLUSTER_JS,
+            options={'showCoverageOnHover': False, 'maxClusterRadius': 50}
+        ).add_to(capa)
+    
+    # Verificar si hay lugares destacados
+    lugares_destacados_uris = uris_destacados(lugares_destacados)
+    
+    # Para cada punto
+    for (lat, lon), lugares in lugares_por_punto.items():
+        if len(lugares) == 1:
+            # Un solo lugar
+            lugar = lugares[0]
+            
+            tipo = lugar['tipo_general']
+            icon_config = ICON_CONFIGS.get(tipo, {'color': 'gray', 'icon': 'info-circle'})
+            
+            # Determinar si está destacado
+            is_destacado = lugar['uri'] in lugares_destacados_uris
+            
+            # Popup embebido (fragmento HTML) salvo en modo diferido
+            popup = None
+            if not popups_diferidos:
+                with fase("relaciones"):
+                    relaciones = relaciones_de_lugar(grafo, lugar['uri'], relaciones_lugares)
+                with fase("popups"):
+                    popup = folium.Popup(
+                        fragmento_popup_lugar(lugar, relaciones),
+                        max_width=ANCHO_POPUP_LUGAR
+                    )
+            
+            # Crear marcador
+            marker = folium.Marker(
+                location=[lat, lon],
+                popup=popup,
+                tooltip=f"{lugar['nombre']}",
+                icon=folium.Icon(
+                    color=icon_config['color'],
+                    icon=icon_config['icon'],
+                    prefix='fa',
+                    # En clusters no hay halo: el destacado se marca en el icono
+                    icon_color='#ffcc00' if cluster and is_destacado else 'white'
+                ),
+                **({'tipo': tipo, 'cantidad': 1, 'destacados': int(is_destacado)} if cluster else {})
+            )
+            
+            # Si está destacado, añadir efecto
+            if is_destacado and not cluster:
+                folium.CircleMarker(
+                    location=[lat, lon],
+                    radius=15,
+                    color=icon_config['color'],
+                    fill=True,
+                    fill_color=icon_config['color'],
+                    fill_opacity=0.3,
+                    weight=2
+                ).add_to(capa)
+            
+            marker.add_to(destino)
+            
+        else:
+            # Múltiples lugares - crear popup especial
+            hay_destacados = any(l['uri'] in lugares_destacados_uris for l in lugares)
+            
+            popup = None
+            if not popups_diferidos:
+                with fase("popups"):
+                    popup = folium.Popup(
+                        fragmento_popup_grupo(lugares, lat, lon, lugares_destacados_uris),
+                        max_width=ANCHO_POPUP_GRUPO
+                    )
+            
+            # Si hay destacados, cambiar el icono del grupo
+            icon_color = 'orange'
+            if hay_destacados:
+                icon_color = 'red'
+            
+            folium.Marker(
+                location=[lat, lon],
+                popup=popup,
+                tooltip=f"{len(lugares)} lugares" + (" (con destacados)" if hay_destacados else ""),
+                icon=folium.Icon(
+                    color=icon_color,
+                    icon='layer-group',
+                    prefix='fa'
+                ),
+                **({'tipo': 'Grupo', 'cantidad': len(lugares),
+                    'destacados': sum(l['uri'] in lugares_destacados_uris for l in lugares)} if cluster else {})
+            ).add_to(destino)
+    
+    return capa
+
+def crear_capa_geojson(grafo, lugares_data, lugares_destacados=None, relaciones_lugares=None, popups_diferidos=False):
+    """Crea la capa con todos los puntos en una sola FeatureCollection (canvas)
+    
+    Mismos puntos, tooltips y popups que crear_capa_lugares; el color por
+    tipo y el realce de destacados los aplica el navegador según las
+    propiedades de cada feature.
+    """
+    
+    capa = folium.FeatureGroup(name="Lugares", control=False)
+    
+    lugares_destacados_uris = uris_destacados(lugares_destacados)
+    
+    features = []
+    for (lat, lon), lugares in agrupar_por_punto(lugares_data).items():
+        destacados = [l for l in lugares if l['uri'] in lugares_destacados_uris]
+        popup = None
+        
+        if len(lugares) == 1:
+            lugar = lugares[0]
+            if not popups_diferidos:
+                with fase("relaciones"):
+                    relaciones = relaciones_de_lugar(grafo, lugar['uri'], relaciones_lugares)
+                with fase("popups"):
+                    popup = fragmento_popup_lugar(lugar, relaciones)
+            features.append(feature_punto(
+                lat, lon, lugar['tipo_general'], lugar['nombre'],
+                destacado=bool(destacados), popup=popup
+            ))
+        else:
+            if not popups_diferidos:
+                with fase("popups"):
+                    popup = fragmento_popup_grupo(lugares, lat, lon, lugares_destacados_uris)
+            tooltip = f"{len(lugares)} lugares" + (" (con destacados)" if destacados else "")
+            features.append(feature_punto(
+                lat, lon, "Grupo", tooltip,
+                destacado=bool(destacados), cantidad=len(lugares), popup=popup
+            ))
+    
+    capa.add_child(GeoJsonCanvas(features, ANCHO_POPUP_LUGAR, ANCHO_POPUP_GRUPO))
+    
+    return capa
+
+def crear_capa_agregada(celdas, destacar=False):
+    """Crea la capa con una burbuja por celda geohash (conteo y desglose por tipo)"""
+    
+    capa = folium.FeatureGroup(name="Lugares", control=False)
+    
+    for celda in celdas:
+        por_tipo = sorted(celda['por_tipo'].items(), key=lambda t: (-t[1], t[0]))
+        color = color_tipo(por_tipo[0][0])
+        tamaño = int(28 + 10 * math.log10(celda['conteo']))
+        desglose = ", ".join(f"{tipo}: {n}" for tipo, n in por_tipo)
+        borde = '#ffcc00' if destacar else 'rgba(255,255,255,0.9)'
+        
+        folium.Marker(
+            location=[celda['lat'], celda['lon']],
+            tooltip=f"{celda['conteo']} {'lugar' if celda['conteo'] == 1 else 'lugares'} ({desglose})",
+            icon=folium.DivIcon(
+                html=(
+                    f'<div style="width:{tamaño}px;height:{tamaño}px;line-height:{tamaño - 6}px;'
+                    f'background:{color};border:3px solid {borde};border-radius:50%;color:white;'
+                    f'text-align:center;font-weight:bold;font-size:12px;'
+                    f'box-shadow:0 1px 4px rgba(0,0,0,0.4);">{celda["conteo"]}</div>'
+                ),
+                icon_size=(tamaño, tamaño),
+                icon_anchor=(tamaño // 2, tamaño // 2)
+            )
+        ).add_to(capa)
+    
+    return capa
+
+def crear_capa(grafo, lugares_data, lugares_destacados=None, relaciones_lugares=None, popups_diferidos=False, modo_marcadores=None):
+    """Capa de lugares según el modo de dibujo (MODO_MARCADORES por defecto)"""
+    modo_marcadores = modo_marcadores or MODO_MARCADORES
+    if modo_marcadores == "geojson":
+        return crear_capa_geojson(grafo, lugares_data, lugares_destacados, relaciones_lugares, popups_diferidos)
+    if modo_marcadores == "marcadores":
+        return crear_capa_lugares(
+            grafo, lugares_data, lugares_destacados, relaciones_lugares, popups_diferidos,
+            cluster=usar_cluster(lugares_data)
+        )
+    raise ValueError(f"Modo de marcadores desconocido: {modo_marcadores} (usar {', '.join(MODOS_MARCADORES)})")
+
+@contextmanager
+def capa_enganchada(mapa, capa):
+    """Deja el mapa como estaba al salir del bloque en el que se le engancha `capa`
+
+    st_folium añade la capa al mapa y la renderiza, y ese render escribe el
+    script (y la cabecera, si la hay) de cada marcador en la Figure del mapa.
+    Al salir se quita la capa y se restauran los hijos de header, html y
+    script de la Figure, para que el mapa base de la caché no crezca con
+    cada capa que se le ha enganchado.
+    """
+    figura = mapa.get_root()
+    partes = (figura.header, figura.html, figura.script)
+    guardados = [list(parte._children.items()) for parte in partes]
+    try:
+        yield
+    finally:
+        mapa._children.pop(capa.get_name(), None)
+        for parte, hijos in zip(partes, guardados):
+            parte._children.clear()
+            parte._children.update(hijos)
+
+def contar_marcadores(capa):
+    """Puntos dibujados por una capa o un mapa (marcadores, features o burbujas; sin halos)"""
+    total = 0
+    for hijo in capa._children.values():
+        if isinstance(hijo, GeoJsonCanvas):
+            total += len(hijo.datos['features'])
+        elif isinstance(hijo, (folium.FeatureGroup, plugins.MarkerCluster)):
+            total += contar_marcadores(hijo)
+        elif isinstance(hijo, folium.Marker) and not isinstance(hijo, folium.CircleMarker):
+            total += 1
+    return total
+
+def usar_cluster(lugares_data):
+    """Si el cluster está activado y hay más de UMBRAL_CLUSTER lugares con coordenadas"""
+    if not CLUSTER_MARCADORES:
+        return False
+    if isinstance(lugares_data, TablaLugares):
+        return int(lugares_data.mascara_coords().sum()) > UMBRAL_CLUSTER
+    return sum(1 for l in lugares_data if l['lat'] and l['lon']) > UMBRAL_CLUSTER
+
+def crear_mapa_interactivo(grafo, lugares_data, center_lat=-13.53, center_lon=-71.97, zoom=8, estilo_mapa="Relieve", lugares_destacados=None, relaciones_lugares=None, popups_diferidos=False, modo_marcadores=None):
+    """Crea un mapa Folium con múltiples estilos de mapa
+    
+    Con popups_diferidos=True los marcadores solo llevan tooltip: el contenido
+    del popup no viaja con el mapa y se genera en el servidor al hacer click.
+    """
+    
+    # Filtrar lugares con coordenadas
+    if isinstance(lugares_data, TablaLugares):
+        lugares_con_coords = lugares_data.con_coords()
+    else:
+        lugares_con_coords = [l for l in lugares_data if l['lat'] and l['lon']]
+    
+    if not lugares_con_coords:
+        return folium.Map(location=[center_lat, center_lon], zoom_start=zoom)
+    
+    mapa = crear_mapa_base(center_lat, center_lon, zoom, estilo_mapa, popups_diferidos)
+    crear_capa(
+        grafo, lugares_con_coords, lugares_destacados, relaciones_lugares, popups_diferidos, modo_marcadores
+    ).add_to(mapa)
+    
+    return mapa
@@ -0,0 +1,167 @@
+# -*- coding: utf-8 -*-
+"""
+Tiempos por fase de cada rerun y exportación de métricas.
+
+Cada ejecución de app.py abre un Cronometro (uno por hilo: Streamlit
+ejecuta cada sesión en su propio hilo) y marca sus fases con
+`with fase("nombre")`. Las funciones de otros módulos (capas, relaciones,
+popups) usan el mismo `fase()`: si no hay cronómetro activo no miden nada.
+
+- Panel de depuración: QOYLLUR_DEPURACION=1 o ?depurar=1 en la URL.
+- Fichero de métricas: QOYLLUR_METRICAS=<ruta>; se reescribe al final de
+  cada rerun, en JSON si la ruta termina en .json y si no en formato de
+  texto de Prometheus (para el textfile collector de node_exporter).
+  Incluye las estadísticas por consulta SPARQL de consultas_sparql.REGISTRO.
+"""
+
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+
+DEPURACION = os.environ.get("QOYLLUR_DEPURACION", "0") == "1"
+RUTA_METRICAS = os.environ.get("QOYLLUR_METRICAS", "")
+
+
+class Cronometro:
+    """Tiempos acumulados por fase (en orden de aparición) y valores sueltos"""
+
+    def __init__(self):
+        self.inicio = time.perf_counter()
+        self.fases = {}      # nombre -> [segundos, llamadas]
+        self.valores = {}
+
+    @contextmanager
+    def fase(self, nombre):
+        inicio = time.perf_counter()
+        try:
+            yield
+        finally:
+            acumulado = self.fases.setdefault(nombre, [0.0, 0])
+            acumulado[0] += time.perf_counter() - inicio
+            acumulado[1] += 1
+
+    def valor(self, nombre, valor):
+        self.valores[nombre] = valor
+
+    def total(self):
+        return time.perf_counter() - self.inicio
+
+
+_local = threading.local()
+
+
+def iniciar():
+    """Cronómetro nuevo para el rerun de este hilo"""
+    _local.cronometro = Cronometro()
+    return _local.cronometro
+
+
+def actual():
+    return getattr(_local, "cronometro", None)
+
+
+@contextmanager
+def fase(nombre):
+    """Mide la fase en el cronómetro del hilo, si lo hay"""
+    cronometro = actual()
+    if cronometro is None:
+        yield
+        return
+    with cronometro.fase(nombre):
+        yield
+
+
+class RegistroMetricas:
+    """Acumulado del proceso: reruns, tiempos por fase y últimos valores"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reruns = 0
+        self.fases = {}      # nombre -> {'total_s', 'llamadas', 'ultima_s'}
+        self.valores = {}
+
+    def registrar(self, cronometro):
+        with self._lock:
+            self.reruns += 1
+            for datos in self.fases.values():
+                datos['ultima_s'] = 0.0
+            for nombre, (segundos, llamadas) in list(cronometro.fases.items()) + [('total', (cronometro.total(), 1))]:
+                datos = self.fases.setdefault(nombre, {'total_s': 0.0, 'llamadas': 0, 'ultima_s': 0.0})
+                datos['total_s'] += segundos
+                datos['llamadas'] += llamadas
+                datos['ultima_s'] = segundos
+            self.valores.update(cronometro.valores)
+
+    def como_dict(self, caches=None, consultas=None):
+        with self._lock:
+            return {
+                'reruns': self.reruns,
+                'fases': {nombre: dict(datos) for nombre, datos in self.fases.items()},
+                'valores': dict(self.valores),
+                'caches': caches or {},
+                'consultas': consultas or {},
+            }
+
+    def prometheus(self, caches=None, consultas=None):
+        """Texto de exposición de Prometheus"""
+        datos = self.como_dict(caches, consultas)
+        lineas = [
+            "# HELP qoyllur_reruns_total Ejecuciones completas de app.py",
+            "# TYPE qoyllur_reruns_total counter",
+            f"qoyllur_reruns_total {datos['reruns']}",
+            "# HELP qoyllur_fase_segundos Duración de cada fase de app.py",
+            "# TYPE qoyllur_fase_segundos summary",
+        ]
+        for nombre, fase_ in datos['fases'].items():
+            lineas.append(f'qoyllur_fase_segundos_sum{{fase="{nombre}"}} {fase_["total_s"]:.6f}')
+            lineas.append(f'qoyllur_fase_segundos_count{{fase="{nombre}"}} {fase_["llamadas"]}')
+        lineas += [
+            "# HELP qoyllur_fase_ultima_segundos Duración de cada fase en el último rerun",
+            "# TYPE qoyllur_fase_ultima_segundos gauge",
+        ]
+        for nombre, fase_ in datos['fases'].items():
+            lineas.append(f'qoyllur_fase_ultima_segundos{{fase="{nombre}"}} {fase_["ultima_s"]:.6f}')
+        for nombre, valor in datos['valores'].items():
+            if isinstance(valor, (int, float)) and not isinstance(valor, bool):
+                lineas.append(f"# TYPE qoyllur_{nombre} gauge")
+                lineas.append(f"qoyllur_{nombre} {valor}")
+        lineas += [
+            "# HELP qoyllur_cache_tasa_aciertos Aciertos / consultas de cada caché",
+            "# TYPE qoyllur_cache_tasa_aciertos gauge",
+        ]
+        for cache, estadisticas in datos['caches'].items():
+            if estadisticas.get('tasa_aciertos') is not None:
+                lineas.append(f'qoyllur_cache_tasa_aciertos{{cache="{cache}"}} {estadisticas["tasa_aciertos"]:.6f}')
+        for campo in ('aciertos', 'fallos'):
+            lineas.append(f"# TYPE qoyllur_cache_{campo}_total counter")
+            for cache, estadisticas in datos['caches'].items():
+                lineas.append(f'qoyllur_cache_{campo}_total{{cache="{cache}"}} {estadisticas.get(campo, 0)}')
+        lineas += [
+            "# HELP qoyllur_sparql_segundos Evaluación de cada consulta SPARQL",
+            "# TYPE qoyllur_sparql_segundos summary",
+        ]
+        for nombre, consulta in datos['consultas'].items():
+            lineas.append(f'qoyllur_sparql_segundos_sum{{consulta="{nombre}"}} {consulta["evaluacion_total_s"]:.6f}')
+            lineas.append(f'qoyllur_sparql_segundos_count{{consulta="{nombre}"}} {consulta["ejecuciones"]}')
+        for campo in ('filas', 'errores', 'lentas'):
+            lineas.append(f"# TYPE qoyllur_sparql_{campo}_total counter")
+            for nombre, consulta in datos['consultas'].items():
+                lineas.append(f'qoyllur_sparql_{campo}_total{{consulta="{nombre}"}} {consulta[campo]}')
+        return "\n".join(lineas) + "\n"
+
+    def exportar(self, ruta, caches=None, consultas=None):
+        """Escribe el fichero de métricas (reemplazo atómico)"""
+        if ruta.endswith(".json"):
+            contenido = json.dumps(self.como_dict(caches, consultas), indent=2, ensure_ascii=False)
+        else:
+            contenido = self.prometheus(caches, consultas)
+        temporal = f"{ruta}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(temporal, "w", encoding="utf-8") as f:
+            f.write(contenido)
+        os.replace(temporal, ruta)
+
+
+# Instancia única del proceso
+METRICAS = RegistroMetricas()
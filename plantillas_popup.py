@@ -0,0 +1,233 @@
+# -*- coding: utf-8 -*-
+"""
+Plantillas HTML de los popups del mapa con una hoja de estilos compartida.
+
+Antes cada popup era un documento completo (<!DOCTYPE>, <head> y todo el
+bloque <style>) metido en un folium.IFrame, que además lo codifica en base64
+como data URI. Aquí el CSS se emite una sola vez por mapa
+(`agregar_estilos_popup`) y cada marcador lleva solo su fragmento HTML; el
+color por tipo viaja como variable CSS (--qp-color) en el propio fragmento.
+
+La hoja de estilos no puede ir en el <head> de la Figure: st_folium solo
+envía el script de Leaflet (los scripts del mapa y de sus hijos), así que
+se inyecta desde un script que añade un <style> a document.head.
+
+Para mostrar un popup fuera del mapa (p. ej. con components.html) se usa
+`documento_popup`, que envuelve el fragmento con la hoja de estilos.
+
+`bytes_html_mapa` mide el HTML completo del mapa para compararlo con
+PRESUPUESTO_HTML_MAPA; `estimar_bytes_html` lo estima sin renderizar (para
+el límite de memoria de la caché de mapas).
+"""
+
+import html
+import json
+import os
+
+import folium
+from branca.element import MacroElement
+from jinja2 import Template
+
+# Presupuesto (bytes) del HTML serializado del mapa
+PRESUPUESTO_HTML_MAPA = int(os.environ.get("QOYLLUR_PRESUPUESTO_HTML_MAPA", str(512 * 1024)))
+
+# Plantilla JS/HTML media por elemento folium (marcador, icono, popup...)
+BYTES_POR_ELEMENTO = 400
+
+# Color según tipo
+COLORES_TIPO = {
+    'Localidad': '#3498db',
+    'Santuario': '#e74c3c',
+    'Glaciar': '#1abc9c',
+    'Iglesia': '#9b59b6',
+    'Ruta': '#e67e22',
+    'Lugar': '#2ecc71'
+}
+COLOR_POR_DEFECTO = '#95a5a6'
+
+# Ancho de los popups en el mapa
+ANCHO_POPUP_LUGAR = 370
+ANCHO_POPUP_GRUPO = 400
+
+ESTILOS_POPUP = """
+.qp { font-family: 'Segoe UI', Tahoma, Geneva, sans-serif; font-size: 14px; color: #333; line-height: 1.4; }
+.qp h3 { margin: 0; font-weight: 600; }
+.qp p { margin: 0; }
+.qp.popup-container { width: 350px; max-height: 450px; overflow-y: auto; border-radius: 8px; box-shadow: 0 4px 12px rgba(0,0,0,0.15); }
+.qp .popup-header { background-color: var(--qp-color); color: white; padding: 12px 15px; border-radius: 8px 8px 0 0; }
+.qp .popup-header h3 { font-size: 16px; }
+.qp .popup-header p { margin-top: 4px; font-size: 12px; opacity: 0.9; }
+.qp .popup-body { padding: 15px; background-color: #ffffff; }
+.qp .info-section { margin-bottom: 12px; padding-bottom: 12px; border-bottom: 1px solid #eee; }
+.qp .info-section:last-child { border-bottom: none; }
+.qp .descripcion { font-size: 13px; color: #444; }
+.qp .section-title { color: var(--qp-color); font-size: 13px; font-weight: 600; margin: 0 0 8px 0; text-transform: uppercase; letter-spacing: 0.5px; }
+.qp .item { background: #f8f9fa; padding: 6px 8px; margin: 3px 0; border-radius: 4px; font-size: 12px; border-left: 2px solid var(--qp-color); }
+.qp .mas { font-size: 11px; color: #666; margin-top: 5px; }
+.qp .coordenadas { background: #f0f7ff; padding: 8px 10px; border-radius: 6px; font-size: 11px; color: #2c3e50; margin: 10px 0; }
+.qp .etiqueta { font-weight: 600; }
+.qp .ubicado { margin-top: 4px; }
+.qp.grupo-container { width: 380px; max-height: 400px; overflow-y: auto; }
+.qp .grupo-header { background: #2c3e50; color: white; padding: 12px 15px; border-radius: 6px 6px 0 0; }
+.qp .grupo-header h3 { font-size: 15px; }
+.qp .grupo-header p { margin-top: 4px; font-size: 11px; opacity: 0.9; }
+.qp .grupo-body { padding: 12px; }
+.qp .lugar-card { background: white; margin: 8px 0; padding: 10px; border-radius: 5px; border: 1px solid #e0e0e0; border-left: 3px solid var(--qp-color); }
+.qp .lugar-card.destacado { border-left: 4px solid #ffcc00; }
+.qp .lugar-fila { display: flex; align-items: center; margin-bottom: 6px; }
+.qp .lugar-num { background: var(--qp-color); color: white; width: 22px; height: 22px; border-radius: 50%; display: flex; align-items: center; justify-content: center; margin-right: 8px; font-weight: bold; font-size: 11px; }
+.qp .lugar-nombre { font-weight: 600; font-size: 13px; color: #2c3e50; }
+.qp .lugar-tipo { font-size: 11px; color: #666; }
+"""
+
+
+def color_tipo(tipo_general):
+    return COLORES_TIPO.get(tipo_general, COLOR_POR_DEFECTO)
+
+
+def fragmento_popup_lugar(lugar, relaciones):
+    """Fragmento HTML del popup de un lugar (sin <head> ni estilos)"""
+    e = html.escape
+    partes = [
+        f'<div class="qp popup-container" style="--qp-color: {color_tipo(lugar["tipo_general"])};">',
+        '<div class="popup-header">',
+        f'<h3>{e(lugar["nombre"])}</h3>',
+        f'<p>{e(lugar["tipo_especifico"] or lugar["tipo_general"])} • Nivel {e(lugar["nivel"])}</p>',
+        '</div>',
+        '<div class="popup-body">',
+        f'<div class="info-section"><p class="descripcion">{e(lugar["descripcion"])}</p></div>',
+        '<div class="coordenadas">',
+        '<div class="etiqueta">Coordenadas:</div>',
+        f'<div>{lugar["lat"]:.6f}, {lugar["lon"]:.6f}</div>',
+    ]
+    if lugar['ubicado_en']:
+        partes.append(f'<div class="ubicado"><span class="etiqueta">Ubicado en:</span> {e(lugar["ubicado_en"])}</div>')
+    partes.append('</div>')
+
+    # Eventos
+    if relaciones['eventos']:
+        partes.append('<div class="info-section"><div class="section-title">Eventos Rituales</div>')
+        for evento in relaciones['eventos'][:3]:
+            partes.append(f'<div class="item">• {e(evento["nombre"])}</div>')
+        if len(relaciones['eventos']) > 3:
+            partes.append(f'<div class="mas">+ {len(relaciones["eventos"]) - 3} eventos más</div>')
+        partes.append('</div>')
+
+    # Festividades
+    if relaciones['festividades']:
+        partes.append('<div class="info-section"><div class="section-title">Festividades</div>')
+        for fest in relaciones['festividades']:
+            partes.append(f'<div class="item">• {e(fest["nombre"])}</div>')
+        partes.append('</div>')
+
+    # Recursos
+    if relaciones['recursos']:
+        partes.append('<div class="info-section"><div class="section-title">Recursos Multimedia</div>')
+        for recurso in relaciones['recursos'][:2]:
+            partes.append(f'<div class="item">{e(recurso["tipo"])}: {e(recurso["codigo"])}</div>')
+        partes.append('</div>')
+
+    partes.append('</div></div>')
+    return ''.join(partes)
+
+
+def fragmento_popup_grupo(lugares, lat, lon, lugares_destacados_uris=()):
+    """Fragmento HTML del popup para varios lugares en la misma ubicación"""
+    partes = [
+        '<div class="qp grupo-container">',
+        '<div class="grupo-header">',
+        f'<h3>{len(lugares)} lugares en esta ubicación</h3>',
+        f'<p>Coordenadas: {lat:.6f}, {lon:.6f}</p>',
+        '</div>',
+        '<div class="grupo-body">',
+    ]
+    for i, lugar in enumerate(lugares):
+        color_lugar = '#3498db' if lugar['tipo_general'] == 'Localidad' else '#9b59b6'
+        is_destacado = lugar['uri'] in lugares_destacados_uris
+        clase = "lugar-card destacado" if is_destacado else "lugar-card"
+        partes.append(
+            f'<div class="{clase}" style="--qp-color: {color_lugar};">'
+            f'<div class="lugar-fila"><div class="lugar-num">{i + 1}</div><div>'
+            f'<div class="lugar-nombre">{html.escape(lugar["nombre"])}{" 🔸" if is_destacado else ""}</div>'
+            f'<div class="lugar-tipo">{html.escape(lugar["tipo_general"])}</div>'
+            '</div></div></div>'
+        )
+    partes.append('</div></div>')
+    return ''.join(partes)
+
+
+def documento_popup(fragmento):
+    """Documento HTML autónomo (estilos incluidos) para mostrar un fragmento fuera del mapa"""
+    return (
+        '<!DOCTYPE html><html><head><meta charset="UTF-8">'
+        f'<style>body {{ margin: 0; padding: 0; }}{ESTILOS_POPUP}</style>'
+        f'</head><body>{fragmento}</body></html>'
+    )
+
+
+class EstilosPopup(MacroElement):
+    """Script que añade la hoja de estilos de los popups a document.head (una vez)"""
+
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        (function() {
+            if (document.getElementById("qoyllur-estilos-popup")) { return; }
+            var estilo = document.createElement("style");
+            estilo.id = "qoyllur-estilos-popup";
+            estilo.textContent = {{ this.css }};
+            document.head.appendChild(estilo);
+        })();
+        {% endmacro %}
+    """)
+
+    def __init__(self):
+        super().__init__()
+        self._name = "EstilosPopup"
+        self.css = json.dumps(ESTILOS_POPUP)
+
+
+def agregar_estilos_popup(mapa):
+    """Añade la hoja de estilos de los popups una sola vez al mapa"""
+    mapa.add_child(EstilosPopup(), name="estilos_popup")
+
+
+def bytes_html_mapa(mapa):
+    """Tamaño en bytes (UTF-8) del HTML completo del mapa"""
+    return len(mapa.get_root().render().encode("utf-8"))
+
+
+def estimar_bytes_html(elemento):
+    """Bytes aproximados del HTML de un elemento folium, sin renderizarlo
+
+    Suma los textos y datos propios de cada elemento del árbol (popups,
+    tooltips, opciones, GeoJSON) más BYTES_POR_ELEMENTO de plantilla. Un mapa
+    se estima desde su Figure para contar también las cabeceras.
+    """
+    if isinstance(elemento, folium.Map):
+        elemento = elemento.get_root()
+    return _estimar_bytes(elemento)
+
+
+def _estimar_bytes(elemento):
+    total = BYTES_POR_ELEMENTO
+    for campo, valor in vars(elemento).items():
+        if campo in ('_children', '_parent'):
+            continue
+        if isinstance(valor, str):
+            total += len(valor.encode("utf-8"))
+        elif isinstance(valor, (dict, list)):
+            try:
+                texto = json.dumps(valor, default=str)
+            except (TypeError, ValueError):
+                continue
+            # tojson escapa < > & ' como \u003c (6 bytes en lugar de 1)
+            total += len(texto.encode("utf-8")) + 5 * sum(texto.count(c) for c in "<>&'")
+    for hijo in elemento._children.values():
+        total += _estimar_bytes(hijo)
+    return total
+
+
+def dentro_de_presupuesto(mapa, presupuesto=None):
+    """(bytes, cumple) del HTML del mapa frente al presupuesto"""
+    tamaño = bytes_html_mapa(mapa)
+    return tamaño, tamaño <= (PRESUPUESTO_HTML_MAPA if presupuesto is None else presupuesto)
@@ -0,0 +1,269 @@
+# -*- coding: utf-8 -*-
+"""
+Precarga de teselas de la región (Qoyllur Rit'i / Paucartambo) en MBTiles.
+
+Calcula la pirámide de teselas que cubre la caja de todos los lugares con
+coordenadas (extraer_lugares) más un margen, para los zooms del slider de
+la app (6 a 15), y la descarga en data/teselas/<id>.mbtiles para el
+servidor local (servidor_teselas.py).
+
+- Descargas concurrentes con un número acotado de hilos y de peticiones
+  pendientes; la escritura en SQLite la hace un solo hilo.
+- Reanudable: las teselas que ya están en el MBTiles no se vuelven a pedir.
+- Informe por zoom: teselas totales, ya presentes, descargadas, fallidas y
+  bytes. Con --estimar no descarga ni crea ni modifica el MBTiles: estima
+  el tamaño con el promedio de las teselas ya guardadas o, si no hay
+  ninguna, con un tamaño típico por formato.
+
+Por defecto solo se precargan los estilos cuyo origen admite la descarga
+masiva (`precarga` en capas_teselas). Las políticas de uso de OpenStreetMap
+y OpenTopoMap la prohíben y los términos de Esri World Imagery (relieve) la
+restringen: esos estilos exigen --ignorar-politica y un --contacto (correo
+o URL) que se añade al User-Agent.
+
+Uso:
+    python precargar_teselas.py data/grafo.ttl [--estilos claro]
+        [--margen 0.2] [--zoom-min 6] [--zoom-max 15] [--hilos 8]
+        [--directorio data/teselas] [--estimar] [--informe informe.json]
+        [--contacto correo@ejemplo.org] [--ignorar-politica]
+"""
+
+import argparse
+import json
+import math
+import os
+import sys
+import time
+import urllib.request
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+
+from capas_teselas import TILE_LAYERS_ORIGEN
+from lugares_grafo import extraer_lugares
+from servidor_teselas import DIRECTORIO_TESELAS, AlmacenMBTiles
+from snapshot_grafo import cargar_snapshot
+
+# Rango del slider de zoom de la app
+ZOOM_MIN = 6
+ZOOM_MAX = 15
+
+# Margen alrededor de la caja de los lugares (grados)
+MARGEN_GRADOS = 0.2
+
+HILOS = 8
+REINTENTOS = 2
+TIMEOUT_S = 20
+AGENTE = "geo-qoyllurity-precarga/1.0 (mapa de la festividad de Qoyllur Rit'i)"
+
+# Tamaño típico de una tesela de 256 px por formato (estimación sin muestras)
+BYTES_TESELA_TIPICA = {"jpg": 20000, "png": 12000}
+
+
+def agente(contacto=None):
+    """User-Agent de la precarga, con el contacto si se indica"""
+    return f"{AGENTE[:-1]}; {contacto})" if contacto else AGENTE
+
+
+def caja_lugares(lugares, margen=MARGEN_GRADOS):
+    """(sur, oeste, norte, este) de los lugares con coordenadas, con margen"""
+    puntos = [(l['lat'], l['lon']) for l in lugares if l['lat'] and l['lon']]
+    if not puntos:
+        raise ValueError("No hay lugares con coordenadas")
+    lats = [p[0] for p in puntos]
+    lons = [p[1] for p in puntos]
+    return (max(-85.0, min(lats) - margen), max(-180.0, min(lons) - margen),
+            min(85.0, max(lats) + margen), min(180.0, max(lons) + margen))
+
+
+def tesela(lat, lon, z):
+    """(x, y) XYZ de la tesela que contiene la coordenada (Web Mercator)"""
+    n = 1 << z
+    x = int((lon + 180.0) / 360.0 * n)
+    lat_rad = math.radians(lat)
+    y = int((1.0 - math.asinh(math.tan(lat_rad)) / math.pi) / 2.0 * n)
+    return min(max(x, 0), n - 1), min(max(y, 0), n - 1)
+
+
+def rango_teselas(caja, z):
+    """Rangos de x e y que cubren la caja en el zoom z"""
+    sur, oeste, norte, este = caja
+    x0, y0 = tesela(norte, oeste, z)
+    x1, y1 = tesela(sur, este, z)
+    return range(x0, x1 + 1), range(y0, y1 + 1)
+
+
+def piramide(caja, zoom_min=ZOOM_MIN, zoom_max=ZOOM_MAX):
+    """Teselas (z, x, y) de la caja para cada zoom"""
+    for z in range(zoom_min, zoom_max + 1):
+        xs, ys = rango_teselas(caja, z)
+        for x in xs:
+            for y in ys:
+                yield z, x, y
+
+
+def descargar(url, reintentos=None, agente_http=AGENTE):
+    """Bytes de la URL (reintenta con espera creciente)"""
+    reintentos = REINTENTOS if reintentos is None else reintentos
+    peticion = urllib.request.Request(url, headers={"User-Agent": agente_http})
+    for intento in range(reintentos + 1):
+        try:
+            with urllib.request.urlopen(peticion, timeout=TIMEOUT_S) as respuesta:
+                return respuesta.read()
+        except Exception:
+            if intento == reintentos:
+                raise
+            time.sleep(0.5 * 2 ** intento)
+
+
+def _informe_vacio(caja, zoom_min, zoom_max):
+    informe = {}
+    for z in range(zoom_min, zoom_max + 1):
+        xs, ys = rango_teselas(caja, z)
+        informe[z] = {'teselas': len(xs) * len(ys), 'presentes': 0, 'descargadas': 0,
+                      'fallidas': 0, 'bytes': 0}
+    return informe
+
+
+def _presentes(conexion, caja, zoom_min, zoom_max, informe):
+    """Teselas de la pirámide que no están en el MBTiles; anota las presentes"""
+    pendientes = []
+    for z, x, y in piramide(caja, zoom_min, zoom_max):
+        fila = None
+        if conexion is not None:
+            fila = conexion.execute(
+                "SELECT length(tile_data) FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+                (z, x, (1 << z) - 1 - y)
+            ).fetchone()
+        if fila:
+            informe[z]['presentes'] += 1
+            informe[z]['bytes'] += fila[0]
+        else:
+            pendientes.append((z, x, y))
+    return pendientes
+
+
+def _estimar(informe, formato):
+    """Bytes estimados por zoom: promedio de lo guardado (del zoom o global) o tamaño típico"""
+    presentes = sum(i['presentes'] for i in informe.values())
+    promedio_global = sum(i['bytes'] for i in informe.values()) / presentes if presentes else None
+    for datos in informe.values():
+        promedio = datos['bytes'] / datos['presentes'] if datos['presentes'] else promedio_global
+        datos['estimacion'] = "guardadas" if promedio else "tipica"
+        datos['bytes_estimados'] = int((promedio or BYTES_TESELA_TIPICA.get(formato, 15000)) * datos['teselas'])
+    return informe
+
+
+def precargar_estilo(id_estilo, origen, caja, directorio=DIRECTORIO_TESELAS,
+                     zoom_min=ZOOM_MIN, zoom_max=ZOOM_MAX, hilos=HILOS, estimar=False,
+                     formato="png", agente_http=AGENTE):
+    """Rellena <directorio>/<id>.mbtiles con la pirámide de la caja; informe por zoom"""
+    ruta = os.path.join(directorio, f"{id_estilo}.mbtiles")
+    informe = _informe_vacio(caja, zoom_min, zoom_max)
+
+    if estimar:
+        # Solo lectura: sin MBTiles no hay nada guardado y no se crea
+        conexion = AlmacenMBTiles(ruta)._conexion() if os.path.exists(ruta) else None
+        try:
+            _presentes(conexion, caja, zoom_min, zoom_max, informe)
+        finally:
+            if conexion is not None:
+                conexion.close()
+        return _estimar(informe, formato)
+
+    almacen = AlmacenMBTiles(ruta, escritura=True)
+    # Teselas ya guardadas (reanudación) y sus bytes
+    pendientes = _presentes(almacen._conexion(), caja, zoom_min, zoom_max, informe)
+
+    almacen.metadatos(name=id_estilo, format=formato, bounds=",".join(
+        str(v) for v in (caja[1], caja[0], caja[3], caja[2])), minzoom=zoom_min, maxzoom=zoom_max)
+
+    # Pool acotado: como mucho 4 peticiones pendientes por hilo
+    with ThreadPoolExecutor(max_workers=hilos) as pool:
+        en_curso = {}
+        cola = iter(pendientes)
+        while True:
+            while len(en_curso) < hilos * 4:
+                siguiente = next(cola, None)
+                if siguiente is None:
+                    break
+                z, x, y = siguiente
+                url = origen.format(z=z, x=x, y=y)
+                en_curso[pool.submit(descargar, url, None, agente_http)] = siguiente
+            if not en_curso:
+                break
+            hechas, _ = wait(en_curso, return_when=FIRST_COMPLETED)
+            for futuro in hechas:
+                z, x, y = en_curso.pop(futuro)
+                try:
+                    datos = futuro.result()
+                except Exception:
+                    informe[z]['fallidas'] += 1
+                    continue
+                almacen.guardar(z, x, y, datos)
+                informe[z]['descargadas'] += 1
+                informe[z]['bytes'] += len(datos)
+    return informe
+
+
+def _imprimir(id_estilo, informe, estimar):
+    print(f"\n{id_estilo}")
+    if estimar:
+        print(f"  {'zoom':>4} {'teselas':>8} {'presentes':>9} {'MB estimados':>13}")
+    else:
+        print(f"  {'zoom':>4} {'teselas':>8} {'presentes':>9} {'descargadas':>11} {'fallidas':>8} {'MB':>8}")
+    for z, datos in informe.items():
+        if estimar:
+            tipica = " (tamaño típico)" if datos['estimacion'] == "tipica" else ""
+            print(f"  {z:>4} {datos['teselas']:>8} {datos['presentes']:>9} "
+                  f"{datos['bytes_estimados'] / 1e6:13.2f}{tipica}")
+        else:
+            print(f"  {z:>4} {datos['teselas']:>8} {datos['presentes']:>9} {datos['descargadas']:>11} "
+                  f"{datos['fallidas']:>8} {datos['bytes'] / 1e6:>8.2f}")
+    total = sum(d['teselas'] for d in informe.values())
+    print(f"  Total: {total} teselas")
+
+
+if __name__ == "__main__":
+    estilos_config = {c["id"]: c for c in TILE_LAYERS_ORIGEN.values()}
+    parser = argparse.ArgumentParser(description="Precarga de teselas de la región en MBTiles")
+    parser.add_argument("ttl", help="grafo TTL (p. ej. data/grafo.ttl)")
+    parser.add_argument("--estilos", default=",".join(i for i, c in estilos_config.items() if c["precarga"]))
+    parser.add_argument("--margen", type=float, default=MARGEN_GRADOS, help="margen en grados")
+    parser.add_argument("--zoom-min", type=int, default=ZOOM_MIN)
+    parser.add_argument("--zoom-max", type=int, default=ZOOM_MAX)
+    parser.add_argument("--hilos", type=int, default=HILOS)
+    parser.add_argument("--directorio", default=DIRECTORIO_TESELAS)
+    parser.add_argument("--estimar", action="store_true", help="solo contar y estimar, sin descargar")
+    parser.add_argument("--informe", help="guardar el informe en JSON")
+    parser.add_argument("--contacto", help="correo o URL de contacto para el User-Agent")
+    parser.add_argument("--ignorar-politica", action="store_true",
+                        help="permitir estilos cuyo origen prohíbe la descarga masiva (exige --contacto)")
+    args = parser.parse_args()
+
+    estilos = [e for e in args.estilos.split(",") if e]
+    desconocidos = [e for e in estilos if e not in estilos_config]
+    if desconocidos:
+        print(f"Estilos desconocidos: {', '.join(desconocidos)} (usar {', '.join(estilos_config)})")
+        sys.exit(1)
+    restringidos = [e for e in estilos if not estilos_config[e]["precarga"]]
+    if restringidos and not args.estimar and not (args.ignorar_politica and args.contacto):
+        print(f"La política de uso de {', '.join(restringidos)} no permite la descarga masiva; "
+              "usar --ignorar-politica y --contacto solo con permiso del proveedor")
+        sys.exit(1)
+
+    caja = caja_lugares(extraer_lugares(cargar_snapshot(args.ttl)), args.margen)
+    print(f"Caja: sur {caja[0]:.4f}, oeste {caja[1]:.4f}, norte {caja[2]:.4f}, este {caja[3]:.4f}; "
+          f"zoom {args.zoom_min}-{args.zoom_max}")
+
+    informes = {}
+    for id_estilo in estilos:
+        config = estilos_config[id_estilo]
+        informes[id_estilo] = precargar_estilo(
+            id_estilo, config["origen"], caja, args.directorio,
+            args.zoom_min, args.zoom_max, args.hilos, args.estimar,
+            config["formato"], agente(args.contacto)
+        )
+        _imprimir(id_estilo, informes[id_estilo], args.estimar)
+
+    if args.informe:
+        with open(args.informe, "w", encoding="utf-8") as f:
+            json.dump({'caja': caja, 'estilos': informes}, f, indent=2, ensure_ascii=False)
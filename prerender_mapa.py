@@ -0,0 +1,169 @@
+# -*- coding: utf-8 -*-
+"""
+Prerender estático del mapa para servirlo desde un CDN.
+
+La mayoría de las visitas ven la vista por defecto (estilo "Relieve",
+zoom 8, centro -13.53/-71.97, todos los tipos). Este comando carga el
+grafo una vez, extrae los lugares y genera con crear_mapa_interactivo un
+HTML autónomo por estilo de mapa y combinación de filtros por defecto,
+más la capa de lugares en GeoJSON. La app de Streamlit solo hace falta
+para la exploración interactiva.
+
+Artefactos en el directorio de salida (dist/ por defecto):
+
+- mapa_<estilo>.html: mapa con todos los tipos (index.html = Relieve)
+- mapa_<estilo>_<tipo>.html: con --por-tipo, un mapa por tipo general con coordenadas
+- lugares.geojson y lugares_<tipo>.geojson: un Point por lugar con coordenadas
+- manifest.json: fuente (nombre del fichero o URL), sha256 del grafo, vista y
+  bytes/sha256 de cada fichero
+
+Los popups van dentro del HTML (no hay servidor que los genere al hacer
+click). Las teselas salen de los servidores públicos; si se define
+QOYLLUR_TESELAS_LOCALES apuntan a ese servidor, que debe ser accesible
+desde el navegador de las visitas.
+
+Uso:
+    python prerender_mapa.py [--ttl data/grafo.ttl] [--salida dist]
+        [--estilos Relieve,Claro] [--por-tipo] [--modo marcadores|geojson]
+"""
+
+import argparse
+import hashlib
+import json
+import os
+import re
+import sys
+import unicodedata
+from datetime import datetime
+
+from capas_teselas import TILE_LAYERS_ORIGEN, URL_TESELAS_LOCALES
+from datos_grafo import FUENTE_GRAFO, cargar_datos_grafo
+from mapa_folium import MODO_MARCADORES, MODOS_MARCADORES, contar_marcadores, crear_mapa_interactivo
+
+# Vista por defecto de la app
+CENTRO_LAT = -13.53
+CENTRO_LON = -71.97
+ZOOM = 8
+ESTILO_INDICE = "Relieve"
+
+SALIDA = "dist"
+
+
+def slug(texto):
+    """Nombre de fichero ASCII en minúsculas ("Sitio sagrado" -> "sitio-sagrado")"""
+    ascii_ = unicodedata.normalize("NFKD", texto).encode("ascii", "ignore").decode()
+    return re.sub(r"[^a-z0-9]+", "-", ascii_.lower()).strip("-") or "sin-tipo"
+
+
+def geojson_lugares(tabla):
+    """FeatureCollection con un Point por lugar con coordenadas"""
+    features = []
+    for lugar in tabla.con_coords():
+        propiedades = {c: v for c, v in lugar.items() if c not in ('lat', 'lon')}
+        features.append({
+            'type': 'Feature',
+            'geometry': {'type': 'Point', 'coordinates': [lugar['lon'], lugar['lat']]},
+            'properties': propiedades,
+        })
+    return {'type': 'FeatureCollection', 'features': features}
+
+
+def combinaciones(tabla, por_tipo=False):
+    """(sufijo, tipos, lugares a mostrar) de cada combinación de filtros
+
+    Los tipos sin ningún lugar con coordenadas no tienen mapa.
+    """
+    yield "", None, tabla
+    if por_tipo:
+        for tipo in tabla.con_coords().tipos():
+            yield f"_{slug(tipo)}", [tipo], tabla.por_tipos([tipo])
+
+
+def _sha256_fichero(ruta):
+    with open(ruta, "rb") as f:
+        return hashlib.sha256(f.read()).hexdigest()
+
+
+def _escribir(ruta, contenido):
+    """Escribe (reemplazo atómico) y devuelve bytes y sha256"""
+    datos = contenido.encode("utf-8")
+    temporal = f"{ruta}.tmp"
+    with open(temporal, "wb") as f:
+        f.write(datos)
+    os.replace(temporal, ruta)
+    return {'bytes': len(datos), 'sha256': hashlib.sha256(datos).hexdigest()}
+
+
+def prerender(fuente, salida=SALIDA, estilos=None, por_tipo=False, modo_marcadores=None):
+    """Genera los HTML y GeoJSON en `salida` y devuelve el manifiesto"""
+    estilos = list(estilos or TILE_LAYERS_ORIGEN)
+    modo_marcadores = modo_marcadores or MODO_MARCADORES
+    os.makedirs(salida, exist_ok=True)
+
+    datos = cargar_datos_grafo(fuente)
+    grafo, tabla, relaciones = datos['grafo'], datos['lugares'], datos['relaciones']
+
+    artefactos = {}
+    for sufijo, tipos, lugares in combinaciones(tabla, por_tipo):
+        # Con filtro se destacan los lugares mostrados, como en la app
+        destacados = lugares if tipos else None
+        nombre = f"lugares{sufijo}.geojson"
+        artefactos[nombre] = _escribir(
+            os.path.join(salida, nombre),
+            json.dumps(geojson_lugares(lugares), ensure_ascii=False)
+        )
+        artefactos[nombre].update(tipos=tipos, lugares=int(lugares.mascara_coords().sum()))
+
+        for estilo in estilos:
+            mapa = crear_mapa_interactivo(
+                grafo, lugares, CENTRO_LAT, CENTRO_LON, ZOOM, estilo,
+                lugares_destacados=destacados, relaciones_lugares=relaciones,
+                modo_marcadores=modo_marcadores
+            )
+            html = mapa.get_root().render()
+            nombre = f"mapa_{TILE_LAYERS_ORIGEN[estilo]['id']}{sufijo}.html"
+            artefactos[nombre] = _escribir(os.path.join(salida, nombre), html)
+            artefactos[nombre].update(estilo=estilo, tipos=tipos, marcadores=contar_marcadores(mapa))
+            if estilo == ESTILO_INDICE and not tipos:
+                artefactos["index.html"] = dict(_escribir(os.path.join(salida, "index.html"), html),
+                                                estilo=estilo, tipos=None)
+
+    # De un fichero local solo se publica el nombre, no la ruta de la máquina de build
+    local = os.path.exists(fuente)
+    manifiesto = {
+        'fecha': datetime.now().isoformat(timespec='seconds'),
+        'fuente': os.path.basename(fuente) if local else fuente,
+        'sha256_grafo': _sha256_fichero(fuente) if local else None,
+        'triples': len(grafo),
+        'lugares': len(tabla),
+        'vista': {'lat': CENTRO_LAT, 'lon': CENTRO_LON, 'zoom': ZOOM},
+        'modo_marcadores': modo_marcadores,
+        'teselas_locales': URL_TESELAS_LOCALES or None,
+        'artefactos': artefactos,
+    }
+    _escribir(os.path.join(salida, "manifest.json"), json.dumps(manifiesto, indent=2, ensure_ascii=False))
+    return manifiesto
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Prerender estático del mapa (HTML y GeoJSON)")
+    parser.add_argument("--ttl", default=FUENTE_GRAFO, help="grafo TTL (ruta o URL)")
+    parser.add_argument("--salida", default=SALIDA)
+    parser.add_argument("--estilos", default=",".join(TILE_LAYERS_ORIGEN))
+    parser.add_argument("--por-tipo", action="store_true", help="además, un mapa por tipo general")
+    parser.add_argument("--modo", choices=MODOS_MARCADORES, default=MODO_MARCADORES)
+    args = parser.parse_args()
+
+    estilos = [e for e in args.estilos.split(",") if e]
+    desconocidos = [e for e in estilos if e not in TILE_LAYERS_ORIGEN]
+    if desconocidos:
+        print(f"Estilos desconocidos: {', '.join(desconocidos)} (usar {', '.join(TILE_LAYERS_ORIGEN)})")
+        sys.exit(1)
+    if URL_TESELAS_LOCALES:
+        print(f"Aviso: los estilos con MBTiles local apuntan a {URL_TESELAS_LOCALES} (QOYLLUR_TESELAS_LOCALES)")
+
+    manifiesto = prerender(args.ttl, args.salida, estilos, args.por_tipo, args.modo)
+    for nombre, datos in manifiesto['artefactos'].items():
+        print(f"  {nombre:<40} {datos['bytes'] / 1024:9.1f} KB")
+    print(f"{len(manifiesto['artefactos'])} ficheros en {args.salida} "
+          f"({manifiesto['triples']} triples, {manifiesto['lugares']} lugares)")
@@ -0,0 +1,212 @@
+# -*- coding: utf-8 -*-
+"""
+Servidor local de teselas desde ficheros MBTiles.
+
+En campo (Cusco, sin conexión) o con servidores públicos lentos, las
+teselas de los cuatro estilos se sirven desde disco: un fichero
+<id>.mbtiles por estilo (ver capas_teselas) en el directorio de teselas.
+
+- GET /<id>/<z>/<x>/<y>[.ext] devuelve la tesela (esquema XYZ; MBTiles
+  guarda las filas en TMS y aquí se invierten).
+- Cabeceras de caché: Cache-Control con max-age, ETag y Last-Modified;
+  If-None-Match (lista de ETags, débiles W/ o *) responde 304 sin cuerpo.
+- Tesela inexistente o fuera de rango (z > ZOOM_MAXIMO, x o y fuera de
+  0..2^z-1): 404 con un max-age corto.
+
+`AlmacenMBTiles` también lo usa el precargador de teselas para escribir.
+
+Uso:
+    python servidor_teselas.py [directorio] [puerto] [--host 0.0.0.0]
+    (por defecto: data/teselas, 8765 y solo 127.0.0.1; con --host 0.0.0.0
+    lo ven los dispositivos de la red local)
+"""
+
+import argparse
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from email.utils import formatdate
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DIRECTORIO_TESELAS = os.environ.get(
+    "QOYLLUR_DIRECTORIO_TESELAS",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "data", "teselas")
+)
+PUERTO_TESELAS = int(os.environ.get("QOYLLUR_PUERTO_TESELAS", "8765"))
+
+# Segundos que el navegador puede reutilizar una tesela sin preguntar
+MAX_AGE_TESELAS = int(os.environ.get("QOYLLUR_TESELAS_MAX_AGE", str(7 * 24 * 3600)))
+MAX_AGE_AUSENTE = 60
+
+# Zoom más alto que se sirve (coordenadas fuera de rango: 404)
+ZOOM_MAXIMO = 22
+
+_RUTA = re.compile(r"^/([\w-]+)/(\d+)/(\d+)/(\d+)(?:\.\w+)?$")
+
+_ESQUEMA = """
+CREATE TABLE IF NOT EXISTS metadata (name TEXT, value TEXT);
+CREATE TABLE IF NOT EXISTS tiles (zoom_level INTEGER, tile_column INTEGER, tile_row INTEGER, tile_data BLOB);
+CREATE UNIQUE INDEX IF NOT EXISTS tile_index ON tiles (zoom_level, tile_column, tile_row);
+"""
+
+
+def tipo_mime(datos):
+    """Content-Type según la firma de la imagen"""
+    if datos.startswith(b"\x89PNG"):
+        return "image/png"
+    if datos.startswith(b"\xff\xd8"):
+        return "image/jpeg"
+    if datos[:4] == b"RIFF" and datos[8:12] == b"WEBP":
+        return "image/webp"
+    return "application/octet-stream"
+
+
+def etag_coincide(if_none_match, etiqueta):
+    """Si If-None-Match incluye la ETag (comparación débil: se ignora W/; * coincide)"""
+    for valor in if_none_match.split(","):
+        valor = valor.strip()
+        if valor == "*":
+            return True
+        if valor.startswith("W/"):
+            valor = valor[2:]
+        if valor == etiqueta:
+            return True
+    return False
+
+
+class AlmacenMBTiles:
+    """Fichero MBTiles (SQLite) con una conexión por hilo"""
+
+    def __init__(self, ruta, escritura=False):
+        self.ruta = ruta
+        self.escritura = escritura
+        self._local = threading.local()
+        if escritura:
+            os.makedirs(os.path.dirname(os.path.abspath(ruta)), exist_ok=True)
+            with sqlite3.connect(ruta) as conexion:
+                conexion.executescript(_ESQUEMA)
+
+    def _conexion(self):
+        conexion = getattr(self._local, "conexion", None)
+        if conexion is None:
+            if self.escritura:
+                conexion = sqlite3.connect(self.ruta, timeout=30)
+            else:
+                conexion = sqlite3.connect(f"file:{self.ruta}?mode=ro", uri=True)
+            self._local.conexion = conexion
+        return conexion
+
+    def leer(self, z, x, y):
+        """Datos de la tesela XYZ o None"""
+        fila = self._conexion().execute(
+            "SELECT tile_data FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+            (z, x, (1 << z) - 1 - y)
+        ).fetchone()
+        return bytes(fila[0]) if fila else None
+
+    def existe(self, z, x, y):
+        return self._conexion().execute(
+            "SELECT 1 FROM tiles WHERE zoom_level=? AND tile_column=? AND tile_row=?",
+            (z, x, (1 << z) - 1 - y)
+        ).fetchone() is not None
+
+    def guardar(self, z, x, y, datos):
+        conexion = self._conexion()
+        conexion.execute(
+            "INSERT OR REPLACE INTO tiles (zoom_level, tile_column, tile_row, tile_data) VALUES (?, ?, ?, ?)",
+            (z, x, (1 << z) - 1 - y, sqlite3.Binary(datos))
+        )
+        conexion.commit()
+
+    def metadatos(self, **valores):
+        conexion = self._conexion()
+        for nombre, valor in valores.items():
+            conexion.execute("DELETE FROM metadata WHERE name=?", (nombre,))
+            conexion.execute("INSERT INTO metadata (name, value) VALUES (?, ?)", (nombre, str(valor)))
+        conexion.commit()
+
+    def modificado_en(self):
+        return os.path.getmtime(self.ruta)
+
+
+class ManejadorTeselas(BaseHTTPRequestHandler):
+    """GET /<id>/<z>/<x>/<y> desde <directorio>/<id>.mbtiles"""
+
+    directorio = DIRECTORIO_TESELAS
+    almacenes = {}
+    _lock = threading.Lock()
+
+    def _almacen(self, id_estilo):
+        ruta = os.path.join(self.directorio, f"{id_estilo}.mbtiles")
+        if not os.path.exists(ruta):
+            return None
+        with self._lock:
+            if ruta not in self.almacenes:
+                self.almacenes[ruta] = AlmacenMBTiles(ruta)
+            return self.almacenes[ruta]
+
+    def do_GET(self):
+        coincidencia = _RUTA.match(self.path.split("?")[0])
+        if not coincidencia:
+            return self._responder(404, max_age=MAX_AGE_AUSENTE)
+        id_estilo = coincidencia.group(1)
+        z, x, y = (int(v) for v in coincidencia.groups()[1:])
+        if z > ZOOM_MAXIMO or x >= (1 << z) or y >= (1 << z):
+            return self._responder(404, max_age=MAX_AGE_AUSENTE)
+
+        almacen = self._almacen(id_estilo)
+        datos = almacen.leer(z, x, y) if almacen else None
+        if datos is None:
+            return self._responder(404, max_age=MAX_AGE_AUSENTE)
+
+        etiqueta = '"%s"' % hashlib.md5(datos).hexdigest()
+        cabeceras = {
+            "ETag": etiqueta,
+            "Last-Modified": formatdate(almacen.modificado_en(), usegmt=True),
+        }
+        if etag_coincide(self.headers.get("If-None-Match", ""), etiqueta):
+            return self._responder(304, cabeceras=cabeceras)
+        cabeceras["Content-Type"] = tipo_mime(datos)
+        self._responder(200, datos, cabeceras)
+
+    def _responder(self, estado, cuerpo=b"", cabeceras=None, max_age=MAX_AGE_TESELAS):
+        self.send_response(estado)
+        self.send_header("Cache-Control", f"public, max-age={max_age}")
+        self.send_header("Access-Control-Allow-Origin", "*")
+        for nombre, valor in (cabeceras or {}).items():
+            self.send_header(nombre, valor)
+        if estado != 304:
+            self.send_header("Content-Length", str(len(cuerpo)))
+        self.end_headers()
+        if cuerpo:
+            self.wfile.write(cuerpo)
+
+    def log_message(self, formato, *args):
+        pass
+
+
+def crear_servidor(directorio=DIRECTORIO_TESELAS, puerto=PUERTO_TESELAS, host="127.0.0.1"):
+    """Servidor HTTP (multihilo) de las teselas de `directorio`"""
+    manejador = type("Manejador", (ManejadorTeselas,), {"directorio": directorio, "almacenes": {}})
+    return ThreadingHTTPServer((host, puerto), manejador)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Servidor local de teselas MBTiles")
+    parser.add_argument("directorio", nargs="?", default=DIRECTORIO_TESELAS)
+    parser.add_argument("puerto", nargs="?", type=int, default=PUERTO_TESELAS)
+    parser.add_argument("--host", default="127.0.0.1",
+                        help="interfaz de escucha (0.0.0.0 para la red local)")
+    args = parser.parse_args()
+
+    servidor = crear_servidor(args.directorio, args.puerto, args.host)
+    # Con todas las interfaces, el navegador usa la IP del equipo en la red
+    host_url = "<ip-del-equipo>" if args.host in ("0.0.0.0", "::") else args.host
+    print(f"Sirviendo teselas de {args.directorio} en http://{args.host}:{args.puerto}/<estilo>/{{z}}/{{x}}/{{y}}")
+    print(f"Usar con: QOYLLUR_TESELAS_LOCALES=http://{host_url}:{args.puerto} streamlit run app.py")
+    try:
+        servidor.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,410 @@
+# -*- coding: utf-8 -*-
+"""
+Snapshot binario del grafo (.qkg) y store rdflib que lo lee con mmap.
+
+Parsear grafo.ttl con el parser Turtle de rdflib es lo más caro del
+arranque y crece con el tamaño del grafo. Este módulo compila el TTL a un
+archivo binario compacto y ofrece un Store de solo lectura que lo abre con
+mmap: abrir el snapshot solo lee la cabecera, y los términos se decodifican
+bajo demanda cuando las consultas los tocan.
+
+Formato (enteros little-endian sin signo de 32 bits salvo la cabecera):
+
+    cabecera     MAGIC, contadores y desplazamientos de cada sección
+    cadenas      tabla de desplazamientos (n+1) + blob UTF-8, ordenadas
+    términos     n × (tipo, id_valor, id_extra), ordenados
+    spo/pos/osp  n_triples × 3 ids de término, cada una ordenada
+    prefijos     JSON con los namespaces del TTL
+
+Como cadenas y términos están ordenados, buscar el id de un término es una
+búsqueda binaria y no hace falta construir ningún diccionario al abrir.
+
+Uso:
+    python snapshot_grafo.py data/grafo.ttl [data/grafo.qkg]
+"""
+
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.plugins.stores.memory import Memory
+from rdflib.store import Store
+
+MAGIC = b"QKG1"
+EXTENSION = ".qkg"
+
+# Cabecera: magic, n_cadenas, n_terminos, n_triples y 7 desplazamientos u64
+_CABECERA = struct.Struct("<4sIII7Q")
+_SIN_EXTRA = 0xFFFFFFFF
+
+# Tipos de término
+_URI, _BNODE, _LITERAL, _LITERAL_IDIOMA, _LITERAL_TIPADO = range(5)
+
+
+def ruta_snapshot(ruta_ttl):
+    """Ruta del snapshot asociado a un TTL (mismo nombre, extensión .qkg)"""
+    return os.path.splitext(ruta_ttl)[0] + EXTENSION
+
+
+def snapshot_vigente(ruta_ttl, ruta_snap=None):
+    """True si el snapshot existe y no es más viejo que el TTL"""
+    ruta_snap = ruta_snap or ruta_snapshot(ruta_ttl)
+    if not os.path.exists(ruta_snap):
+        return False
+    return os.path.getmtime(ruta_snap) >= os.path.getmtime(ruta_ttl)
+
+
+# -------------------------------------------------------------------
+# COMPILACIÓN TTL -> SNAPSHOT
+# -------------------------------------------------------------------
+
+def _clave_termino(termino):
+    """(tipo, valor, extra) de un término rdflib"""
+    if isinstance(termino, URIRef):
+        return _URI, str(termino), None
+    if isinstance(termino, BNode):
+        return _BNODE, str(termino), None
+    if isinstance(termino, Literal):
+        if termino.language:
+            return _LITERAL_IDIOMA, str(termino), termino.language
+        if termino.datatype:
+            return _LITERAL_TIPADO, str(termino), str(termino.datatype)
+        return _LITERAL, str(termino), None
+    raise TypeError(f"Término no soportado en snapshot: {termino!r}")
+
+
+def _alinear(f):
+    resto = f.tell() % 8
+    if resto:
+        f.write(b"\0" * (8 - resto))
+
+
+def compilar_snapshot(ruta_ttl, ruta_snap=None, formato="turtle"):
+    """Parsea el TTL y escribe el snapshot binario de forma atómica"""
+    ruta_snap = ruta_snap or ruta_snapshot(ruta_ttl)
+
+    grafo = Graph()
+    grafo.parse(ruta_ttl, format=formato)
+
+    # Cadenas ordenadas por bytes UTF-8 (el orden que usa la búsqueda)
+    claves = {_clave_termino(t) for triple in grafo for t in triple}
+    cadenas = set()
+    for _, valor, extra in claves:
+        cadenas.add(valor)
+        if extra is not None:
+            cadenas.add(extra)
+    cadenas_bytes = sorted(c.encode("utf-8") for c in cadenas)
+    id_cadena = {c.decode("utf-8"): i for i, c in enumerate(cadenas_bytes)}
+
+    # Términos ordenados por (tipo, id_valor, id_extra)
+    terminos = sorted(
+        (tipo, id_cadena[valor], _SIN_EXTRA if extra is None else id_cadena[extra])
+        for tipo, valor, extra in claves
+    )
+    id_termino = {t: i for i, t in enumerate(terminos)}
+
+    def _id(termino):
+        tipo, valor, extra = _clave_termino(termino)
+        return id_termino[(tipo, id_cadena[valor],
+                           _SIN_EXTRA if extra is None else id_cadena[extra])]
+
+    spo = sorted((_id(s), _id(p), _id(o)) for s, p, o in grafo)
+    pos = sorted((p, o, s) for s, p, o in spo)
+    osp = sorted((o, s, p) for s, p, o in spo)
+    prefijos = json.dumps(
+        [[prefijo, str(uri)] for prefijo, uri in grafo.namespaces()]
+    ).encode("utf-8")
+
+    directorio = os.path.dirname(os.path.abspath(ruta_snap))
+    fd, tmp = tempfile.mkstemp(prefix=".qkg-", dir=directorio)
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(b"\0" * _CABECERA.size)
+            desplazamientos = []
+
+            _alinear(f)
+            desplazamientos.append(f.tell())
+            acumulado = 0
+            tabla = [0]
+            for c in cadenas_bytes:
+                acumulado += len(c)
+                tabla.append(acumulado)
+            f.write(struct.pack(f"<{len(tabla)}I", *tabla))
+
+            desplazamientos.append(f.tell())
+            f.write(b"".join(cadenas_bytes))
+
+            for filas in (terminos, spo, pos, osp):
+                _alinear(f)
+                desplazamientos.append(f.tell())
+                plano = [v for fila in filas for v in fila]
+                f.write(struct.pack(f"<{len(plano)}I", *plano))
+
+            desplazamientos.append(f.tell())
+            f.write(prefijos)
+
+            f.seek(0)
+            f.write(_CABECERA.pack(MAGIC, len(cadenas_bytes), len(terminos),
+                                   len(spo), *desplazamientos))
+        os.replace(tmp, ruta_snap)
+    except BaseException:
+        if os.path.exists(tmp):
+            os.remove(tmp)
+        raise
+
+    return ruta_snap
+
+
+# -------------------------------------------------------------------
+# STORE DE SOLO LECTURA SOBRE MMAP
+# -------------------------------------------------------------------
+
+class StoreSnapshot(Store):
+    """Store rdflib respaldado por un snapshot .qkg mapeado en memoria.
+
+    Los triples del snapshot son de solo lectura; lo que se añada después
+    (por ejemplo, inferencias) va a un store Memory superpuesto.
+    """
+
+    context_aware = False
+    formula_aware = False
+    transaction_aware = False
+    graph_aware = False
+
+    def __init__(self, ruta_snap):
+        super().__init__()
+        if sys.byteorder != "little":
+            raise RuntimeError("El snapshot .qkg requiere una plataforma little-endian")
+
+        self.ruta = ruta_snap
+        with open(ruta_snap, "rb") as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+        (magic, self._n_cadenas, self._n_terminos, self._n_triples,
+         d_tabla, d_blob, d_terminos, d_spo, d_pos, d_osp,
+         d_prefijos) = _CABECERA.unpack_from(self._mmap, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{ruta_snap} no es un snapshot {MAGIC.decode()}")
+
+        vista = self._vista = memoryview(self._mmap)
+        self._tabla = vista[d_tabla:d_tabla + 4 * (self._n_cadenas + 1)].cast("I")
+        self._blob = d_blob
+        self._terminos = vista[d_terminos:d_terminos + 12 * self._n_terminos].cast("I")
+        tam = 12 * self._n_triples
+        self._indices = {
+            "spo": vista[d_spo:d_spo + tam].cast("I"),
+            "pos": vista[d_pos:d_pos + tam].cast("I"),
+            "osp": vista[d_osp:d_osp + tam].cast("I"),
+        }
+
+        self._prefijos = {}
+        self._namespaces = {}
+        for prefijo, uri in json.loads(bytes(self._mmap[d_prefijos:]).decode("utf-8")):
+            self._bind(prefijo, URIRef(uri))
+
+        self._decodificados = {}
+        self._extra = Memory()
+
+    # --- cadenas y términos -----------------------------------------
+
+    def _cadena_bytes(self, i):
+        return self._mmap[self._blob + self._tabla[i]:self._blob + self._tabla[i + 1]]
+
+    def _id_cadena(self, texto):
+        buscado = texto.encode("utf-8")
+        lo, hi = 0, self._n_cadenas
+        while lo < hi:
+            medio = (lo + hi) // 2
+            if self._cadena_bytes(medio) < buscado:
+                lo = medio + 1
+            else:
+                hi = medio
+        if lo < self._n_cadenas and self._cadena_bytes(lo) == buscado:
+            return lo
+        return None
+
+    def _termino(self, i):
+        termino = self._decodificados.get(i)
+        if termino is None:
+            t = self._terminos
+            tipo, valor, extra = t[3 * i], t[3 * i + 1], t[3 * i + 2]
+            valor = self._cadena_bytes(valor).decode("utf-8")
+            if tipo == _URI:
+                termino = URIRef(valor)
+            elif tipo == _BNODE:
+                termino = BNode(valor)
+            elif tipo == _LITERAL_IDIOMA:
+                termino = Literal(valor, lang=self._cadena_bytes(extra).decode("utf-8"))
+            elif tipo == _LITERAL_TIPADO:
+                termino = Literal(valor, datatype=URIRef(self._cadena_bytes(extra).decode("utf-8")))
+            else:
+                termino = Literal(valor)
+            self._decodificados[i] = termino
+        return termino
+
+    def _id_termino(self, termino):
+        try:
+            tipo, valor, extra = _clave_termino(termino)
+        except TypeError:
+            return None
+        id_valor = self._id_cadena(valor)
+        if id_valor is None:
+            return None
+        if extra is None:
+            id_extra = _SIN_EXTRA
+        else:
+            id_extra = self._id_cadena(extra)
+            if id_extra is None:
+                return None
+        buscado = (tipo, id_valor, id_extra)
+        t = self._terminos
+        lo, hi = 0, self._n_terminos
+        while lo < hi:
+            medio = (lo + hi) // 2
+            if (t[3 * medio], t[3 * medio + 1], t[3 * medio + 2]) < buscado:
+                lo = medio + 1
+            else:
+                hi = medio
+        if lo < self._n_terminos and (t[3 * lo], t[3 * lo + 1], t[3 * lo + 2]) == buscado:
+            return lo
+        return None
+
+    # --- índices de triples -----------------------------------------
+
+    def _rango(self, indice, prefijo):
+        """Filas [inicio, fin) de `indice` cuyo prefijo coincide"""
+        filas = self._indices[indice]
+        k = len(prefijo)
+
+        def clave(i):
+            return tuple(filas[3 * i:3 * i + k])
+
+        lo, hi = 0, self._n_triples
+        while lo < hi:
+            medio = (lo + hi) // 2
+            if clave(medio) < prefijo:
+                lo = medio + 1
+            else:
+                hi = medio
+        inicio = lo
+        hi = self._n_triples
+        while lo < hi:
+            medio = (lo + hi) // 2
+            if clave(medio) <= prefijo:
+                lo = medio + 1
+            else:
+                hi = medio
+        return inicio, lo
+
+    def _triples_base(self, s, p, o):
+        ids = []
+        for termino in (s, p, o):
+            if termino is None:
+                ids.append(None)
+                continue
+            i = self._id_termino(termino)
+            if i is None:
+                return
+            ids.append(i)
+        s_id, p_id, o_id = ids
+
+        if s_id is not None:
+            if o_id is not None and p_id is None:
+                indice, prefijo, orden = "osp", (o_id, s_id), (1, 2, 0)
+            else:
+                prefijo = (s_id,) if p_id is None else (s_id, p_id) if o_id is None else (s_id, p_id, o_id)
+                indice, orden = "spo", (0, 1, 2)
+        elif p_id is not None:
+            prefijo = (p_id,) if o_id is None else (p_id, o_id)
+            indice, orden = "pos", (2, 0, 1)
+        elif o_id is not None:
+            indice, prefijo, orden = "osp", (o_id,), (1, 2, 0)
+        else:
+            indice, prefijo, orden = "spo", (), (0, 1, 2)
+
+        filas = self._indices[indice]
+        inicio, fin = self._rango(indice, prefijo) if prefijo else (0, self._n_triples)
+        i_s, i_p, i_o = orden
+        for fila in range(inicio, fin):
+            base = 3 * fila
+            yield (self._termino(filas[base + i_s]),
+                   self._termino(filas[base + i_p]),
+                   self._termino(filas[base + i_o]))
+
+    # --- API de rdflib.store.Store ----------------------------------
+
+    def triples(self, triple_pattern, context=None):
+        s, p, o = triple_pattern
+        for triple in self._triples_base(s, p, o):
+            yield triple, iter(())
+        for triple, contextos in self._extra.triples(triple_pattern, context):
+            yield triple, contextos
+
+    def __len__(self, context=None):
+        return self._n_triples + len(self._extra)
+
+    def add(self, triple, context, quoted=False):
+        s, p, o = triple
+        if next(self._triples_base(s, p, o), None) is None:
+            self._extra.add(triple, context, quoted)
+        Store.add(self, triple, context, quoted)
+
+    def remove(self, triple_pattern, context=None):
+        if next(self._triples_base(*triple_pattern), None) is not None:
+            raise TypeError("Los triples del snapshot son de solo lectura")
+        self._extra.remove(triple_pattern, context)
+
+    def contexts(self, triple=None):
+        return iter(())
+
+    def _bind(self, prefijo, namespace):
+        anterior = self._namespaces.pop(prefijo, None)
+        if anterior is not None:
+            self._prefijos.pop(anterior, None)
+        self._prefijos.pop(namespace, None)
+        self._namespaces[prefijo] = namespace
+        self._prefijos[namespace] = prefijo
+
+    def bind(self, prefix, namespace, override=True):
+        if not override and (prefix in self._namespaces or namespace in self._prefijos):
+            return
+        self._bind(prefix, namespace)
+
+    def namespace(self, prefix):
+        return self._namespaces.get(prefix)
+
+    def prefix(self, namespace):
+        return self._prefijos.get(namespace)
+
+    def namespaces(self):
+        for prefijo, namespace in list(self._namespaces.items()):
+            yield prefijo, namespace
+
+    def close(self, commit_pending_transaction=False):
+        for vista in self._indices.values():
+            vista.release()
+        self._tabla.release()
+        self._terminos.release()
+        self._vista.release()
+        self._mmap.close()
+
+
+def cargar_snapshot(ruta_ttl, ruta_snap=None):
+    """Abre el snapshot del TTL como Graph, recompilándolo si el TTL es más nuevo"""
+    ruta_snap = ruta_snap or ruta_snapshot(ruta_ttl)
+    if not snapshot_vigente(ruta_ttl, ruta_snap):
+        compilar_snapshot(ruta_ttl, ruta_snap)
+    return Graph(store=StoreSnapshot(ruta_snap))
+
+
+if __name__ == "__main__":
+    if len(sys.argv) not in (2, 3):
+        print(__doc__.split("Uso:")[1].strip())
+        sys.exit(1)
+
+    destino = compilar_snapshot(sys.argv[1], sys.argv[2] if len(sys.argv) == 3 else None)
+    print(f"✅ Snapshot escrito en {destino} ({os.path.getsize(destino)} bytes)")
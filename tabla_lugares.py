@@ -0,0 +1,110 @@
+# -*- coding: utf-8 -*-
+"""
+Tabla columnar de lugares (pandas) en lugar de la lista de dicts.
+
+`extraer_lugares` devuelve una lista de dicts y cada filtro de la app
+(tipos, conteos de la barra lateral, lugares con coordenadas) era una
+comprensión de listas sobre ella. `TablaLugares` guarda las mismas nueve
+columnas en un DataFrame, con `tipo_general` y `nivel` como categóricas, y
+resuelve filtros y conteos con máscaras vectorizadas.
+
+Para el código que sigue trabajando con dicts (construcción de capas,
+popups, panel de detalle), iterar la tabla o indexarla con un entero
+devuelve registros `Lugar`, que se leen igual que el dict de siempre; con
+un slice, una lista de posiciones o una máscara devuelve otra tabla.
+"""
+
+import math
+
+import numpy as np
+import pandas as pd
+
+from lugares_grafo import Lugar
+
+COLUMNAS = list(Lugar.__slots__)
+CATEGORICAS = ('tipo_general', 'nivel')
+
+
+def _nulo(valor):
+    """NaN de las columnas numéricas -> None, como en los dicts originales"""
+    return None if isinstance(valor, float) and math.isnan(valor) else valor
+
+
+class TablaLugares:
+    """Lugares en columnas con filtros vectorizados y acceso como dicts"""
+
+    def __init__(self, lugares=(), df=None):
+        if df is None:
+            df = pd.DataFrame.from_records(
+                [tuple(lugar[c] for c in COLUMNAS) for lugar in lugares], columns=COLUMNAS
+            )
+            df['lat'] = df['lat'].astype(float)
+            df['lon'] = df['lon'].astype(float)
+            for columna in CATEGORICAS:
+                df[columna] = df[columna].astype('category')
+        self.df = df
+
+    # ---------------------------------------------------------------
+    # Compatibilidad con la lista de dicts
+    # ---------------------------------------------------------------
+
+    def __len__(self):
+        return len(self.df)
+
+    def __bool__(self):
+        return len(self.df) > 0
+
+    def __iter__(self):
+        columnas = [self.df[c].tolist() for c in COLUMNAS]
+        for fila in zip(*columnas):
+            yield Lugar(*map(_nulo, fila))
+
+    def __getitem__(self, i):
+        """Entero -> Lugar; slice, lista de posiciones o máscara booleana -> TablaLugares"""
+        if isinstance(i, (int, np.integer)):
+            fila = self.df.iloc[i]
+            return Lugar(*(_nulo(fila[c]) for c in COLUMNAS))
+        if isinstance(i, slice):
+            return TablaLugares(df=self.df.iloc[i])
+        posiciones = np.asarray(i)
+        if posiciones.dtype == bool:
+            return self.filtrar(posiciones)
+        return TablaLugares(df=self.df.iloc[posiciones.astype(np.intp)])
+
+    def registros(self):
+        """Lista de registros Lugar (se leen como los dicts de antes)"""
+        return list(self)
+
+    # ---------------------------------------------------------------
+    # Máscaras, filtros y conteos
+    # ---------------------------------------------------------------
+
+    def mascara_coords(self):
+        """Lugares con coordenadas (lat y lon no nulas ni cero)"""
+        lat, lon = self.df['lat'], self.df['lon']
+        return (lat.notna() & lon.notna() & (lat != 0) & (lon != 0)).to_numpy()
+
+    def mascara_tipos(self, tipos):
+        return self.df['tipo_general'].isin(list(tipos)).to_numpy()
+
+    def filtrar(self, mascara):
+        """Subtabla con las filas de la máscara booleana"""
+        return TablaLugares(df=self.df[np.asarray(mascara, dtype=bool)])
+
+    def por_tipos(self, tipos):
+        return self.filtrar(self.mascara_tipos(tipos))
+
+    def con_coords(self):
+        return self.filtrar(self.mascara_coords())
+
+    def tipos(self):
+        """Tipos generales presentes, ordenados"""
+        return sorted(self.df['tipo_general'].unique().tolist())
+
+    def conteo_por_tipo(self):
+        """Tipo general -> número de lugares (solo tipos presentes)"""
+        conteo = self.df['tipo_general'].value_counts(sort=False)
+        return {tipo: int(n) for tipo, n in conteo.items() if n}
+
+    def uris(self):
+        return self.df['uri'].tolist()
@@ -0,0 +1,107 @@
+# -*- coding: utf-8 -*-
+"""
+CacheGrafo: carga de vuelo único, errores y recarga en segundo plano.
+"""
+
+import threading
+import time
+
+import pytest
+
+from cache_grafo import CacheGrafo
+
+
+def en_hilos(n, funcion):
+    """Ejecuta `funcion()` en n hilos a la vez y devuelve resultados o excepciones"""
+    resultados = [None] * n
+
+    def trabajo(i):
+        try:
+            resultados[i] = funcion()
+        except Exception as e:
+            resultados[i] = e
+
+    hilos = [threading.Thread(target=trabajo, args=(i,)) for i in range(n)]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(10)
+    return resultados
+
+
+def test_carga_en_frio_de_vuelo_unico():
+    cache = CacheGrafo(ttl=3600)
+    llamadas = []
+
+    def cargador(clave):
+        llamadas.append(clave)
+        time.sleep(0.2)
+        return {'clave': clave}
+
+    entradas = en_hilos(8, lambda: cache.obtener("grafo", cargador))
+    assert llamadas == ["grafo"]
+    assert {id(e) for e in entradas} == {id(entradas[0])}
+    assert entradas[0].valor == {'clave': "grafo"}
+    assert cache.estadisticas()['fallos'] == 8
+
+
+def test_error_de_carga_llega_a_todas_las_esperas():
+    cache = CacheGrafo(ttl=3600)
+
+    def cargador(clave):
+        time.sleep(0.2)
+        raise IOError("sin conexión")
+
+    resultados = en_hilos(4, lambda: cache.obtener("grafo", cargador))
+    assert all(isinstance(r, RuntimeError) and "sin conexión" in str(r) for r in resultados)
+    assert cache.estado()["grafo"]['error'] == "sin conexión"
+
+
+def test_copia_vieja_mientras_se_recarga():
+    cache = CacheGrafo(ttl=0)
+    liberar = threading.Event()
+    valores = iter(["v1", "v2"])
+
+    def cargador(clave):
+        valor = next(valores)
+        if valor == "v2":
+            liberar.wait(5)
+        return valor
+
+    primera = cache.obtener("grafo", cargador)
+    # Vieja (ttl=0): se sirve al momento y se recarga en segundo plano
+    assert cache.obtener("grafo", cargador) is primera
+    assert cache.estado()["grafo"]['recargando']
+    liberar.set()
+    for _ in range(100):
+        if not cache.estado()["grafo"]['recargando']:
+            break
+        time.sleep(0.01)
+    segunda = cache.obtener("grafo", cargador)
+    assert segunda.valor == "v2" and segunda.version > primera.version
+
+
+def test_recarga_fallida_sigue_sirviendo_la_copia():
+    cache = CacheGrafo(ttl=0)
+    primera = cache.obtener("grafo", lambda clave: "v1")
+
+    def falla(clave):
+        raise IOError("caído")
+
+    assert cache.obtener("grafo", falla) is primera
+    for _ in range(100):
+        if not cache.estado()["grafo"]['recargando']:
+            break
+        time.sleep(0.01)
+    assert cache.estado()["grafo"]['error'] == "caído"
+    assert cache.obtener("grafo", falla).valor == "v1"
+
+
+def test_invalidar_recarga_en_frio():
+    cache = CacheGrafo(ttl=3600)
+    primera = cache.obtener("grafo", lambda clave: "v1")
+    cache.invalidar("grafo")
+    assert cache.obtener("grafo", lambda clave: "v2").version > primera.version
+    cache.invalidar()
+    with pytest.raises(RuntimeError):
+        cache.obtener("grafo", lambda clave: 1 / 0)
@@ -0,0 +1,78 @@
+# -*- coding: utf-8 -*-
+"""
+CacheLRU: desalojo por entradas y por bytes, y construcción de vuelo único.
+"""
+
+import threading
+import time
+
+import pytest
+
+from cache_mapas import CacheLRU
+
+
+def test_desaloja_el_menos_usado_por_entradas():
+    cache = CacheLRU(max_entradas=2, max_bytes=1000)
+    cache.guardar("a", 1, 10)
+    cache.guardar("b", 2, 10)
+    assert cache.obtener("a") == 1        # "b" pasa a ser el menos usado
+    cache.guardar("c", 3, 10)
+    assert cache.obtener("b") is None
+    assert cache.obtener("a") == 1 and cache.obtener("c") == 3
+    assert cache.estadisticas()['desalojos'] == 1
+
+
+def test_desaloja_por_bytes_y_no_guarda_lo_que_no_cabe():
+    cache = CacheLRU(max_entradas=10, max_bytes=100)
+    cache.guardar("a", 1, 60)
+    cache.guardar("b", 2, 60)
+    assert cache.obtener("a") is None
+    assert cache.estadisticas()['bytes'] == 60
+    cache.guardar("enorme", 3, 101)
+    assert cache.obtener("enorme") is None
+    assert cache.obtener("b") == 2
+
+
+def test_reemplazar_una_clave_no_duplica_bytes():
+    cache = CacheLRU(max_entradas=10, max_bytes=100)
+    cache.guardar("a", 1, 40)
+    cache.guardar("a", 2, 50)
+    assert cache.obtener("a") == 2
+    assert cache.tamaño("a") == 50
+    assert cache.estadisticas()['bytes'] == 50
+
+
+def test_construccion_de_vuelo_unico():
+    cache = CacheLRU(max_entradas=10, max_bytes=1000)
+    construcciones = []
+
+    def constructor():
+        construcciones.append(1)
+        time.sleep(0.2)
+        return object()
+
+    resultados = []
+    hilos = [
+        threading.Thread(target=lambda: resultados.append(cache.obtener_o_crear("mapa", constructor, lambda v: 10)))
+        for _ in range(8)
+    ]
+    for hilo in hilos:
+        hilo.start()
+    for hilo in hilos:
+        hilo.join(10)
+    assert len(construcciones) == 1
+    assert len(resultados) == 8 and all(r is resultados[0] for r in resultados)
+    estadisticas = cache.estadisticas()
+    assert (estadisticas['fallos'], estadisticas['aciertos']) == (1, 7)
+
+
+def test_construccion_fallida_la_reintenta_la_siguiente():
+    cache = CacheLRU(max_entradas=10, max_bytes=1000)
+
+    def falla():
+        raise ValueError("sin datos")
+
+    with pytest.raises(ValueError):
+        cache.obtener_o_crear("mapa", falla, lambda v: 10)
+    assert cache.obtener_o_crear("mapa", lambda: "mapa", lambda v: 10) == "mapa"
+    assert cache.obtener_o_crear("mapa", falla, lambda v: 10) == "mapa"
@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+"""
+IndiceFacetas: las selecciones y conteos con bitsets coinciden con filtrar
+lugar por lugar (cumple_filtros).
+"""
+
+import itertools
+import random
+
+import pytest
+
+from indice_facetas import IndiceFacetas
+from mapa_folium import cumple_filtros
+from tabla_lugares import TablaLugares
+
+TIPOS = ["Localidad", "Santuario", "Glaciar", "Iglesia"]
+NIVELES = ["A", "B", "C"]
+CONTENEDORES = ["Ocongate", "Sinakara", "Paucartambo", None]
+
+
+@pytest.fixture(scope="module")
+def tabla():
+    azar = random.Random(2026)
+    return TablaLugares([
+        {'uri': f"ex:L{i}", 'nombre': f"Lugar {i}", 'lat': -13.5, 'lon': -71.5, 'tipo_especifico': None,
+         'tipo_general': azar.choice(TIPOS), 'descripcion': "", 'nivel': azar.choice(NIVELES),
+         'ubicado_en': azar.choice(CONTENEDORES)}
+        for i in range(150)
+    ])
+
+
+@pytest.fixture(scope="module")
+def indice(tabla):
+    return IndiceFacetas(tabla)
+
+
+def subconjuntos(valores, maximo=2):
+    return [list(c) for n in range(maximo + 1) for c in itertools.combinations(valores, n)]
+
+
+def test_selecciones_como_el_filtro_lugar_a_lugar(tabla, indice):
+    for tipos, niveles, contenedores in itertools.product(
+        subconjuntos(TIPOS), subconjuntos(NIVELES), subconjuntos(CONTENEDORES, 1)
+    ):
+        bits = indice.seleccion(tipo_general=tipos, nivel=niveles, ubicado_en=contenedores)
+        esperado = [cumple_filtros(l, tipos, niveles, contenedores) for l in tabla]
+        assert indice.mascara(bits).tolist() == esperado, (tipos, niveles, contenedores)
+
+
+def test_conteos_dentro_de_la_seleccion(tabla, indice):
+    bits = indice.seleccion(nivel=["A"])
+    esperado = {}
+    for lugar in tabla:
+        if lugar['nivel'] == "A":
+            esperado[lugar['tipo_general']] = esperado.get(lugar['tipo_general'], 0) + 1
+    conteos = {v: n for v, n in indice.conteos('tipo_general', bits).items() if n}
+    assert conteos == esperado
+    assert sum(indice.conteos('nivel').values()) == len(tabla)
+
+
+def test_valores_con_none_al_final(indice):
+    assert indice.valores('ubicado_en') == ["Ocongate", "Paucartambo", "Sinakara", None]
+    assert indice.valores('tipo_general') == sorted(TIPOS)
+
+
+def test_valor_desconocido_y_tabla_vacia(indice):
+    assert indice.seleccion(tipo_general=["Volcán"]) == 0
+    vacio = IndiceFacetas(TablaLugares())
+    assert vacio.mascara(vacio.seleccion(tipo_general=["Localidad"])).tolist() == []
@@ -0,0 +1,89 @@
+# -*- coding: utf-8 -*-
+"""
+Los motores nativo y SPARQL de extraer_lugares devuelven los mismos lugares
+en el mismo orden: el nativo replica MIN, GROUP BY y ORDER BY de rdflib.
+"""
+
+import os
+
+import pytest
+from rdflib import Graph
+
+from datos_grafo import GRAFO_TTL_LOCAL
+from generar_grafo import generar_grafo
+from inferencia_rdfs import materializar_rdfs
+from lugares_grafo import extraer_lugares
+
+ONTOLOGIA = """
+@prefix : <http://example.org/festividades#> .
+@prefix geo: <http://www.w3.org/2003/01/geo/wgs84_pos#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+:Lugar rdfs:label "Lugar" .
+:Localidad rdfs:subClassOf :Lugar ; rdfs:label "Localidad" .
+:Santuario rdfs:subClassOf :Lugar ; rdfs:label "Santuario" .
+:Apu rdfs:subClassOf :Santuario ; rdfs:label "Apu" , "Apu tutelar"@es .
+"""
+
+# Casos de MIN y GROUP BY: varias etiquetas (con idioma y sin él), varios
+# tipos, dos pares de coordenadas, dos contenedores y un lugar sin coordenadas
+CASOS = ONTOLOGIA + """
+:Ocongate a :Localidad ; rdfs:label "Ocongate" ; geo:lat -13.63 ; geo:long -71.38 .
+:Mawayani a :Localidad ; rdfs:label "Mawayani" .
+:Sinakara a :Santuario , :Apu ;
+    rdfs:label "sinakara" , "Sinakara" , "Sinaqara"@qu ;
+    geo:lat "-13.5667"^^xsd:decimal , -13.57 ; geo:long -71.1833 ;
+    :descripcionBreve "Santuario" , "Apu" ;
+    :nivelEmbeddings "B" , "A" ;
+    :ubicadoEn :Ocongate , :Mawayani .
+:Colquepunku a :Apu ; rdfs:label "Colquepunku" ; geo:lat -13.55 ; geo:long -71.20 .
+:SinEtiqueta a :Santuario ; geo:lat -13.0 ; geo:long -71.0 .
+"""
+
+
+def comparar(grafo, inferido=False):
+    nativo = extraer_lugares(grafo, "nativo", inferido)
+    sparql = extraer_lugares(grafo, "sparql", inferido)
+    assert len(nativo) == len(sparql)
+    # ORDER BY ?tipoGeneral ?primerNombre: los empates pueden salir en cualquier orden
+    assert [(l['tipo_general'], l['nombre']) for l in nativo] == [(l['tipo_general'], l['nombre']) for l in sparql]
+    clave = lambda lugar: tuple(str(v) for v in lugar.values())
+    assert sorted(nativo, key=clave) == sorted(sparql, key=clave)
+    return nativo
+
+
+def test_casos_de_min_y_group_by():
+    grafo = Graph().parse(data=CASOS, format="turtle")
+    lugares = comparar(grafo)
+    sinakara = [l for l in lugares if l['uri'].endswith("Sinakara")]
+    assert len(sinakara) == 2        # una fila por par de coordenadas
+    assert {l['lat'] for l in sinakara} == {-13.5667, -13.57}
+    lugar = sinakara[0]
+    assert (lugar['nombre'], lugar['descripcion'], lugar['nivel'], lugar['ubicado_en']) == \
+        ("Sinakara", "Apu", "A", "Mawayani")
+    assert lugar['tipo_general'] == "Santuario"
+    assert not any(l['uri'].endswith("SinEtiqueta") for l in lugares)
+
+
+def test_casos_inferidos():
+    grafo = Graph().parse(data=CASOS, format="turtle")
+    materializar_rdfs(grafo)
+    comparar(grafo, inferido=True)
+
+
+@pytest.mark.skipif(not os.path.exists(GRAFO_TTL_LOCAL), reason="sin data/grafo.ttl")
+@pytest.mark.parametrize("inferido", [False, True])
+def test_grafo_real(inferido):
+    grafo = Graph().parse(GRAFO_TTL_LOCAL, format="turtle")
+    if inferido:
+        materializar_rdfs(grafo)
+    lugares = comparar(grafo, inferido)
+    assert lugares == extraer_lugares(Graph().parse(GRAFO_TTL_LOCAL, format="turtle"), "nativo")
+
+
+@pytest.mark.skipif(not os.path.exists(GRAFO_TTL_LOCAL), reason="sin data/grafo.ttl")
+def test_grafo_sintetico(tmp_path):
+    ruta = str(tmp_path / "sintetico.ttl")
+    generar_grafo(ruta, lugares=300)
+    comparar(Graph().parse(ruta, format="turtle"))
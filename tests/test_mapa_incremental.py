@@ -0,0 +1,43 @@
+# -*- coding: utf-8 -*-
+"""
+Enganchar capas al mapa base compartido (como hace st_folium en el modo
+incremental) no deja rastro en el mapa.
+"""
+
+import os
+
+import pytest
+from streamlit_folium import _get_feature_group_string
+
+from datos_grafo import GRAFO_TTL_LOCAL, cargar_datos_grafo
+from mapa_folium import capa_enganchada, crear_capa, crear_mapa_base
+
+pytestmark = pytest.mark.skipif(not os.path.exists(GRAFO_TTL_LOCAL), reason="sin data/grafo.ttl")
+
+
+@pytest.fixture(scope="module")
+def datos():
+    return cargar_datos_grafo(GRAFO_TTL_LOCAL)
+
+
+def test_cambios_de_capa_no_hacen_crecer_el_mapa_base(datos):
+    mapa = crear_mapa_base()
+    antes = mapa.get_root().render()
+    tabla = datos['lugares']
+    for tipo in tabla.con_coords().tipos() * 2:
+        capa = crear_capa(datos['grafo'], tabla.por_tipos([tipo]), relaciones_lugares=datos['relaciones'])
+        with capa_enganchada(mapa, capa):
+            _get_feature_group_string(capa, mapa)
+        assert capa.get_name() not in mapa._children
+    assert mapa.get_root().render() == antes
+
+
+def test_mapa_restaurado_aunque_falle(datos):
+    mapa = crear_mapa_base()
+    antes = mapa.get_root().render()
+    capa = crear_capa(datos['grafo'], datos['lugares'], relaciones_lugares=datos['relaciones'])
+    with pytest.raises(RuntimeError):
+        with capa_enganchada(mapa, capa):
+            _get_feature_group_string(capa, mapa)
+            raise RuntimeError("st_folium")
+    assert mapa.get_root().render() == antes
@@ -0,0 +1,29 @@
+# -*- coding: utf-8 -*-
+"""
+El prerender escribe los artefactos del manifiesto sin publicar rutas locales.
+"""
+
+import hashlib
+import json
+import os
+
+import pytest
+
+from datos_grafo import GRAFO_TTL_LOCAL
+from prerender_mapa import prerender
+
+pytestmark = pytest.mark.skipif(not os.path.exists(GRAFO_TTL_LOCAL), reason="sin data/grafo.ttl")
+
+
+def test_manifiesto_y_artefactos(tmp_path):
+    salida = tmp_path / "dist"
+    prerender(os.path.abspath(GRAFO_TTL_LOCAL), str(salida), estilos=["Relieve"])
+    manifiesto = json.loads((salida / "manifest.json").read_text(encoding="utf-8"))
+
+    assert manifiesto['fuente'] == "grafo.ttl"
+    assert os.path.dirname(os.path.abspath(GRAFO_TTL_LOCAL)) not in (salida / "manifest.json").read_text()
+    assert set(manifiesto['artefactos']) == {"lugares.geojson", "mapa_relieve.html", "index.html"}
+    for nombre, datos in manifiesto['artefactos'].items():
+        contenido = (salida / nombre).read_bytes()
+        assert datos['bytes'] == len(contenido)
+        assert datos['sha256'] == hashlib.sha256(contenido).hexdigest()
@@ -0,0 +1,60 @@
+# -*- coding: utf-8 -*-
+"""
+Cada popup lleva solo su fragmento HTML, la hoja de estilos va una vez por
+mapa y viaja en lo que envía st_folium, y el mapa del grafo real cabe en
+PRESUPUESTO_HTML_MAPA.
+"""
+
+import json
+import os
+
+import pytest
+
+from datos_grafo import GRAFO_TTL_LOCAL, cargar_datos_grafo, relaciones_de_lugar
+from mapa_folium import MODOS_MARCADORES, crear_mapa_base, crear_mapa_interactivo
+from plantillas_popup import (
+    ESTILOS_POPUP,
+    PRESUPUESTO_HTML_MAPA,
+    dentro_de_presupuesto,
+    fragmento_popup_lugar,
+)
+
+pytestmark = pytest.mark.skipif(not os.path.exists(GRAFO_TTL_LOCAL), reason="sin data/grafo.ttl")
+
+
+@pytest.fixture(scope="module")
+def datos():
+    return cargar_datos_grafo(GRAFO_TTL_LOCAL)
+
+
+@pytest.fixture(scope="module")
+def mapa(datos):
+    return crear_mapa_interactivo(datos['grafo'], datos['lugares'], relaciones_lugares=datos['relaciones'])
+
+
+def test_fragmento_sin_documento_ni_estilos(datos):
+    lugar = datos['lugares'].con_coords()[0]
+    fragmento = fragmento_popup_lugar(lugar, relaciones_de_lugar(datos['grafo'], lugar['uri'], datos['relaciones']))
+    assert "<!DOCTYPE" not in fragmento
+    assert "<style" not in fragmento
+    assert fragmento.startswith('<div class="qp ')
+
+
+def test_estilos_una_vez_por_mapa(mapa):
+    assert mapa.get_root().render().count(json.dumps(ESTILOS_POPUP)) == 1
+
+
+@pytest.mark.parametrize("modo", MODOS_MARCADORES)
+def test_mapa_dentro_de_presupuesto(datos, modo):
+    mapa = crear_mapa_interactivo(
+        datos['grafo'], datos['lugares'], relaciones_lugares=datos['relaciones'], modo_marcadores=modo
+    )
+    tamaño, cumple = dentro_de_presupuesto(mapa)
+    assert cumple, f"{tamaño} bytes > {PRESUPUESTO_HTML_MAPA}"
+
+
+def test_estilos_popup_en_payload_de_st_folium(mapa):
+    from streamlit_folium import _get_map_string
+
+    assert ".qp .popup-header" in _get_map_string(mapa)
+    assert ".qp .popup-header" in _get_map_string(crear_mapa_base())
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+El snapshot .qkg devuelve los mismos triples que el TTL parseado.
+"""
+
+import os
+
+import pytest
+from rdflib import BNode, Graph, Literal, URIRef
+from rdflib.compare import isomorphic
+from rdflib.namespace import RDF, RDFS, XSD
+
+from datos_grafo import GRAFO_TTL_LOCAL
+from snapshot_grafo import StoreSnapshot, cargar_snapshot, compilar_snapshot, snapshot_vigente
+
+TTL_TERMINOS = """
+@prefix ex: <http://example.org/festividades#> .
+@prefix geo: <http://www.w3.org/2003/01/geo/wgs84_pos#> .
+@prefix rdfs: <http://www.w3.org/2000/01/rdf-schema#> .
+@prefix xsd: <http://www.w3.org/2001/XMLSchema#> .
+
+ex:Sinakara a ex:Santuario ;
+    rdfs:label "Sinakara" , "Sinakara"@es , "Sinaqara"@qu ;
+    geo:lat "-13.5667"^^xsd:decimal ;
+    geo:long -71.1833 ;
+    ex:nivel 1 ;
+    ex:visitado true ;
+    ex:descripcion "Ñawi, «comillas» y \\"escapes\\"" ;
+    ex:recurso [ ex:codigo "QR-FOTO-001" ] .
+"""
+
+
+def abrir(ruta_ttl, tmp_path):
+    ruta_snap = str(tmp_path / "grafo.qkg")
+    compilar_snapshot(ruta_ttl, ruta_snap)
+    return Graph(store=StoreSnapshot(ruta_snap))
+
+
+def test_todos_los_tipos_de_termino(tmp_path):
+    ruta_ttl = tmp_path / "terminos.ttl"
+    ruta_ttl.write_text(TTL_TERMINOS, encoding="utf-8")
+    parseado = Graph().parse(str(ruta_ttl), format="turtle")
+    snapshot = abrir(str(ruta_ttl), tmp_path)
+    assert len(snapshot) == len(parseado)
+    assert isomorphic(snapshot, parseado)
+
+    sinakara = URIRef("http://example.org/festividades#Sinakara")
+    etiquetas = set(snapshot.objects(sinakara, RDFS.label))
+    assert etiquetas == {Literal("Sinakara"), Literal("Sinakara", lang="es"), Literal("Sinaqara", lang="qu")}
+    assert Literal("-13.5667", datatype=XSD.decimal) in set(snapshot.objects(sinakara, None))
+    assert any(isinstance(o, BNode) for o in snapshot.objects(sinakara, None))
+    assert dict(snapshot.namespaces())["ex"] == URIRef("http://example.org/festividades#")
+
+
+@pytest.mark.skipif(not os.path.exists(GRAFO_TTL_LOCAL), reason="sin data/grafo.ttl")
+def test_grafo_real_ida_y_vuelta(tmp_path):
+    parseado = Graph().parse(GRAFO_TTL_LOCAL, format="turtle")
+    snapshot = abrir(GRAFO_TTL_LOCAL, tmp_path)
+    assert len(snapshot) == len(parseado)
+    assert isomorphic(snapshot, parseado)
+
+    # Cada patrón de acceso (s, p, o, sp, po, so) da lo mismo que el grafo parseado
+    s, p, o = next(iter(parseado.triples((None, RDF.type, None))))
+    for patron in [(s, None, None), (None, p, None), (None, None, o),
+                   (s, p, None), (None, p, o), (s, None, o), (s, p, o)]:
+        assert set(snapshot.triples(patron)) == set(parseado.triples(patron)), patron
+
+    consulta = "SELECT ?s ?o WHERE { ?s rdfs:label ?o } ORDER BY ?s ?o"
+    assert list(snapshot.query(consulta)) == list(parseado.query(consulta))
+
+
+def test_recompila_si_el_ttl_es_mas_nuevo(tmp_path):
+    ruta_ttl = tmp_path / "grafo.ttl"
+    ruta_ttl.write_text(TTL_TERMINOS, encoding="utf-8")
+    ruta_snap = str(tmp_path / "grafo.qkg")
+    assert len(cargar_snapshot(str(ruta_ttl), ruta_snap)) == 11
+    assert snapshot_vigente(str(ruta_ttl), ruta_snap)
+
+    ruta_ttl.write_text(TTL_TERMINOS + "ex:Ocongate a ex:Localidad .\n", encoding="utf-8")
+    os.utime(ruta_ttl, (os.path.getmtime(ruta_snap) + 10,) * 2)
+    assert not snapshot_vigente(str(ruta_ttl), ruta_snap)
+    assert len(cargar_snapshot(str(ruta_ttl), ruta_snap)) == 12
@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+TablaLugares: acceso como lista de dicts, indexación y filtros vectorizados.
+"""
+
+import numpy as np
+import pytest
+
+from lugares_grafo import Lugar
+from tabla_lugares import TablaLugares
+
+LUGARES = [
+    {'uri': "ex:Ocongate", 'nombre': "Ocongate", 'lat': -13.63, 'lon': -71.38, 'tipo_especifico': None,
+     'tipo_general': "Localidad", 'descripcion': "Pueblo", 'nivel': "A", 'ubicado_en': None},
+    {'uri': "ex:Sinakara", 'nombre': "Sinakara", 'lat': -13.57, 'lon': -71.18, 'tipo_especifico': "Santuario",
+     'tipo_general': "Santuario", 'descripcion': "Santuario", 'nivel': "A", 'ubicado_en': "Ocongate"},
+    {'uri': "ex:Mawayani", 'nombre': "Mawayani", 'lat': None, 'lon': None, 'tipo_especifico': None,
+     'tipo_general': "Localidad", 'descripcion': "Sin descripción", 'nivel': "B", 'ubicado_en': "Ocongate"},
+    {'uri': "ex:Colquepunku", 'nombre': "Colquepunku", 'lat': -13.55, 'lon': -71.2, 'tipo_especifico': None,
+     'tipo_general': "Glaciar", 'descripcion': "Nevado", 'nivel': "C", 'ubicado_en': "Sinakara"},
+    {'uri': "ex:Cero", 'nombre': "Cero", 'lat': 0.0, 'lon': 0.0, 'tipo_especifico': None,
+     'tipo_general': "Localidad", 'descripcion': "Sin descripción", 'nivel': "B", 'ubicado_en': None},
+]
+
+
+@pytest.fixture
+def tabla():
+    return TablaLugares(LUGARES)
+
+
+def nombres(tabla):
+    return [l['nombre'] for l in tabla]
+
+
+def test_iterar_devuelve_los_dicts_originales(tabla):
+    registros = list(tabla)
+    assert all(isinstance(r, Lugar) for r in registros)
+    assert registros == LUGARES
+    assert registros[2]['lat'] is None        # NaN de la columna -> None
+    assert len(tabla) == 5 and tabla and not TablaLugares()
+
+
+def test_indexar_con_enteros(tabla):
+    assert tabla[1] == LUGARES[1]
+    assert tabla[-1] == LUGARES[-1]
+    assert tabla[np.int64(3)]['nombre'] == "Colquepunku"
+    with pytest.raises(IndexError):
+        tabla[5]
+
+
+@pytest.mark.parametrize("indice, esperados", [
+    (slice(1, 3), ["Sinakara", "Mawayani"]),
+    (slice(None, None, -2), ["Cero", "Mawayani", "Ocongate"]),
+    ([3, 0], ["Colquepunku", "Ocongate"]),
+    (np.array([4, 4]), ["Cero", "Cero"]),
+    ([], []),
+    ([True, False, False, True, False], ["Ocongate", "Colquepunku"]),
+    (np.array([False] * 5), []),
+])
+def test_indexar_devuelve_subtabla(tabla, indice, esperados):
+    parte = tabla[indice]
+    assert isinstance(parte, TablaLugares)
+    assert nombres(parte) == esperados
+    # La subtabla se sigue indexando por posición, no por etiqueta
+    if esperados:
+        assert parte[0]['nombre'] == esperados[0]
+
+
+def test_filtros_y_conteos(tabla):
+    assert nombres(tabla.con_coords()) == ["Ocongate", "Sinakara", "Colquepunku"]
+    assert nombres(tabla.por_tipos(["Localidad"])) == ["Ocongate", "Mawayani", "Cero"]
+    assert nombres(tabla.por_tipos([])) == []
+    assert tabla.tipos() == ["Glaciar", "Localidad", "Santuario"]
+    assert tabla.conteo_por_tipo() == {"Localidad": 3, "Santuario": 1, "Glaciar": 1}
+    # Los conteos solo incluyen tipos presentes aunque la categoría exista
+    assert tabla.por_tipos(["Glaciar"]).conteo_por_tipo() == {"Glaciar": 1}
+    assert tabla.con_coords().uris() == ["ex:Ocongate", "ex:Sinakara", "ex:Colquepunku"]
@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+Origen de las teselas de cada estilo y servidor local de MBTiles.
+"""
+
+import http.client
+import threading
+
+import pytest
+
+from capas_teselas import TILE_LAYERS_ORIGEN, capas_teselas, url_local
+from servidor_teselas import MAX_AGE_AUSENTE, ZOOM_MAXIMO, AlmacenMBTiles, crear_servidor, etag_coincide
+
+PNG = b"\x89PNG\r\n\x1a\n" + b"\x00" * 32
+
+
+def test_sin_servidor_local_todo_publico(tmp_path):
+    capas = capas_teselas(base_local="", directorio=str(tmp_path))
+    assert all(capas[e]["tiles"] == c["tiles"] for e, c in TILE_LAYERS_ORIGEN.items())
+
+
+def test_servidor_local_solo_para_estilos_con_mbtiles(tmp_path):
+    (tmp_path / "relieve.mbtiles").write_bytes(b"")
+    capas = capas_teselas(base_local="http://localhost:8765/", directorio=str(tmp_path))
+    assert capas["Relieve"]["tiles"] == url_local("relieve", "http://localhost:8765")
+    for estilo in ("Topográfico", "Mapa básico", "Claro"):
+        assert capas[estilo]["tiles"] == TILE_LAYERS_ORIGEN[estilo]["tiles"]
+
+
+@pytest.fixture(scope="module")
+def servidor(tmp_path_factory):
+    directorio = tmp_path_factory.mktemp("teselas")
+    almacen = AlmacenMBTiles(str(directorio / "claro.mbtiles"), escritura=True)
+    almacen.guardar(0, 0, 0, PNG)
+    almacen.guardar(3, 2, 5, PNG + b"z3")
+    servidor = crear_servidor(str(directorio), 0)
+    hilo = threading.Thread(target=servidor.serve_forever, daemon=True)
+    hilo.start()
+    yield servidor
+    servidor.shutdown()
+    servidor.server_close()
+
+
+def pedir(servidor, ruta, cabeceras=None):
+    conexion = http.client.HTTPConnection(*servidor.server_address[:2], timeout=5)
+    conexion.request("GET", ruta, headers=cabeceras or {})
+    respuesta = conexion.getresponse()
+    cuerpo = respuesta.read()
+    conexion.close()
+    return respuesta, cuerpo
+
+
+def test_sirve_teselas_xyz(servidor):
+    respuesta, cuerpo = pedir(servidor, "/claro/3/2/5.png")
+    assert respuesta.status == 200
+    assert cuerpo == PNG + b"z3"
+    assert respuesta.getheader("Content-Type") == "image/png"
+    assert respuesta.getheader("ETag")
+    # MBTiles guarda la fila en TMS: la 5 en XYZ no es la 5 en TMS
+    assert pedir(servidor, "/claro/3/2/2")[0].status == 404
+
+
+@pytest.mark.parametrize("ruta", [
+    "/claro/1/0/0",                         # dentro de rango pero ausente
+    "/otro/0/0/0",                          # estilo sin MBTiles
+    "/claro/0/1/0",                         # x >= 2^z
+    "/claro/0/0/1",                         # y >= 2^z
+    "/claro/3/8/0",
+    f"/claro/{ZOOM_MAXIMO + 1}/0/0",        # zoom fuera de rango
+    "/claro/99999999999999999999/0/0",
+    "/claro/0/-1/0",
+    "/claro/a/0/0",
+    "/../claro.mbtiles",
+])
+def test_fuera_de_rango_o_ausente_es_404(servidor, ruta):
+    respuesta, cuerpo = pedir(servidor, ruta)
+    assert respuesta.status == 404
+    assert cuerpo == b""
+    assert respuesta.getheader("Cache-Control") == f"public, max-age={MAX_AGE_AUSENTE}"
+
+
+@pytest.mark.parametrize("cabecera, coincide", [
+    ('"abc"', True),
+    ('W/"abc"', True),
+    ('"x", "abc"', True),
+    ('  W/"abc" ,"y"', True),
+    ('*', True),
+    ('"xabc"', False),
+    ('"abcx"', False),
+    ('abc', False),
+    ('', False),
+])
+def test_etag_coincide(cabecera, coincide):
+    assert etag_coincide(cabecera, '"abc"') is coincide
+
+
+def test_if_none_match_responde_304(servidor):
+    etiqueta = pedir(servidor, "/claro/0/0/0")[0].getheader("ETag")
+    for cabecera in (etiqueta, f"W/{etiqueta}", f'"otra", {etiqueta}', "*"):
+        respuesta, cuerpo = pedir(servidor, "/claro/0/0/0", {"If-None-Match": cabecera})
+        assert respuesta.status == 304 and cuerpo == b""
+    respuesta, cuerpo = pedir(servidor, "/claro/0/0/0", {"If-None-Match": f'"x{etiqueta[1:]}'})
+    assert respuesta.status == 200 and cuerpo == PNG
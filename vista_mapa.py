@@ -0,0 +1,63 @@
+# -*- coding: utf-8 -*-
+"""
+Recorte de los lugares a la vista actual del mapa.
+
+st_folium devuelve los `bounds` y el `zoom` del mapa tras cada
+desplazamiento. Con el recorte activado solo se envían los lugares dentro
+de una caja de render: la vista ampliada con un margen y ajustada hacia
+fuera a la rejilla de teselas del zoom actual. Mientras la vista siga dentro
+de esa caja no se reconstruye la capa (histéresis); además la caja ajustada
+a la rejilla se repite entre sesiones y sirve como clave de caché.
+
+Las cajas son tuplas (sur, oeste, norte, este) en grados.
+"""
+
+import math
+import os
+
+# Recorte por vista (desactivado por defecto)
+RECORTE_VISTA = os.environ.get("QOYLLUR_RECORTE_VISTA", "0") == "1"
+
+# Margen alrededor de la vista, como fracción de su alto/ancho
+MARGEN_VISTA = float(os.environ.get("QOYLLUR_MARGEN_VISTA", "0.5"))
+
+# Tamaño aproximado del mapa en pantalla (para la vista inicial)
+ANCHO_MAPA_PX = 1200
+ALTO_MAPA_PX = 600
+
+
+def caja_desde_bounds(bounds):
+    """Caja a partir de los bounds de st_folium, o None si aún no hay vista"""
+    try:
+        so, ne = bounds['_southWest'], bounds['_northEast']
+        caja = (float(so['lat']), float(so['lng']), float(ne['lat']), float(ne['lng']))
+    except (KeyError, TypeError, ValueError):
+        return None
+    return caja if caja[0] < caja[2] and caja[1] < caja[3] else None
+
+
+def caja_inicial(lat, lon, zoom, ancho_px=ANCHO_MAPA_PX, alto_px=ALTO_MAPA_PX):
+    """Vista aproximada de un mapa centrado en (lat, lon) con ese zoom"""
+    grados_px = 360 / (256 * 2 ** zoom)
+    medio_ancho = ancho_px / 2 * grados_px
+    medio_alto = alto_px / 2 * grados_px * math.cos(math.radians(lat))
+    return (lat - medio_alto, lon - medio_ancho, lat + medio_alto, lon + medio_ancho)
+
+
+def caja_render(vista, zoom, margen=MARGEN_VISTA):
+    """Vista ampliada con el margen y ajustada a la rejilla de teselas del zoom"""
+    sur, oeste, norte, este = vista
+    alto, ancho = norte - sur, este - oeste
+    paso = 360 / 2 ** max(0, int(zoom))
+    return (
+        max(-90.0, math.floor((sur - alto * margen) / paso) * paso),
+        max(-180.0, math.floor((oeste - ancho * margen) / paso) * paso),
+        min(90.0, math.ceil((norte + alto * margen) / paso) * paso),
+        min(180.0, math.ceil((este + ancho * margen) / paso) * paso),
+    )
+
+
+def contiene(exterior, interior):
+    """Si la caja `interior` cae por completo dentro de `exterior`"""
+    return (exterior[0] <= interior[0] and exterior[1] <= interior[1]
+            and interior[2] <= exterior[2] and interior[3] <= exterior[3])